@@ -1,5 +1,7 @@
 """Core audio player implementation."""
 
-from dolboebify.core.player import Player
+from dolboebify.core.player import PLAYER_EVENTS, Player
+from dolboebify.core.playlist import Playlist, Track
+from dolboebify.core.session import SessionStore
 
-__all__ = ["Player"]
+__all__ = ["Player", "PLAYER_EVENTS", "Playlist", "SessionStore", "Track"]
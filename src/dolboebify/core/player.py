@@ -1,13 +1,134 @@
 """Core player implementation for audio playback."""
 
+import itertools
 import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import vlc
 
-from dolboebify.utils.coverart import fetch_cover_art
+from dolboebify.core.playlist import Playlist, Track, normalize_track_path
+from dolboebify.utils.config import get_setting
+from dolboebify.utils.coverart import fetch_cover_art, get_embedded_cover
 from dolboebify.utils.exceptions import AudioFormatNotSupportedError
+from dolboebify.utils.library import iter_library_files
+from dolboebify.utils.metadata import (
+    METADATA_BATCH_SIZE,
+    MetadataCache,
+    extract_metadata,
+    get_metadata_cache,
+)
+from dolboebify.utils.sidecar import find_sidecar_cover
+from dolboebify.utils.watcher import LibraryDelta, LibraryWatcher
+
+# Player events clients can listen to, and the argument passed to listeners:
+# time_changed (position in ms), end_reached (track path), error (track
+# path), buffering (percent cached), media_changed (track path),
+# library_changed (the LibraryDelta applied to the playlist),
+# metadata_changed (paths of the tracks whose metadata was filled in)
+PLAYER_EVENTS = (
+    "time_changed",
+    "end_reached",
+    "error",
+    "buffering",
+    "media_changed",
+    "library_changed",
+    "metadata_changed",
+)
+
+# Minimum interval (seconds) between two time_changed notifications
+TIME_CHANGED_INTERVAL = 0.25
+
+# A player event listener, called with the event's argument
+EventCallback = Callable[[Any], None]
+
+# libVLC media player events and the player events they're reported as
+_VLC_EVENT_NAMES = {
+    vlc.EventType.MediaPlayerTimeChanged: "time_changed",
+    vlc.EventType.MediaPlayerEndReached: "end_reached",
+    vlc.EventType.MediaPlayerEncounteredError: "error",
+    vlc.EventType.MediaPlayerBuffering: "buffering",
+    vlc.EventType.MediaPlayerMediaChanged: "media_changed",
+    # Internal: keeps the duration up to date while playing
+    vlc.EventType.MediaPlayerLengthChanged: "length_changed",
+}
+
+
+class _EventDispatcher:
+    """Delivers player events to listeners on a dedicated thread.
+
+    libVLC raises events on its own thread and must not be called back
+    from it, so events are queued there and listeners run here, where they
+    can use the player freely (e.g. start the next track).
+    """
+
+    def __init__(self):
+        """Initialize the dispatcher (the thread starts on first use)."""
+        self._lock = threading.Lock()
+        self._listeners: Dict[str, List[EventCallback]] = {
+            name: [] for name in PLAYER_EVENTS
+        }
+        self._queue: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, event: str, callback: EventCallback):
+        """Register a listener, starting the dispatch thread if needed."""
+        if event not in self._listeners:
+            raise ValueError(f"Unknown player event: {event}")
+        with self._lock:
+            # Copy on write: dispatch iterates without holding the lock
+            self._listeners[event] = self._listeners[event] + [callback]
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="dolboebify-player-events",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def remove(self, event: str, callback: EventCallback) -> bool:
+        """Unregister a listener; returns False if it wasn't registered."""
+        with self._lock:
+            listeners = list(self._listeners.get(event, ()))
+            if callback not in listeners:
+                return False
+            listeners.remove(callback)
+            self._listeners[event] = listeners
+            return True
+
+    def has_listeners(self, event: str) -> bool:
+        """Check whether anyone listens to an event."""
+        return bool(self._listeners.get(event))
+
+    def post(self, event: str, argument: Any = None):
+        """Queue an event for delivery (safe from any thread)."""
+        if self._thread is not None and self.has_listeners(event):
+            self._queue.put((event, argument))
+
+    def close(self):
+        """Stop the dispatch thread once queued events are delivered."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _run(self):
+        """Deliver queued events until closed."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            event, argument = item
+            for callback in self._listeners[event]:
+                try:
+                    callback(argument)
+                except Exception as e:
+                    print(f"Error in {event} listener: {e}")
 
 
 class Player:
@@ -35,8 +156,31 @@ class Player:
         "bmp",
     ]
 
-    def __init__(self):
-        """Initialize the player."""
+    # Longest time (ms) libVLC may spend parsing a file (-1: its default)
+    PARSE_TIMEOUT = -1
+
+    # Media option making the standby player open its file and hold
+    STANDBY_OPTION = ":start-paused"
+
+    def __init__(
+        self,
+        preparse_ahead: Optional[int] = None,
+        gapless: Optional[bool] = None,
+    ):
+        """
+        Initialize the player.
+
+        Args:
+            preparse_ahead: Number of upcoming playlist entries parsed in
+                the background after each load (default: the
+                ``player.preparse_ahead`` setting, 0 disables it)
+            gapless: Advance through the playlist without gaps (default:
+                the ``player.gapless`` setting)
+        """
+        if preparse_ahead is None:
+            preparse_ahead = get_setting("player", "preparse_ahead", 2)
+        self.preparse_ahead = preparse_ahead
+
         self.instance = vlc.Instance("--no-xlib")
         self.media_player = (
             self.instance.media_player_new()
@@ -44,7 +188,7 @@ class Player:
             else None
         )
         self.current_media = None
-        self.playlist: List[Dict[str, str]] = []
+        self.playlist = Playlist()
         self.current_index = -1
         self._volume = 70
         self._paused = False
@@ -53,6 +197,59 @@ class Player:
             self.media_player.audio_set_volume(self._volume)
         self._track_images = {}  # Maps track paths to image paths
 
+        # Durations (ms) known from parsing, by absolute track path; written
+        # from libVLC's event thread
+        self._durations_lock = threading.Lock()
+        self._durations: Dict[str, int] = {}
+        # Parses in progress: {id: (track path, media, event manager)},
+        # kept alive until the parse event has been delivered
+        self._parse_ids = itertools.count()
+        self._parsing: Dict[int, tuple] = {}
+        self._parsed: List[int] = []
+        self._current_path: Optional[str] = None
+
+        # Event notifications (see add_listener)
+        self._events = _EventDispatcher()
+        self._last_time_event = float("-inf")
+        self._vlc_events: List[tuple] = []  # (media player, event manager)
+        if self.media_player is not None:
+            self._attach_vlc_events(self.media_player)
+
+        # Gapless mode: the next track waits, opened and paused, on a
+        # standby player (see _prepare_standby)
+        self._gapless = False
+        self._standby = None
+        self._standby_path: Optional[str] = None
+        self._standby_media = None
+        self._handover_lock = threading.RLock()
+        self._watcher: Optional[LibraryWatcher] = None
+        # Stop flag of the background metadata read, if one is running
+        self._metadata_stop: Optional[threading.Event] = None
+        if gapless is None:
+            gapless = get_setting("player", "gapless", False)
+        self.gapless = gapless
+
+    @property
+    def gapless(self) -> bool:
+        """Check whether the playlist advances without gaps."""
+        return self._gapless
+
+    @gapless.setter
+    def gapless(self, enabled: bool):
+        """Enable or disable gapless playback."""
+        enabled = bool(enabled)
+        if enabled == self._gapless:
+            return
+        self._gapless = enabled
+        if enabled:
+            # Registered first, so the player has advanced before client
+            # end_reached listeners run
+            self._events.add("end_reached", self._on_end_reached)
+            self._prepare_standby()
+        else:
+            self._events.remove("end_reached", self._on_end_reached)
+            self._release_standby()
+
     @property
     def volume(self) -> int:
         """Get the current volume level."""
@@ -73,7 +270,22 @@ class Player:
 
     @property
     def duration(self) -> int:
-        """Get the total duration of the current track in milliseconds."""
+        """
+        Get the total duration of the current track in milliseconds.
+
+        Files are parsed asynchronously, so until the duration is known
+        from parsing or from the playing stream, this is the duration read
+        from the file's headers (see ``load_metadata``), or 0.
+        """
+        if self._duration <= 0 and self.current_media is not None:
+            self._reap_parsed()
+        if self._duration <= 0 and self.current_media is not None:
+            if self.media_player is not None:
+                length = self.media_player.get_length()
+                if isinstance(length, int) and length > 0:
+                    self._duration = length
+        if self._duration <= 0 and self._current_path is not None:
+            return self._metadata_duration(self._current_path)
         return self._duration
 
     @property
@@ -88,23 +300,212 @@ class Player:
         """Set the playback position in milliseconds."""
         if self.current_media and self.media_player is not None:
             self.media_player.set_time(value)
+
+    @property
+    def position_percent(self) -> float:
+        """Get the playback position as a percentage."""
         if self._duration > 0:
             return (self.position / self._duration) * 100
+        return 0.0
+
+    @position_percent.setter
+    def position_percent(self, value: float):
+        """Set the playback position as a percentage."""
+        if 0 <= value <= 100 and self._duration > 0:
+            self.position = int((value / 100) * self._duration)
+
+    def add_listener(self, event: str, callback: EventCallback):
+        """
+        Register a callback for a player event.
+
+        Callbacks run on the player's event thread, one at a time and in
+        the order the events occurred, so they may call back into the
+        player (e.g. ``next_track`` on ``end_reached``). GUI code should
+        hand the result over to its own thread. time_changed is sent at
+        most every ``TIME_CHANGED_INTERVAL`` seconds.
+
+        In gapless mode the player moves to the next track by itself at
+        ``end_reached``; follow ``media_changed`` instead of advancing.
+
+        Args:
+            event: One of ``PLAYER_EVENTS``
+            callback: Called with the event's argument
+
+        Raises:
+            ValueError: If the event is unknown
+        """
+        self._events.add(event, callback)
+
+    def remove_listener(self, event: str, callback: EventCallback) -> bool:
+        """
+        Unregister a callback registered with ``add_listener``.
+
+        Args:
+            event: One of ``PLAYER_EVENTS``
+            callback: The registered callback
+
+        Returns:
+            bool: True if the callback was registered
+        """
+        return self._events.remove(event, callback)
+
+    def close(self):
+        """Stop event delivery and playback."""
+        for _media_player, events in self._vlc_events:
+            for event_type in _VLC_EVENT_NAMES:
+                events.event_detach(event_type)
+        self._vlc_events = []
+        self.unwatch_library()
+        self._stop_metadata()
+        self._release_standby()
+        self.stop()
+        self._events.close()
+
+    def _attach_vlc_events(self, media_player):
+        """Subscribe to a media player's libVLC events."""
+        try:
+            events = media_player.event_manager()
+            for event_type, name in _VLC_EVENT_NAMES.items():
+                events.event_attach(
+                    event_type, self._on_vlc_event, name, media_player
+                )
+        except (AttributeError, TypeError, OSError) as e:
+            print(f"Error subscribing to player events: {e}")
+            return
+        # The event manager must stay referenced for the callbacks to live
+        self._vlc_events.append((media_player, events))
+
+    def _on_vlc_event(self, event, name: str, source=None):
+        """
+        Translate a libVLC event (called from libVLC's event thread).
+
+        Only the event's own data and Python state are read here: calling
+        into libVLC from its event thread would deadlock. Events of the
+        standby player are ignored.
+        """
+        if source is not None and source is not self.media_player:
+            return
+        if name == "time_changed":
+            now = time.monotonic()
+            if now - self._last_time_event < TIME_CHANGED_INTERVAL:
+                return
+            self._last_time_event = now
+            self._events.post(name, event.u.new_time)
+        elif name == "buffering":
+            self._events.post(name, event.u.new_cache)
+        elif name == "length_changed":
+            if event.u.new_length > 0:
+                self._duration = event.u.new_length
+        else:
+            self._events.post(name, self._current_path)
+
+    def _upcoming_path(self) -> Optional[str]:
+        """Get the absolute path of the playlist entry after the current."""
+        index = self.current_index + 1
+        if self.current_index < 0 or index >= len(self.playlist):
+            return None
+        return self.playlist[index].absolute_path
+
+    def _prepare_standby(self):
+        """
+        Open the next playlist entry on the standby player.
+
+        The media is opened with ``STANDBY_OPTION``, so libVLC opens the
+        file, starts decoding and holds at the first frame; starting it
+        at the handover is then just an unpause.
+        """
+        with self._handover_lock:
+            track_path = self._upcoming_path()
+            if track_path is None or self.instance is None:
+                self._clear_standby()
+                return
+            if track_path == self._standby_path:
+                return
+
+            if self._standby is None:
+                self._standby = self.instance.media_player_new()
+                self._attach_vlc_events(self._standby)
+            else:
+                self._standby.stop()
+
+            media = self.instance.media_new(track_path)
+            media.add_option(self.STANDBY_OPTION)
+            with self._durations_lock:
+                known = track_path in self._durations or self._is_parsing(
+                    track_path
+                )
+            if not known:
+                self._parse_async(track_path, media)
+
+            self._standby.audio_set_volume(0)
+            self._standby.set_media(media)
+            self._standby.play()
+            self._standby_media = media
+            self._standby_path = track_path
+
+    def _clear_standby(self):
+        """Stop the standby player, keeping it for the next track."""
+        if self._standby is not None and self._standby_path is not None:
+            self._standby.stop()
+        self._standby_media = None
+        self._standby_path = None
+
+    def _release_standby(self):
+        """Stop and drop the standby player."""
+        with self._handover_lock:
+            self._clear_standby()
+            standby, self._standby = self._standby, None
+            if standby is not None:
+                self._vlc_events = [
+                    (media_player, events)
+                    for media_player, events in self._vlc_events
+                    if media_player is not standby
+                ]
+                standby.release()
+
+    def _handover(self) -> bool:
+        """
+        Switch playback to the standby player.
+
+        The standby is unpaused before anything else happens, and the
+        previous player is stopped and reused as the next standby
+        afterwards, so no file is opened or parsed during the switch.
+
+        Returns:
+            bool: True if the standby held the next track
+        """
+        with self._handover_lock:
+            track_path = self._upcoming_path()
+            if track_path is None or track_path != self._standby_path:
+                return False
+
+            standby = self._standby
+            standby.audio_set_volume(self._volume)
+            standby.set_pause(0)
+
+            previous = self.media_player
+            self.media_player = standby
+            self.current_media = self._standby_media
+            self._current_path = track_path
+            self.current_index += 1
+            self._paused = False
+            with self._durations_lock:
+                self._duration = self._durations.get(track_path, 0)
+
+            self._standby = previous
+            self._standby_media = None
+            self._standby_path = None
+            previous.stop()
+
+        self._events.post("media_changed", track_path)
+        self.preparse_upcoming()
+        self._prepare_standby()
+        return True
 
-        @property
-        def position_percent(self) -> float:
-            """Get the playback position as a percentage."""
-            if self._duration > 0:
-                return (self.position / self._duration) * 100
-            return 0.0
-
-        @position_percent.setter
-        def position_percent(self, value: float):
-            """Set the playback position as a percentage."""
-            if 0 <= value <= 100 and self._duration > 0:
-                position_ms = int((value / 100) * self._duration)
-                self.position = position_ms
-            self.position = position_ms
+    def _on_end_reached(self, track_path: Optional[str]):
+        """Advance to the next track when one ends (gapless mode)."""
+        if track_path == self._current_path:
+            self.next_track()
 
     def _is_format_supported(self, file_path: Union[str, Path]) -> bool:
         """Check if the file format is supported."""
@@ -147,16 +548,154 @@ class Player:
                 "VLC instance or media player is not initialized."
             )
 
-        media = self.instance.media_new(str(path.absolute()))
+        track_path = normalize_track_path(path)
+        media = self.instance.media_new(track_path)
+        # Set first: media_changed reports the path
+        self._current_path = track_path
         self.media_player.set_media(media)
         self.current_media = media
 
-        # Parse media info
-        media.parse()
-        self._duration = media.get_duration()
-
+        # Parse media info in the background; playback doesn't wait for it
+        self._reap_parsed()
+        with self._durations_lock:
+            self._duration = self._durations.get(track_path, 0)
+            pending = self._is_parsing(track_path)
+        if self._duration <= 0 and not pending:
+            self._parse_async(track_path, media)
+
+        self.preparse_upcoming()
+        if self._gapless:
+            self._prepare_standby()
         return True
 
+    def _parse_async(self, track_path: str, media) -> bool:
+        """
+        Start parsing a media object without blocking.
+
+        The duration is collected by ``_reap_parsed`` once libVLC is
+        done.
+
+        Args:
+            track_path: Absolute path of the media's file
+            media: VLC media object
+
+        Returns:
+            bool: True if parsing was started
+        """
+        parse_id = next(self._parse_ids)
+        try:
+            events = media.event_manager()
+            events.event_attach(
+                vlc.EventType.MediaParsedChanged,
+                self._on_media_parsed,
+                parse_id,
+            )
+            started = (
+                media.parse_with_options(
+                    vlc.MediaParseFlag.local, self.PARSE_TIMEOUT
+                )
+                == 0
+            )
+        except (AttributeError, TypeError, OSError) as e:
+            print(f"Error parsing {track_path}: {e}")
+            return False
+
+        if started:
+            with self._durations_lock:
+                self._parsing[parse_id] = (track_path, media, events)
+        return started
+
+    def _is_parsing(self, track_path: str) -> bool:
+        """Check whether a track is being parsed (call with the lock held)."""
+        return any(entry[0] == track_path for entry in self._parsing.values())
+
+    def _reap_parsed(self):
+        """
+        Collect the durations of media whose parsing has finished.
+
+        Runs on the calling thread: libVLC isn't reentrant, so the event
+        callback only queues the finished paths.
+        """
+        with self._durations_lock:
+            parsed, self._parsed = self._parsed, []
+            finished = [
+                self._parsing.pop(parse_id)
+                for parse_id in parsed
+                if parse_id in self._parsing
+            ]
+
+        for track_path, media, _events in finished:
+            duration = media.get_duration()
+            if isinstance(duration, int) and duration > 0:
+                with self._durations_lock:
+                    self._durations[track_path] = duration
+                if track_path == self._current_path and self._duration <= 0:
+                    self._duration = duration
+
+    def _on_media_parsed(self, event, parse_id: int):
+        """Queue a finished parse (called from libVLC's event thread)."""
+        with self._durations_lock:
+            self._parsed.append(parse_id)
+
+    def get_track_duration(self, track_path: Union[str, Path]) -> int:
+        """
+        Get the duration of a track parsed earlier.
+
+        Args:
+            track_path: Path to the audio file
+
+        Returns:
+            int: Duration in milliseconds, or 0 if not known (yet)
+        """
+        self._reap_parsed()
+        track_path = normalize_track_path(track_path)
+        with self._durations_lock:
+            duration = self._durations.get(track_path, 0)
+        return duration or self._metadata_duration(track_path)
+
+    def _metadata_duration(self, track_path: str) -> int:
+        """Get a track's duration read from its headers, or 0."""
+        for track in self.playlist.find(track_path):
+            if track.duration:
+                return track.duration
+        return 0
+
+    def preparse_upcoming(self, count: Optional[int] = None) -> int:
+        """
+        Parse the next playlist entries in the background.
+
+        Their durations are then known before they are played.
+
+        Args:
+            count: Number of entries after the current one (default:
+                ``preparse_ahead``)
+
+        Returns:
+            int: Number of entries whose parsing was started
+        """
+        if count is None:
+            count = self.preparse_ahead
+        if not count or self.instance is None or self.current_index < 0:
+            return 0
+
+        started = 0
+        upcoming = self.playlist[
+            self.current_index + 1 : self.current_index + 1 + count
+        ]
+        for track in upcoming:
+            if track.duration:
+                continue  # Known from the file's headers
+            track_path = track.absolute_path
+            with self._durations_lock:
+                if track_path in self._durations or self._is_parsing(
+                    track_path
+                ):
+                    continue
+            media = self.instance.media_new(track_path)
+            if self._parse_async(track_path, media):
+                started += 1
+        return started
+
     def play(self, file_path: Optional[Union[str, Path]] = None) -> bool:
         """
         Play an audio file. If file_path is None, resume current track.
@@ -181,6 +720,8 @@ class Player:
         result = self.media_player.play()
         self._paused = False
         return result == 0
+
+    def pause(self):
         """Pause playback."""
         self.media_player.pause()
         self._paused = not self._paused
@@ -193,20 +734,24 @@ class Player:
 
     def next_track(self) -> bool:
         """Play the next track in the playlist."""
-        if not self.playlist or self.current_index >= len(self.playlist) - 1:
-            return False
+        if self._gapless and self._handover():
+            return True
 
-        self.current_index += 1
-        track = self.playlist[self.current_index]
+        # The watcher may change the playlist from its thread
+        with self._handover_lock:
+            if self.current_index >= len(self.playlist) - 1:
+                return False
+            self.current_index += 1
+            track = self.playlist[self.current_index]
         return self.play(track["path"])
 
     def previous_track(self) -> bool:
         """Play the previous track in the playlist."""
-        if not self.playlist or self.current_index <= 0:
-            return False
-
-        self.current_index -= 1
-        track = self.playlist[self.current_index]
+        with self._handover_lock:
+            if self.current_index <= 0 or not self.playlist:
+                return False
+            self.current_index -= 1
+            track = self.playlist[self.current_index]
         return self.play(track["path"])
 
     def add_to_playlist(self, file_path: Union[str, Path]) -> bool:
@@ -221,15 +766,8 @@ class Player:
             print(f"Format not supported: {path.suffix[1:]}")
             return False
 
-        # Extract metadata if possible
-        title = path.stem
-
-        track = {
-            "path": str(path),
-            "title": title,
-        }
-
-        self.playlist.append(track)
+        # Tags and duration are filled in by load_metadata
+        self.playlist.append(Track(path))
 
         # If this is the first track added, set the current index
         if len(self.playlist) == 1:
@@ -239,32 +777,190 @@ class Player:
 
     def clear_playlist(self):
         """Clear the playlist."""
-        self.playlist = []
+        self.playlist.clear()
         self.current_index = -1
 
-    def load_playlist(self, directory: Union[str, Path]) -> int:
+    def load_playlist(
+        self, directory: Union[str, Path], play_first: bool = False
+    ) -> int:
         """
         Load all supported audio files from a directory into the playlist.
 
+        Tracks are added as the directory tree is scanned; directories
+        loaded before are rescanned incrementally from the library index.
+
         Args:
             directory: Path to directory
+            play_first: Start playing the first track found, as soon as it
+                is found, if nothing is loaded yet
 
         Returns:
             int: Number of tracks added
         """
-        path = Path(directory)
-        if not path.exists() or not path.is_dir():
-            print(f"Directory not found: {path}")
+        try:
+            files = iter_library_files(directory, self.SUPPORTED_FORMATS)
+            count = 0
+            for file_path in files:
+                self.playlist.append(Track(file_path))
+                count += 1
+                if count == 1 and self.current_index < 0:
+                    self.current_index = 0
+                    if play_first and self.current_media is None:
+                        self.play(file_path)
+        except FileNotFoundError:
+            print(f"Directory not found: {Path(directory)}")
             return 0
 
-        count = 0
-        for file_path in path.glob("**/*"):
-            if file_path.is_file() and self._is_format_supported(file_path):
-                if self.add_to_playlist(file_path):
-                    count += 1
-
+        if count and get_setting("library", "read_metadata", True):
+            self.load_metadata()
         return count
 
+    def load_metadata(self, wait: bool = False) -> int:
+        """
+        Read the tags and durations of the playlist's tracks.
+
+        Tracks whose metadata isn't known yet are read by a pool of worker
+        processes, or come from the metadata cache if their files haven't
+        changed since they were last read. The tracks are updated batch by
+        batch, and ``metadata_changed`` is sent with the paths of each
+        batch. A read still running from an earlier call is abandoned.
+
+        Args:
+            wait: Read on the calling thread and return when done, instead
+                of on a background thread
+
+        Returns:
+            int: Number of files to read
+        """
+        self._stop_metadata()
+        paths = list(
+            dict.fromkeys(
+                track.absolute_path
+                for track in self.playlist
+                if track.duration is None
+            )
+        )
+        if not paths:
+            return 0
+
+        stop = threading.Event()
+        cache = get_metadata_cache()
+        if wait:
+            self._read_metadata(paths, cache, stop)
+        else:
+            self._metadata_stop = stop
+            threading.Thread(
+                target=self._read_metadata,
+                args=(paths, cache, stop),
+                name="dolboebify-metadata",
+                daemon=True,
+            ).start()
+        return len(paths)
+
+    def _stop_metadata(self):
+        """Abandon the background metadata read, if any."""
+        stop, self._metadata_stop = self._metadata_stop, None
+        if stop is not None:
+            stop.set()
+
+    def _read_metadata(
+        self, paths: List[str], cache: MetadataCache, stop: threading.Event
+    ):
+        """Read metadata and apply it to the playlist in batches."""
+        results = extract_metadata(paths, cache=cache)
+        batch = []
+        try:
+            for entry in results:
+                if stop.is_set():
+                    return
+                batch.append(entry)
+                if len(batch) >= METADATA_BATCH_SIZE:
+                    self._apply_metadata(batch)
+                    batch = []
+            if batch and not stop.is_set():
+                self._apply_metadata(batch)
+        except Exception as e:
+            print(f"Error reading track metadata: {e}")
+        finally:
+            results.close()
+
+    def _apply_metadata(self, batch: List[tuple]):
+        """Fill in the metadata of a batch of tracks."""
+        self.playlist.apply_metadata(batch)
+        self._events.post("metadata_changed", [path for path, _ in batch])
+
+    def watch_library(
+        self, directory: Union[str, Path], use_inotify: bool = True
+    ) -> LibraryWatcher:
+        """
+        Keep the playlist in sync with a directory as files change.
+
+        Files added to, removed from or renamed in the directory are
+        applied to the playlist in coalesced batches (on the watcher's
+        thread), and ``library_changed`` is sent with each batch. The tags
+        and durations of added and rewritten files are read again, and in
+        gapless mode the standby player follows a change of the next
+        entry. Only one directory is watched at a time.
+
+        Args:
+            directory: Path to directory (usually one passed to
+                ``load_playlist``)
+            use_inotify: Whether to use inotify where available instead of
+                polling
+
+        Returns:
+            LibraryWatcher: The running watcher
+
+        Raises:
+            FileNotFoundError: If the directory doesn't exist
+        """
+        self.unwatch_library()
+        self._watcher = LibraryWatcher(
+            directory,
+            self._apply_library_delta,
+            extensions=self.SUPPORTED_FORMATS,
+            use_inotify=use_inotify,
+        ).start()
+        return self._watcher
+
+    def unwatch_library(self):
+        """Stop keeping the playlist in sync with a directory."""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    def _apply_library_delta(self, delta: LibraryDelta):
+        """Apply a batch of file changes to the playlist."""
+        # Held so next_track and the gapless handover (on libVLC's event
+        # thread) never see the playlist and current index out of step
+        with self._handover_lock:
+            self.current_index = self.playlist.apply_changes(
+                added=[Track(path) for path in delta.added],
+                removed=delta.removed,
+                moved=delta.moved,
+                current=self.current_index,
+            )
+            # Rewritten files: forget what was read from them, so
+            # load_metadata reads them again
+            for path in delta.modified:
+                for track in self.playlist.find(path):
+                    track.duration = None
+            with self._durations_lock:
+                for path in delta.modified:
+                    self._durations.pop(normalize_track_path(path), None)
+            if self._gapless:
+                rewritten = {normalize_track_path(p) for p in delta.modified}
+                if self._standby_path in rewritten:
+                    self._clear_standby()
+                if self._upcoming_path() != self._standby_path:
+                    self._prepare_standby()
+
+        self._events.post("library_changed", delta)
+        if (delta.added or delta.modified) and get_setting(
+            "library", "read_metadata", True
+        ):
+            self.load_metadata()
+
     def set_track_image(
         self, track_path: Union[str, Path], image_path: Union[str, Path]
     ) -> bool:
@@ -300,57 +996,53 @@ class Player:
             )
 
         # Store the association
-        self._track_images[str(track_path.absolute())] = str(
-            image_path.absolute()
-        )
+        image = str(image_path.absolute())
+        self._track_images[normalize_track_path(track_path)] = image
 
         # If the track is in the playlist, update its metadata
-        for track in self.playlist:
-            if Path(track["path"]).absolute() == track_path.absolute():
-                track["image"] = str(image_path.absolute())
+        self.playlist.set_image(track_path, image)
 
         return True
 
-    def get_track_image(self, track_path: Union[str, Path]) -> Optional[str]:
+    def get_track_image(
+        self, track_path: Union[str, Path], block: bool = True
+    ) -> Optional[str]:
         """
         Get the image path associated with a specific track.
 
         Args:
             track_path: Path to the audio file
+            block: Wait for throttled providers and for the same lookup
+                running in another thread; if False, give up on them at
+                once (for callers that retry the lookup later)
 
         Returns:
             Optional[str]: Path to the image file, or None if no image is associated
         """
-        track_path = str(Path(track_path).absolute())
+        track_path = normalize_track_path(track_path)
 
         # Check if we have a custom image set for this track
         if track_path in self._track_images:
             return self._track_images[track_path]
 
         # Look for standard cover files in the track's directory
-        path = Path(track_path)
-        for name in (
-            "cover.jpg",
-            "folder.jpg",
-            "front.jpg",
-            "album.jpg",
-            "artwork.jpg",
-        ):
-            cover_path = path.parent / name
-            if cover_path.exists():
-                return str(cover_path)
+        sidecar_cover = find_sidecar_cover(track_path)
+        if sidecar_cover:
+            return sidecar_cover
+
+        # Use artwork embedded in the file's tags before going online
+        embedded_cover = get_embedded_cover(track_path)
+        if embedded_cover:
+            return embedded_cover
 
         # If no local cover found, try fetching from online sources
-        online_cover = fetch_cover_art(track_path)
+        online_cover = fetch_cover_art(track_path, block=block)
         if online_cover:
             # Cache this association for future use
             self._track_images[track_path] = online_cover
 
             # Update playlist entry if this track is in the playlist
-            for track in self.playlist:
-                track_path_abs = Path(track["path"]).absolute()
-                if track_path_abs == Path(track_path).absolute():
-                    track["image"] = online_cover
+            self.playlist.set_image(track_path, online_cover)
 
             return online_cover
 
@@ -366,19 +1058,13 @@ class Player:
         Returns:
             bool: True if an association was removed, False if none existed
         """
-        track_path = str(Path(track_path).absolute())
+        track_path = normalize_track_path(track_path)
 
         if track_path in self._track_images:
             del self._track_images[track_path]
 
             # Update any playlist entries
-            for track in self.playlist:
-                is_match = (
-                    Path(track["path"]).absolute()
-                    == Path(track_path).absolute()
-                )
-                if is_match and "image" in track:
-                    del track["image"]
+            self.playlist.set_image(track_path, None)
 
             return True
 
@@ -0,0 +1,436 @@
+"""Playlist entries and a playlist container indexed by track path."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from dolboebify.utils.metadata import TrackMetadata
+
+# Track fields readable with ``track[key]`` (as the former dict entries)
+_TRACK_KEYS = (
+    "path",
+    "title",
+    "image",
+    "artist",
+    "album",
+    "track_number",
+    "duration",
+)
+
+# Track fields that may be unset (None)
+_OPTIONAL_KEYS = _TRACK_KEYS[2:]
+
+
+def normalize_track_path(path: Union[str, Path]) -> str:
+    """
+    Get the absolute form of a track path used to index playlists.
+
+    Args:
+        path: Path to the audio file
+
+    Returns:
+        str: Absolute, normalized path
+    """
+    return os.path.abspath(os.fspath(path))
+
+
+class Track:
+    """A playlist entry.
+
+    The absolute path is computed once, when the entry is created. Entries
+    also support ``track["path"]``, ``"image" in track``, ``get`` and
+    ``del track["image"]`` like the dicts playlists used to hold.
+
+    The artist, album, track number and duration (in milliseconds) are
+    None until filled in from the file's tags (see ``apply_metadata``).
+    """
+
+    __slots__ = (
+        "path",
+        "absolute_path",
+        "title",
+        "image",
+        "artist",
+        "album",
+        "track_number",
+        "duration",
+    )
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        title: Optional[str] = None,
+        image: Optional[str] = None,
+    ):
+        """
+        Initialize a track.
+
+        Args:
+            path: Path to the audio file, kept as given
+            title: Display title (default: the file name without extension)
+            image: Path to the track's cover image
+        """
+        self.path = os.fspath(path)
+        self.absolute_path = normalize_track_path(self.path)
+        if title is None:
+            title = os.path.splitext(os.path.basename(self.path))[0]
+        self.title = title
+        self.image = image
+        self.artist: Optional[str] = None
+        self.album: Optional[str] = None
+        self.track_number: Optional[int] = None
+        self.duration: Optional[int] = None
+
+    @classmethod
+    def restore(
+        cls,
+        path: str,
+        absolute_path: str,
+        title: str,
+        artist: Optional[str] = None,
+        album: Optional[str] = None,
+        track_number: Optional[int] = None,
+        duration: Optional[int] = None,
+    ) -> "Track":
+        """
+        Recreate a saved track without resolving its path again.
+
+        Args:
+            path: Path to the audio file, as given when it was added
+            absolute_path: Its ``normalize_track_path`` form
+            title: Display title
+            artist: Artist from the tags
+            album: Album from the tags
+            track_number: Track number from the tags
+            duration: Duration in milliseconds
+
+        Returns:
+            Track: The track
+        """
+        track = cls.__new__(cls)
+        track.path = path
+        track.absolute_path = absolute_path
+        track.title = title
+        track.image = None
+        track.artist = artist
+        track.album = album
+        track.track_number = track_number
+        track.duration = duration
+        return track
+
+    def __repr__(self) -> str:
+        """Get a debugging representation."""
+        return f"Track({self.path!r}, title={self.title!r})"
+
+    def __eq__(self, other) -> bool:
+        """Compare with another track, or with a dict entry."""
+        if isinstance(other, Track):
+            return all(
+                getattr(self, key) == getattr(other, key)
+                for key in _TRACK_KEYS
+            )
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __getitem__(self, key: str):
+        """Get a field by name; an unset field raises KeyError."""
+        if key not in _TRACK_KEYS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        """Set a field other than the path (fixed once indexed)."""
+        if key not in _TRACK_KEYS or key == "path":
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str):
+        """Unset an optional field such as the image."""
+        if key not in _OPTIONAL_KEYS or getattr(self, key) is None:
+            raise KeyError(key)
+        setattr(self, key, None)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether a field is set."""
+        return key in _TRACK_KEYS and getattr(self, key) is not None
+
+    def get(self, key: str, default=None):
+        """Get a field by name, or a default if it isn't set."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Union[str, int]]:
+        """Get the track as a dict with only the fields that are set."""
+        return {key: self[key] for key in _TRACK_KEYS if key in self}
+
+    def apply_metadata(self, metadata: TrackMetadata):
+        """
+        Fill in the fields read from the file's tags and headers.
+
+        Fields the metadata doesn't know are left as they are, so a track
+        without a title tag keeps its file name as title.
+
+        Args:
+            metadata: Metadata of the track's file
+        """
+        for key, value in zip(TrackMetadata._fields, metadata):
+            if value is not None:
+                setattr(self, key, value)
+
+    def renamed(self, path: Union[str, Path]) -> "Track":
+        """
+        Get the entry of this track's file after a rename or move.
+
+        The image and the metadata carry over; a title that was derived
+        from the old file name is derived from the new one.
+
+        Args:
+            path: New path of the audio file
+
+        Returns:
+            Track: The new entry
+        """
+        track = Track(path, image=self.image)
+        if self.title != Track(self.path).title:
+            track.title = self.title
+        for key in TrackMetadata._fields[1:]:
+            setattr(track, key, getattr(self, key))
+        return track
+
+
+class Playlist:
+    """An ordered list of tracks with an index from path to positions.
+
+    Finding the entries of a path (e.g. to update their image) is a
+    dictionary lookup instead of a scan of the whole playlist. Paths are
+    indexed in their ``normalize_track_path`` form.
+
+    ``revision`` changes whenever entries are removed or moved (appending
+    doesn't change it), so a saved copy can tell whether it only needs
+    the entries added since.
+
+    Changes and lookups hold a lock, so a lookup from another thread
+    (e.g. the folder watcher or the metadata loader) never pairs the
+    index of one version of the playlist with the list of another.
+    """
+
+    def __init__(self, tracks: Iterable[Track] = ()):
+        """
+        Initialize a playlist.
+
+        Args:
+            tracks: Initial tracks
+        """
+        self._lock = threading.RLock()
+        self._tracks: List[Track] = []
+        # Position of each path; a list only for paths listed more than once
+        self._index: Dict[str, Union[int, List[int]]] = {}
+        self.revision = 0
+        self.extend(tracks)
+
+    def __len__(self) -> int:
+        """Get the number of tracks."""
+        return len(self._tracks)
+
+    def __iter__(self) -> Iterator[Track]:
+        """Iterate over the tracks in order."""
+        return iter(self._tracks)
+
+    def __getitem__(self, position: Union[int, slice]):
+        """Get a track, or a list of tracks for a slice."""
+        with self._lock:
+            return self._tracks[position]
+
+    def __eq__(self, other) -> bool:
+        """Compare with another playlist or a list of tracks."""
+        if isinstance(other, Playlist):
+            return self._tracks == other._tracks
+        if isinstance(other, list):
+            return self._tracks == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __contains__(self, path) -> bool:
+        """Check whether a track (or a track path) is in the playlist."""
+        if isinstance(path, Track):
+            path = path.absolute_path
+        else:
+            path = normalize_track_path(path)
+        with self._lock:
+            return path in self._index
+
+    def __repr__(self) -> str:
+        """Get a debugging representation."""
+        return f"Playlist({len(self._tracks)} tracks)"
+
+    def append(self, track: Track):
+        """Add a track at the end."""
+        with self._lock:
+            position = len(self._tracks)
+            self._tracks.append(track)
+
+            key = track.absolute_path
+            existing = self._index.get(key)
+            if existing is None:
+                self._index[key] = position
+            elif isinstance(existing, list):
+                existing.append(position)
+            else:
+                self._index[key] = [existing, position]
+
+    def extend(self, tracks: Iterable[Track]):
+        """Add tracks at the end."""
+        with self._lock:
+            for track in tracks:
+                self.append(track)
+
+    def clear(self):
+        """Remove all tracks."""
+        with self._lock:
+            self._tracks.clear()
+            self._index.clear()
+            self.revision += 1
+
+    def apply_changes(
+        self,
+        added: Iterable[Track] = (),
+        removed: Iterable[Union[str, Path]] = (),
+        moved: Iterable[Tuple[Union[str, Path], Union[str, Path]]] = (),
+        current: int = -1,
+    ) -> int:
+        """
+        Apply changes of the files on disk in one pass.
+
+        Args:
+            added: Tracks appended at the end
+            removed: Paths whose entries are dropped
+            moved: (old path, new path) pairs; the entries of the old path
+                are renamed in place, keeping their position, image and
+                metadata
+            current: Position of the current entry
+
+        Returns:
+            int: The new position of the current entry. If it was removed,
+            the entry now at its position (or the last one); -1 if the
+            playlist is empty.
+        """
+        moves = {normalize_track_path(old): new for old, new in moved}
+        gone = {normalize_track_path(path) for path in removed}
+        added = list(added)
+        with self._lock:
+            new_current = current
+            if moves or gone:
+                tracks = []
+                for position, track in enumerate(self._tracks):
+                    if position == current:
+                        new_current = len(tracks)
+                    key = track.absolute_path
+                    if key in gone:
+                        continue
+                    new = moves.get(key)
+                    if new is not None:
+                        track = track.renamed(new)
+                    tracks.append(track)
+                rebuilt = Playlist(tracks)
+                self._tracks, self._index = rebuilt._tracks, rebuilt._index
+                self.revision += 1
+            self.extend(added)
+
+            if not self._tracks:
+                return -1
+            return min(max(new_current, 0), len(self._tracks) - 1)
+
+    def indices(self, path: Union[str, Path]) -> List[int]:
+        """
+        Get the positions of a track path.
+
+        Args:
+            path: Path to the audio file
+
+        Returns:
+            List[int]: Positions in ascending order (empty if not listed)
+        """
+        key = normalize_track_path(path)
+        with self._lock:
+            found = self._index.get(key)
+            if found is None:
+                return []
+            if isinstance(found, list):
+                return list(found)
+            return [found]
+
+    def index_of(self, path: Union[str, Path]) -> Optional[int]:
+        """
+        Get the first position of a track path.
+
+        Args:
+            path: Path to the audio file
+
+        Returns:
+            Optional[int]: The position, or None if the path isn't listed
+        """
+        key = normalize_track_path(path)
+        with self._lock:
+            found = self._index.get(key)
+            if isinstance(found, list):
+                return found[0]
+            return found
+
+    def find(self, path: Union[str, Path]) -> List[Track]:
+        """
+        Get the entries of a track path.
+
+        Args:
+            path: Path to the audio file
+
+        Returns:
+            List[Track]: The entries, in playlist order
+        """
+        with self._lock:
+            return [self._tracks[i] for i in self.indices(path)]
+
+    def apply_metadata(
+        self, entries: Iterable[Tuple[Union[str, Path], TrackMetadata]]
+    ) -> int:
+        """
+        Fill in the metadata of every entry of the given paths.
+
+        Args:
+            entries: (track path, metadata) pairs, e.g. from
+                ``utils.metadata.extract_metadata``
+
+        Returns:
+            int: Number of entries updated
+        """
+        updated = 0
+        for path, metadata in entries:
+            for track in self.find(path):
+                track.apply_metadata(metadata)
+                updated += 1
+        return updated
+
+    def set_image(self, path: Union[str, Path], image: Optional[str]) -> int:
+        """
+        Set (or with None, remove) the image of every entry of a path.
+
+        Args:
+            path: Path to the audio file
+            image: Path to the image file, or None
+
+        Returns:
+            int: Number of entries updated
+        """
+        tracks = self.find(path)
+        for track in tracks:
+            track.image = image
+        return len(tracks)
@@ -0,0 +1,390 @@
+"""Snapshot of the player session: playlist, current track and artwork.
+
+The session is kept in a small SQLite database and written incrementally:
+tracks appended to the playlist are added as new rows, metadata and
+artwork changes update single rows, and the current track and position
+are one row each. Only removing or moving entries rewrites the playlist.
+
+Tracks are stored with ``position`` as the table's rowid, so they are
+laid out in playlist order and read back with one sequential scan, and
+the database is memory-mapped, so a restore reads straight from the page
+cache. Nothing is read until it is asked for: ``load_state`` is a single
+lookup, and the tracks can be streamed in chunks with ``iter_tracks`` or
+restored into a playlist batch by batch with ``iter_restore``.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from dolboebify.core.playlist import Playlist, Track, normalize_track_path
+from dolboebify.utils.dbutils import connect_db
+
+# Default location of the session snapshot
+SESSION_FILE = Path.home() / ".cache" / "dolboebify" / "session.sqlite3"
+
+# Bytes of the database memory-mapped for reading
+SESSION_MMAP_SIZE = 256 * 1024 * 1024
+
+# Tracks fetched per query when streaming the playlist
+RESTORE_CHUNK_SIZE = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    position INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    absolute_path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT,
+    album TEXT,
+    track_number INTEGER,
+    duration INTEGER
+);
+CREATE TABLE IF NOT EXISTS images (
+    track TEXT PRIMARY KEY,
+    image TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value
+) WITHOUT ROWID;
+"""
+
+_TRACK_COLUMNS = (
+    "path, absolute_path, title, artist, album, track_number, duration"
+)
+
+
+class SessionState(NamedTuple):
+    """Where playback was when the session was saved."""
+
+    # Position of the current track in the playlist, or -1
+    current_index: int = -1
+    # Playback position in the current track, in seconds
+    position: float = 0.0
+
+
+def _track_row(position: int, track: Track) -> tuple:
+    """Get the database row of a playlist entry."""
+    return (
+        position,
+        track.path,
+        track.absolute_path,
+        track.title,
+        track.artist,
+        track.album,
+        track.track_number,
+        track.duration,
+    )
+
+
+class SessionStore:
+    """Player session persisted in a small SQLite database."""
+
+    def __init__(self, path: Union[str, Path, None] = SESSION_FILE):
+        """
+        Initialize the store.
+
+        Args:
+            path: Database file, or None to keep the session in memory only
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # The playlist saved last, its revision and its length then
+        self._saved: Optional[Playlist] = None
+        self._saved_revision = -1
+        self._saved_count = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)."""
+        if self._conn is None:
+            self._conn = connect_db(self.path, _SCHEMA)
+            self._conn.execute(f"PRAGMA mmap_size = {SESSION_MMAP_SIZE}")
+        return self._conn
+
+    def __len__(self) -> int:
+        """Get the number of tracks saved."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT MAX(position) FROM tracks")
+                .fetchone()
+            )
+        return 0 if row[0] is None else row[0] + 1
+
+    def save_playlist(self, playlist: Playlist) -> int:
+        """
+        Save the playlist, writing only what changed since the last save.
+
+        If entries were only appended to the playlist saved last, just the
+        new ones are written; otherwise the saved playlist is replaced.
+
+        Args:
+            playlist: The playlist
+
+        Returns:
+            int: Number of tracks written
+        """
+        with self._lock:
+            conn = self._connect()
+            start = 0
+            if (
+                playlist is self._saved
+                and playlist.revision == self._saved_revision
+                and len(playlist) >= self._saved_count
+            ):
+                start = self._saved_count
+            tracks = playlist[start:]
+            with conn:
+                if start == 0:
+                    conn.execute("DELETE FROM tracks")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tracks VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        _track_row(position, track)
+                        for position, track in enumerate(tracks, start)
+                    ),
+                )
+            self._saved = playlist
+            self._saved_revision = playlist.revision
+            self._saved_count = len(playlist)
+        return len(tracks)
+
+    def update_tracks(
+        self, playlist: Playlist, paths: Iterable[Union[str, Path]]
+    ) -> int:
+        """
+        Save the current fields (e.g. new metadata) of some entries.
+
+        Args:
+            playlist: The playlist, as saved last
+            paths: Paths of the entries to save
+
+        Returns:
+            int: Number of tracks written
+        """
+        rows = []
+        for path in paths:
+            for position in playlist.indices(path):
+                rows.append(_track_row(position, playlist[position]))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "UPDATE tracks SET path = ?2, absolute_path = ?3, "
+                    "title = ?4, artist = ?5, album = ?6, track_number = ?7, "
+                    "duration = ?8 WHERE position = ?1",
+                    rows,
+                )
+        return len(rows)
+
+    def save_state(self, current_index: int, position: float):
+        """
+        Save the current track and playback position.
+
+        Args:
+            current_index: Position of the current track in the playlist
+            position: Playback position in the current track, in seconds
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO state VALUES (?, ?)",
+                    (("current_index", current_index), ("position", position)),
+                )
+
+    def set_image(self, track_path: Union[str, Path], image: Optional[str]):
+        """
+        Save (or with None, forget) the image associated with a track.
+
+        Args:
+            track_path: Path to the audio file
+            image: Path to the image file, or None
+        """
+        self.set_images({track_path: image})
+
+    def set_images(
+        self, images: Mapping[Union[str, Path], Optional[str]]
+    ) -> int:
+        """
+        Save (or with None, forget) the images of many tracks at once.
+
+        Args:
+            images: Image path, or None, by track path
+
+        Returns:
+            int: Number of tracks written
+        """
+        rows = [
+            (normalize_track_path(track_path), image)
+            for track_path, image in images.items()
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "DELETE FROM images WHERE track = ?",
+                    ((track,) for track, image in rows if image is None),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO images VALUES (?, ?)",
+                    (
+                        (track, image)
+                        for track, image in rows
+                        if image is not None
+                    ),
+                )
+        return len(rows)
+
+    def save_images(self, images: Dict[str, str]):
+        """
+        Replace the saved track -> image associations.
+
+        Args:
+            images: Image path by absolute track path
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM images")
+                conn.executemany(
+                    "INSERT INTO images VALUES (?, ?)", images.items()
+                )
+
+    def load_state(self) -> SessionState:
+        """Get the saved current track and playback position."""
+        with self._lock:
+            values = dict(
+                self._connect().execute("SELECT key, value FROM state")
+            )
+        return SessionState(
+            current_index=int(values.get("current_index", -1)),
+            position=float(values.get("position", 0.0)),
+        )
+
+    def load_images(self) -> Dict[str, str]:
+        """
+        Get the saved image path of each (absolute) track path.
+
+        The image files aren't checked: one may be gone (e.g. evicted from
+        the cover cache), which the caller finds out when it shows it.
+        """
+        with self._lock:
+            return dict(
+                self._connect().execute("SELECT track, image FROM images")
+            )
+
+    def iter_tracks(self, start: int = 0) -> Iterator[Track]:
+        """
+        Stream the saved playlist in chunks.
+
+        Args:
+            start: Position of the first track
+
+        Yields:
+            Track: Each track, in playlist order (without its image; see
+            ``load_images``)
+        """
+        position = start
+        while True:
+            with self._lock:
+                rows = (
+                    self._connect()
+                    .execute(
+                        f"SELECT {_TRACK_COLUMNS} FROM tracks "
+                        "WHERE position >= ? ORDER BY position LIMIT ?",
+                        (position, RESTORE_CHUNK_SIZE),
+                    )
+                    .fetchall()
+                )
+            for row in rows:
+                yield Track.restore(*row)
+            if len(rows) < RESTORE_CHUNK_SIZE:
+                return
+            position += len(rows)
+
+    def iter_restore(
+        self, playlist: Playlist, images: Optional[Dict[str, str]] = None
+    ) -> Iterator[int]:
+        """
+        Append the saved playlist to an empty one, a chunk per step.
+
+        Each step reads ``RESTORE_CHUNK_SIZE`` tracks, so a caller can show
+        the first tracks (and play the current one) before the rest are
+        read. Once every track has been restored, and if the playlist
+        wasn't changed meanwhile, later saves of it only write what
+        changes.
+
+        Args:
+            playlist: Empty playlist to fill
+            images: Saved images to apply (default: ``load_images``)
+
+        Yields:
+            int: Number of tracks added by each step
+        """
+        if images is None:
+            images = self.load_images()
+        revision = playlist.revision
+        restored = 0
+        chunk = []
+        for track in self.iter_tracks():
+            track.image = images.get(track.absolute_path)
+            chunk.append(track)
+            if len(chunk) >= RESTORE_CHUNK_SIZE:
+                playlist.extend(chunk)
+                restored += len(chunk)
+                yield len(chunk)
+                chunk = []
+        if chunk:
+            playlist.extend(chunk)
+            restored += len(chunk)
+            yield len(chunk)
+
+        if playlist.revision == revision and len(playlist) == restored:
+            with self._lock:
+                self._saved = playlist
+                self._saved_revision = playlist.revision
+                self._saved_count = len(playlist)
+
+    def restore_playlist(self) -> Playlist:
+        """
+        Load the whole saved playlist, with the saved images applied.
+
+        Later saves of the returned playlist only write what changes.
+
+        Returns:
+            Playlist: The playlist (empty if nothing was saved)
+        """
+        playlist = Playlist()
+        for _ in self.iter_restore(playlist):
+            pass
+        return playlist
+
+    def clear(self):
+        """Forget the whole session."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for table in ("tracks", "images", "state"):
+                    conn.execute(f"DELETE FROM {table}")
+            self._saved = None
+            self._saved_count = 0
+
+    def close(self):
+        """Close the database (it is reopened on next use)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
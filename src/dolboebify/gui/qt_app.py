@@ -4,9 +4,14 @@ Dolboebify 2.0 – futuristic dark-neon MP3 player че гпт пишет воо
 Requires:  pacman -S python-pyqt5 python-pygame
 """
 
+import asyncio
+import os
 import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import pygame
 from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, pyqtSlot
@@ -17,7 +22,6 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QListWidget,
-    QListWidgetItem,
     QMainWindow,
     QPushButton,
     QSlider,
@@ -26,7 +30,22 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
-from dolboebify.utils.coverart import fetch_cover_art
+from dolboebify.core.playlist import Playlist, Track, normalize_track_path
+from dolboebify.core.session import SessionStore
+from dolboebify.utils.config import get_setting
+from dolboebify.utils.coverart import (
+    fetch_cover_art,
+    get_cover_thumbnail,
+    get_embedded_cover,
+)
+from dolboebify.utils.library import iter_library_files
+from dolboebify.utils.metadata import METADATA_BATCH_SIZE, extract_metadata
+from dolboebify.utils.prefetch import prefetch_covers
+from dolboebify.utils.sidecar import find_sidecar_cover
+from dolboebify.utils.watcher import LibraryWatcher
+
+# Minimum interval (seconds) between saves of the playback position
+SESSION_SAVE_INTERVAL = 5.0
 
 # Ensure Qt constants are available
 # Alignment flags
@@ -109,19 +128,115 @@ class CoverArtFetcher(QThread):
         if cover_path:
             # Emit signal with track path and cover path
             self.cover_found.emit(
-                str(Path(self.track_path).absolute()), cover_path
+                normalize_track_path(self.track_path), cover_path
             )
 
 
+# Thread warming the cover cache for a whole playlist
+class CoverPrefetcher(QThread):
+    # Signal to be emitted for every cover found
+    cover_found = pyqtSignal(str, str)
+
+    def __init__(self, track_paths):
+        super().__init__()
+        self.track_paths = list(track_paths)
+        self._loop = None
+        self._task = None
+        self._stopped = False
+
+    def run(self):
+        # Run the asyncio prefetch engine on this thread's own event loop
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self._prefetch())
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    async def _prefetch(self):
+        async for track_path, cover_path in prefetch_covers(self.track_paths):
+            if self._stopped:
+                break
+            if cover_path:
+                self.cover_found.emit(
+                    normalize_track_path(track_path), cover_path
+                )
+
+    def stop(self):
+        # Cancel the prefetch from any thread
+        self._stopped = True
+        loop, task = self._loop, self._task
+        if loop is None or task is None:
+            return
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            pass  # Loop already closed
+
+
+# Thread reading track tags and durations for a whole playlist
+class MetadataLoader(QThread):
+    # Signal to be emitted with each batch of (track path, metadata)
+    metadata_loaded = pyqtSignal(list)
+
+    def __init__(self, track_paths):
+        super().__init__()
+        self.track_paths = list(dict.fromkeys(track_paths))
+        self._cancel = threading.Event()
+
+    def run(self):
+        # Cached files come first, the rest as the worker processes finish
+        results = extract_metadata(self.track_paths, cancel=self._cancel)
+        batch = []
+        try:
+            for entry in results:
+                if self._cancel.is_set():
+                    return
+                batch.append(entry)
+                if len(batch) >= METADATA_BATCH_SIZE:
+                    self.metadata_loaded.emit(batch)
+                    batch = []
+            if batch and not self._cancel.is_set():
+                self.metadata_loaded.emit(batch)
+        except Exception as e:
+            # E.g. a worker process dying (BrokenProcessPool)
+            print(f"Error reading track metadata: {e}")
+        finally:
+            results.close()
+
+    def stop(self):
+        # Stop soon, from any thread; batches already emitted still arrive
+        self._cancel.set()
+
+
 # ---------- TinyBackend ----------
 class TinyBackend:
     def __init__(self):
         pygame.mixer.init()
-        self._playlist = []
+        self._playlist = Playlist()
         self._idx = -1
         self._vol = 0.5
         self._duration = 0
+        self._start = 0.0  # Position (seconds) playback was started at
+        self._resume_at = None  # Restored position of the current track
         self._track_images = {}  # Maps track paths to image paths
+        self._image_changes = {}  # Image changes not written to the session
+        self._watcher = None
+        self.session = None  # SessionStore image changes are written to
+
+        # Supported audio formats
+        self.SUPPORTED_FORMATS = (
+            "mp3",
+            "flac",
+            "wav",
+            "ogg",
+            "m4a",
+            "aac",
+            "opus",
+        )
 
         # Supported image formats
         self.SUPPORTED_IMAGE_FORMATS = [
@@ -138,52 +253,126 @@ class TinyBackend:
         self._idx = -1
 
     def add_to_playlist(self, path):
-        self._playlist.append({"path": str(path), "title": Path(path).stem})
-
-    def load_playlist(self, folder: str) -> int:
-        folder_path = Path(folder)
-        exts = (
-            "*.mp3",
-            "*.flac",
-            "*.wav",
-            "*.ogg",
-            "*.m4a",
-            "*.aac",
-            "*.opus",
+        self._playlist.append(Track(path))
+
+    def load_playlist(self, folder: str, play_first: bool = False) -> int:
+        count = 0
+        try:
+            for f in iter_library_files(folder, self.SUPPORTED_FORMATS):
+                self.add_to_playlist(f)
+                count += 1
+                # Start with the first hit instead of after the whole scan
+                if count == 1 and play_first and self._idx < 0:
+                    self.play_index(len(self._playlist) - 1)
+        except FileNotFoundError as e:
+            print(e)
+        return count
+
+    def watch_library(self, folder, on_change):
+        """
+        Watch a folder for files being added, removed or changed.
+
+        The backend isn't touched on the watcher's thread: ``on_change``
+        should hand each delta to the GUI thread, which applies it with
+        ``apply_library_delta``.
+
+        Args:
+            folder: Folder to watch
+            on_change: Called with each LibraryDelta, on the watcher's
+                thread
+        """
+        self.unwatch_library()
+        self._watcher = LibraryWatcher(
+            folder, on_change, extensions=self.SUPPORTED_FORMATS
+        ).start()
+
+    def apply_library_delta(self, delta):
+        """
+        Apply a batch of file changes to the playlist (on the GUI thread).
+
+        Rewritten files lose their duration, so the next metadata load
+        reads them again.
+        """
+        self._idx = self._playlist.apply_changes(
+            added=[Track(path) for path in delta.added],
+            removed=delta.removed,
+            moved=delta.moved,
+            current=self._idx,
         )
-        files = []
-        for ext in exts:
-            files.extend(folder_path.rglob(ext))
+        for path in delta.modified:
+            for track in self._playlist.find(path):
+                track.duration = None
+
+    def unwatch_library(self):
+        """Stop keeping the playlist in sync with a folder."""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    # session
+    def save_session(self, store):
+        """
+        Save the playlist and playback state to a session store.
 
-        for f in files:
-            self.add_to_playlist(str(f))
-        return len(files)
+        Only the entries added since the last save are written, unless
+        entries were removed or moved.
+        """
+        store.save_playlist(self._playlist)
+        store.save_state(self._idx, max(self.position, 0.0))
+
+    def restore_session(self, store) -> Iterator[int]:
+        """
+        Restore the images and playback state of a session, and start
+        restoring its playlist.
+
+        The playlist is filled a chunk at a time as the returned iterator
+        is advanced (see ``SessionStore.iter_restore``); the current track
+        is selected as soon as its chunk is in. Playback isn't started;
+        with ``player.remember_last_position``, the next play() of the
+        current track resumes where it was.
+
+        Returns:
+            Iterator[int]: Number of tracks added by each step
+        """
+        self._playlist = Playlist()
+        self._idx = -1
+        self._track_images = store.load_images()
+        state = store.load_state()
+        if get_setting("player", "remember_last_position", True):
+            self._resume_at = state.position or None
+        return self._restore_playlist(store, state.current_index)
+
+    def _restore_playlist(self, store, current_index) -> Iterator[int]:
+        playlist = self._playlist
+        for added in store.iter_restore(playlist, self._track_images):
+            if self._idx < 0 and 0 <= current_index < len(playlist):
+                self._idx = current_index
+            yield added
+        if self._idx < 0 and playlist:
+            self._idx = 0
 
     # playback
-    def play_index(self, idx):
+    def play_index(self, idx, start=0.0):
         if not (0 <= idx < len(self._playlist)):
             return
         self._idx = idx
-        pygame.mixer.music.load(self._playlist[idx]["path"])
-        pygame.mixer.music.play()
-        self._duration = pygame.mixer.Sound(
-            self._playlist[idx]["path"]
-        ).get_length()
+        self._resume_at = None
+        track = self._playlist[idx]
+        pygame.mixer.music.load(track["path"])
+        pygame.mixer.music.play(start=start)
+        self._start = start
+        if track.duration:
+            # Known from the file's headers: no need to decode it all
+            self._duration = track.duration / 1000
+        else:
+            self._duration = pygame.mixer.Sound(track["path"]).get_length()
 
     def play(self, path=None):
         if path is None:
-            self.play_index(self._idx)
+            self.play_index(self._idx, start=self._resume_at or 0.0)
         else:
-            self.play_index(
-                next(
-                    (
-                        i
-                        for i, t in enumerate(self._playlist)
-                        if t["path"] == str(path)
-                    ),
-                    0,
-                )
-            )
+            index = self._playlist.index_of(path)
+            self.play_index(index if index is not None else 0)
 
     def pause(self):
         pygame.mixer.music.pause()
@@ -215,7 +404,9 @@ class TinyBackend:
     # position
     @property
     def position(self):
-        return pygame.mixer.music.get_pos() / 1000
+        if self._resume_at is not None:
+            return self._resume_at  # Restored, not playing yet
+        return self._start + pygame.mixer.music.get_pos() / 1000
 
     @property
     def duration(self):
@@ -279,16 +470,29 @@ class TinyBackend:
             )
 
         # Store the association
-        self._track_images[str(track_path.absolute())] = str(
-            image_path.absolute()
-        )
+        self._remember_image(track_path, str(image_path.absolute()))
+        return True
 
-        # If the track is in the playlist, update its metadata
-        for track in self._playlist:
-            if Path(track["path"]).absolute() == track_path.absolute():
-                track["image"] = str(image_path.absolute())
+    def _remember_image(self, track_path, image):
+        """Associate an image (or with None, none) with a track."""
+        track_path = normalize_track_path(track_path)
+        if image is None:
+            self._track_images.pop(track_path, None)
+        else:
+            self._track_images[track_path] = image
 
-        return True
+        # If the track is in the playlist, update its metadata
+        self._playlist.set_image(track_path, image)
+        # Written in batches (see flush_images), as the prefetcher finds a
+        # cover for nearly every track
+        if self.session is not None:
+            self._image_changes[track_path] = image
+
+    def flush_images(self):
+        """Write the image changes since the last flush to the session."""
+        changes, self._image_changes = self._image_changes, {}
+        if changes and self.session is not None:
+            self.session.set_images(changes)
 
     def get_track_image(self, track_path) -> Optional[str]:
         """
@@ -300,36 +504,33 @@ class TinyBackend:
         Returns:
             Optional[str]: Path to the image file, or None if no image is associated
         """
-        track_path = str(Path(track_path).absolute())
+        track_path = normalize_track_path(track_path)
 
-        # Check if we have a custom image set for this track
-        if track_path in self._track_images:
-            return self._track_images[track_path]
+        # Check if we have a custom image set for this track (the restored
+        # ones aren't checked until shown: one may have been evicted from
+        # the cover cache, so its cover is looked up again)
+        image = self._track_images.get(track_path)
+        if image is not None:
+            if os.path.exists(image):
+                return image
+            self._remember_image(track_path, None)
 
         # Look for standard cover files in the track's directory
-        path = Path(track_path)
-        for name in (
-            "cover.jpg",
-            "folder.jpg",
-            "front.jpg",
-            "album.jpg",
-            "artwork.jpg",
-        ):
-            cover_path = path.parent / name
-            if cover_path.exists():
-                return str(cover_path)
-
-        # Try to fetch cover art from online sources
-        online_cover = fetch_cover_art(track_path)
+        sidecar_cover = find_sidecar_cover(track_path)
+        if sidecar_cover:
+            return sidecar_cover
+
+        # Use artwork embedded in the file's tags before going online
+        embedded_cover = get_embedded_cover(track_path)
+        if embedded_cover:
+            return embedded_cover
+
+        # Try online sources without waiting on throttled providers; a
+        # deferred lookup is finished by the background cover fetcher
+        online_cover = fetch_cover_art(track_path, block=False)
         if online_cover:
             # Cache this association for future use
-            self._track_images[track_path] = online_cover
-
-            # Update playlist entry if this track is in the playlist
-            for track in self._playlist:
-                if str(Path(track["path"]).absolute()) == track_path:
-                    track["image"] = online_cover
-
+            self._remember_image(track_path, online_cover)
             return online_cover
 
         return None
@@ -344,19 +545,10 @@ class TinyBackend:
         Returns:
             bool: True if an association was removed, False if none existed
         """
-        track_path = str(Path(track_path).absolute())
+        track_path = normalize_track_path(track_path)
 
         if track_path in self._track_images:
-            del self._track_images[track_path]
-
-            # Update any playlist entries
-            for track in self._playlist:
-                if (
-                    str(Path(track["path"]).absolute()) == track_path
-                    and "image" in track
-                ):
-                    del track["image"]
-
+            self._remember_image(track_path, None)
             return True
 
         return False
@@ -429,9 +621,15 @@ QListWidget::item:selected {
 
 
 class PlayerWindow(QMainWindow):
+    # Emitted on the watcher's thread with each LibraryDelta
+    library_changed = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.player = TinyBackend()
+        self._session = SessionStore()
+        self.player.session = self._session
+        self._session_saved = (-1, 0.0)  # (index, time) of the last save
         self.setWindowTitle("Dolboebify 2.0")
         self.setGeometry(200, 150, 820, 640)
         self.setStyleSheet(DARK_STYLE)
@@ -444,8 +642,21 @@ class PlayerWindow(QMainWindow):
 
         # Keep track of active cover art fetchers
         self._cover_fetchers = {}
+        self._cover_prefetcher = None
+        self._metadata_loader = None
+        # Stopped loaders still winding down (kept alive until finished)
+        self._old_metadata_loaders = set()
+        # Steps of the session restore still running (see _restore_session)
+        self._restore_steps = None
+
+        # Decoded cover pixmaps keyed by image path, least recent first
+        self._pixmaps = OrderedDict()
+
+        # Folder changes are applied on the GUI thread (queued connection)
+        self.library_changed.connect(self._on_library_changed)
 
         self.setup_ui()
+        self._restore_session()
         self.setup_timers()
         self.show()
 
@@ -512,6 +723,10 @@ class PlayerWindow(QMainWindow):
         open_btn.setMinimumHeight(28)
         open_btn.clicked.connect(self.open_file)
         ctrl.addWidget(open_btn)
+        folder_btn = QPushButton("Open Folder")
+        folder_btn.setMinimumHeight(28)
+        folder_btn.clicked.connect(self.open_folder)
+        ctrl.addWidget(folder_btn)
 
         main.addLayout(ctrl)
 
@@ -533,6 +748,9 @@ class PlayerWindow(QMainWindow):
         main.addWidget(lbl)
 
         self.playlist = QListWidget()
+        # Rows of one height let Qt lay out large playlists without
+        # measuring every item
+        self.playlist.setUniformItemSizes(True)
         self.playlist.itemDoubleClicked.connect(self._play_item)
         main.addWidget(self.playlist)
 
@@ -552,7 +770,7 @@ class PlayerWindow(QMainWindow):
         # First check if the track has an image associated with it through the API
         cover_path = self.player.get_track_image(path)
         if cover_path and Path(cover_path).exists():
-            return QPixmap(cover_path)
+            return self._cover_pixmap(cover_path)
 
         # If no cover found, create a loading placeholder
         loading_pixmap = QPixmap(200, 200)
@@ -568,23 +786,36 @@ class PlayerWindow(QMainWindow):
         # Start a background thread to fetch the cover from online sources
         self._start_cover_fetch(path)
 
-        # Fallback to the old method for local files
-        for name in ("cover.jpg", "folder.jpg", "front.jpg"):
-            p = Path(path).with_name(name)
-            if p.exists():
-                return QPixmap(str(p))
+        # Fallback to a sidecar cover (a cached per-folder lookup)
+        sidecar_cover = find_sidecar_cover(path)
+        if sidecar_cover:
+            return self._cover_pixmap(sidecar_cover)
 
         return self.unknown_cover
 
+    def _cover_pixmap(self, cover_path):
+        """Load a cover at display size, reusing decoded pixmaps."""
+        # Prefer the pre-scaled rendition from the cover cache
+        display_path = get_cover_thumbnail(cover_path, 200)
+        pixmap = self._pixmaps.get(display_path)
+        if pixmap is None:
+            pixmap = QPixmap(display_path)
+            self._pixmaps[display_path] = pixmap
+            if len(self._pixmaps) > 64:
+                self._pixmaps.popitem(last=False)
+        else:
+            self._pixmaps.move_to_end(display_path)
+        return pixmap
+
     def _start_cover_fetch(self, path):
         """Start a background thread to fetch cover art."""
         # Clean up any previous fetcher for this track
-        path_key = str(Path(path).absolute())
+        path_key = normalize_track_path(path)
         if path_key in self._cover_fetchers:
             old_fetcher = self._cover_fetchers[path_key]
             if old_fetcher.isRunning():
-                old_fetcher.terminate()
-                old_fetcher.wait()
+                # It may be waiting out a provider's rate limit; let it
+                return
 
         # Create and start a new fetcher
         fetcher = CoverArtFetcher(path)
@@ -598,16 +829,16 @@ class PlayerWindow(QMainWindow):
     def _on_cover_found(self, track_path, cover_path):
         """Handle when a cover is found by the background thread."""
         # Update the track in the player's associations
-        self.player._track_images[track_path] = cover_path
+        self.player._remember_image(track_path, cover_path)
 
         # Only update UI if this is the currently playing track
         current_track = (
-            str(Path(self.player.current_media).absolute())
+            normalize_track_path(self.player.current_media)
             if self.player.current_media
             else None
         )
         if current_track == track_path:
-            self.cover_lbl.setPixmap(QPixmap(cover_path))
+            self.cover_lbl.setPixmap(self._cover_pixmap(cover_path))
 
         # Clean up the fetcher
         if track_path in self._cover_fetchers:
@@ -615,6 +846,7 @@ class PlayerWindow(QMainWindow):
 
     @pyqtSlot()
     def update_ui(self):
+        self.player.flush_images()
         if self.player.current_index < 0:
             return
         pos = self.player.position
@@ -637,6 +869,72 @@ class PlayerWindow(QMainWindow):
             self.cover_lbl.setPixmap(cover.scaled(200, 200))
 
         self._sync_play_icon()
+        self._save_session_state()
+
+    # ---------- Session ----------
+    def _restore_session(self):
+        """Reopen the playlist and track of the previous session."""
+        # Restored a chunk per event-loop turn, so the window (and the
+        # current track) are usable before a large playlist is read
+        self._restore_steps = self.player.restore_session(self._session)
+        self.playlist.clear()
+        self._restore_more()
+
+    @pyqtSlot()
+    def _restore_more(self):
+        """Restore the next chunk of the previous session's playlist."""
+        steps = self._restore_steps
+        if steps is None:
+            return
+        start = self.playlist.count()
+        if next(steps, None) is None:
+            self._restore_steps = None
+            self.playlist.setCurrentRow(self.player.current_index)
+            self._start_metadata_load()
+            return
+        tracks = self.player.playlist[start:]
+        self.playlist.addItems([t.title for t in tracks])
+        self.playlist.setCurrentRow(self.player.current_index)
+        QTimer.singleShot(0, self._restore_more)
+
+    def _stop_restore(self):
+        """Abandon restoring the previous session's playlist."""
+        steps, self._restore_steps = self._restore_steps, None
+        if steps is not None:
+            steps.close()
+
+    def _save_session_state(self, force=False):
+        """Save the current track and position, at most every few seconds."""
+        if self._restore_steps is not None:
+            return  # The saved track may not be restored yet
+        index = self.player.current_index
+        now = time.monotonic()
+        last_index, last_time = self._session_saved
+        if (
+            force
+            or index != last_index
+            or now - last_time >= SESSION_SAVE_INTERVAL
+        ):
+            self._session.save_state(index, max(self.player.position, 0.0))
+            self._session_saved = (index, now)
+
+    def closeEvent(self, event):
+        self.player.unwatch_library()
+        # Keep the session for the next launch (unless it is still being
+        # restored, in which case the saved state is unchanged)
+        self._save_session_state(force=True)
+        self._stop_restore()
+        # The loaders stop within a batch once cancelled
+        loaders = set(self._old_metadata_loaders)
+        if self._metadata_loader is not None:
+            loaders.add(self._metadata_loader)
+        for loader in loaders:
+            loader.stop()
+        for loader in loaders:
+            loader.wait()
+        self.player.flush_images()
+        self._session.close()
+        super().closeEvent(event)
 
     @pyqtSlot()
     def _sync_play_icon(self):
@@ -715,17 +1013,102 @@ class PlayerWindow(QMainWindow):
         )
         if not files:
             return
+        self._stop_restore()
+        self.player.unwatch_library()
         self.player.clear_playlist()
         for f in files:
             self.player.add_to_playlist(f)
         self._fill_playlist()
+        self.player.save_session(self._session)
+        self._start_cover_prefetch()
+        self._start_metadata_load()
+        if self.player.playlist:
+            self.player.play_index(0)
+
+    @pyqtSlot()
+    def open_folder(self):
+        folder = QFileDialog.getExistingDirectory(
+            self, "Open folder", str(Path.home())
+        )
+        if not folder:
+            return
+        self._stop_restore()
+        self.player.unwatch_library()
+        self.player.clear_playlist()
+        self.player.load_playlist(folder)
+        # Keep the playlist in sync with the folder from now on
+        self.player.watch_library(folder, self.library_changed.emit)
+        self._fill_playlist()
+        self.player.save_session(self._session)
+        self._start_cover_prefetch()
+        self._start_metadata_load()
         if self.player.playlist:
             self.player.play_index(0)
 
+    @pyqtSlot(object)
+    def _on_library_changed(self, delta):
+        # Runs on the GUI thread, so the playlist isn't changed under it
+        self.player.apply_library_delta(delta)
+        self._fill_playlist()
+        self.player.save_session(self._session)
+        if delta.added or delta.modified:
+            self._start_metadata_load()
+
+    def _start_cover_prefetch(self):
+        """Warm the cover cache for the whole playlist in the background."""
+        if self._cover_prefetcher is not None:
+            self._cover_prefetcher.stop()
+            self._cover_prefetcher.wait()
+
+        self._cover_prefetcher = CoverPrefetcher(
+            t["path"] for t in self.player.playlist
+        )
+        self._cover_prefetcher.cover_found.connect(self._on_cover_found)
+        self._cover_prefetcher.start()
+
+    def _start_metadata_load(self):
+        """Read the playlist's tags and durations in the background."""
+        if self._metadata_loader is not None:
+            self._retire_metadata_loader(self._metadata_loader)
+
+        self._metadata_loader = MetadataLoader(
+            t.absolute_path for t in self.player.playlist if t.duration is None
+        )
+        self._metadata_loader.metadata_loaded.connect(self._on_metadata_loaded)
+        self._metadata_loader.start()
+
+    def _retire_metadata_loader(self, loader):
+        """Stop a loader without waiting for it on the GUI thread."""
+        loader.metadata_loaded.disconnect(self._on_metadata_loaded)
+        loader.stop()
+
+        def finished():
+            self._old_metadata_loaders.discard(loader)
+            loader.deleteLater()
+
+        # Keep a reference until the thread is done, or Qt would destroy
+        # it while still running
+        loader.finished.connect(finished)
+        self._old_metadata_loaders.add(loader)
+        if not loader.isRunning():
+            self._old_metadata_loaders.discard(loader)
+
+    @pyqtSlot(list)
+    def _on_metadata_loaded(self, batch):
+        # Runs on the GUI thread, so the playlist isn't changed under it
+        playlist = self.player.playlist
+        playlist.apply_metadata(batch)
+        self._session.update_tracks(playlist, [path for path, _ in batch])
+        for track_path, _ in batch:
+            for row in playlist.indices(track_path):
+                item = self.playlist.item(row)
+                if item is not None:
+                    item.setText(playlist[row]["title"])
+
     def _fill_playlist(self):
         self.playlist.clear()
-        for t in self.player.playlist:
-            QListWidgetItem(t["title"], self.playlist)
+        # One call instead of an item per track keeps restores fast
+        self.playlist.addItems([t.title for t in self.player.playlist])
         self.playlist.setCurrentRow(self.player.current_index)
 
     @pyqtSlot()
@@ -11,24 +11,30 @@ from dolboebify.utils.exceptions import (
     DolboebifyError,
     PlaybackError,
     PlaylistError,
+    ProviderThrottledError,
 )
 from dolboebify.utils.fileutils import (
     check_file_type,
     get_audio_files,
     get_file_info,
     get_supported_formats,
+    iter_audio_files,
 )
+from dolboebify.utils.prefetch import prefetch_covers
 
 __all__ = [
     "DolboebifyError",
     "AudioFormatNotSupportedError",
     "PlaybackError",
     "PlaylistError",
+    "ProviderThrottledError",
     "get_supported_formats",
     "get_audio_files",
+    "iter_audio_files",
     "check_file_type",
     "get_file_info",
     "fetch_cover_art",
+    "prefetch_covers",
     "get_setting",
     "clear_cover_cache",
     "reset_failed_fetch_cache",
@@ -1,11 +1,5 @@
 """Utilities for cleaning up cache and temporary files."""
 
-import os
-from pathlib import Path
-
-# Cache directory for downloaded cover art
-COVER_CACHE_DIR = Path.home() / ".cache" / "dolboebify" / "covers"
-
 
 def clear_cover_cache() -> int:
     """
@@ -14,24 +8,14 @@ def clear_cover_cache() -> int:
     Returns:
         int: Number of files removed
     """
-    if not COVER_CACHE_DIR.exists():
-        return 0
-
-    # Count files before deletion
-    file_count = sum(1 for _ in COVER_CACHE_DIR.glob("*.jpg"))
-
-    # Remove all files in the cache directory
-    for file_path in COVER_CACHE_DIR.glob("*.jpg"):
-        try:
-            os.unlink(file_path)
-        except OSError as e:
-            print(f"Error removing {file_path}: {e}")
+    # Import here to avoid circular imports
+    from dolboebify.utils.coverart import _COVER_CACHE
 
-    return file_count
+    return _COVER_CACHE.clear()
 
 
 def reset_failed_fetch_cache():
-    """Reset the in-memory cache of failed fetch attempts."""
+    """Reset the persistent cache of failed fetch attempts."""
     # Import here to avoid circular imports
     from dolboebify.utils.coverart import _FAILED_FETCH_CACHE
 
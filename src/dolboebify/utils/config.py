@@ -1,8 +1,15 @@
 """Configuration utilities for Dolboebify."""
 
+import atexit
+import copy
 import json
 import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -11,10 +18,46 @@ DEFAULT_CONFIG = {
         "fetch_online": True,
         "timeout": 2.0,
         "cache_ttl": 3600,  # 1 hour
+        "cache_max_bytes": 200 * 1024 * 1024,  # 200 MiB of cover images
+        "cache_max_entries": 5000,
+        # Longest-edge sizes of the scaled cover renditions kept in cache
+        "thumbnail_sizes": [64, 200, 600],
+        # "sequential" tries providers in order, "hedged" starts the next
+        # provider after hedge_delay seconds (0 queries all in parallel)
+        "lookup_mode": "hedged",
+        "hedge_delay": 0.5,
+        # Extra filename regexes with (?P<artist>...) and (?P<title>...)
+        # groups, tried before the built-in ones
+        "filename_patterns": [],
+        # Look covers up once per album (from tags or the album folder)
+        # instead of once per track
+        "album_lookup": True,
+        # Base URLs of the provider APIs (e.g. a local stand-in server)
+        "provider_urls": {
+            "itunes": "https://itunes.apple.com",
+            "lastfm": "http://ws.audioscrobbler.com",
+        },
+        # Sustained API requests per second allowed for each provider
+        "provider_rates": {"itunes": 0.5, "lastfm": 5.0},
+        # How often a throttled lookup is retried before giving up (without
+        # recording a miss)
+        "throttle_retries": 3,
     },
     "player": {
         "default_volume": 70,
         "remember_last_position": True,
+        # Upcoming playlist entries parsed in the background (0 disables)
+        "preparse_ahead": 2,
+        # Open the next track ahead of time and switch to it without a gap
+        "gapless": False,
+    },
+    "library": {
+        # Keep a persistent index of music folders for incremental rescans
+        "index": True,
+        # Read tags and durations of loaded folders in the background
+        "read_metadata": True,
+        # Worker processes reading tags (0: one per CPU)
+        "metadata_workers": 0,
     },
     "ui": {
         "theme": "dark",
@@ -26,12 +69,36 @@ DEFAULT_CONFIG = {
 CONFIG_DIR = Path.home() / ".config" / "dolboebify"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+# Minimum interval (seconds) between stat() checks for external config edits
+CONFIG_CHECK_INTERVAL = 1.0
+
+# Process-wide parsed config cache, invalidated by the file's mtime/size
+_CONFIG_LOCK = threading.RLock()
+# Serializes flushes so writes reach the file in order; never held by
+# readers, so a slow write does not block settings lookups
+_FLUSH_LOCK = threading.RLock()
+_cached_config: Optional[dict] = None
+_cached_stamp: Optional[Tuple[int, int]] = None
+_last_check = 0.0
+
+# Callbacks invoked with the new config whenever it changes
+_SUBSCRIBERS: List[Callable[[dict], None]] = []
+
+# Debounce delay (seconds) after the last change before settings are written
+SETTINGS_WRITE_DELAY = 0.5
+
+# Upper bound (seconds) on how long a change may stay unwritten
+SETTINGS_MAX_WRITE_LATENCY = 2.0
+
+# Settings changed in memory but not yet written: {section: {key: value}}
+_pending: Dict[str, Dict[str, Any]] = {}
+
 
 def load_config():
     """Load configuration from file or create default if it doesn't exist."""
     if not CONFIG_FILE.exists():
         save_config(DEFAULT_CONFIG)
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     try:
         with open(CONFIG_FILE, "r") as f:
@@ -39,7 +106,7 @@ def load_config():
             # Ensure all default values exist
             for section, values in DEFAULT_CONFIG.items():
                 if section not in config:
-                    config[section] = values
+                    config[section] = copy.deepcopy(values)
                 else:
                     for key, value in values.items():
                         if key not in config[section]:
@@ -47,22 +114,152 @@ def load_config():
         return config
     except (json.JSONDecodeError, IOError) as e:
         print(f"Error loading config: {e}")
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
 
 def save_config(config):
-    """Save configuration to file."""
+    """Save configuration to file atomically (write temp file and rename)."""
     # Ensure config directory exists
     os.makedirs(CONFIG_DIR, exist_ok=True)
 
+    tmp_path = None
     try:
-        with open(CONFIG_FILE, "w") as f:
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".config-", suffix=".tmp", dir=CONFIG_DIR
+        )
+        with os.fdopen(fd, "w") as f:
             json.dump(config, f, indent=2)
-        return True
-    except IOError as e:
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, CONFIG_FILE)
+    except (IOError, OSError) as e:
         print(f"Error saving config: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
         return False
 
+    _update_cache(config)
+    return True
+
+
+def _config_stamp() -> Optional[Tuple[int, int]]:
+    """Return the (mtime_ns, size) of the config file, or None if missing."""
+    try:
+        stats = os.stat(CONFIG_FILE)
+    except OSError:
+        return None
+    return stats.st_mtime_ns, stats.st_size
+
+
+def _notify_subscribers(config: dict):
+    """Invoke all change subscribers with the new configuration."""
+    for callback in list(_SUBSCRIBERS):
+        try:
+            callback(config)
+        except Exception as e:
+            print(f"Error in config subscriber {callback!r}: {e}")
+
+
+def _update_cache(config: dict):
+    """Replace the cached config after an in-process save."""
+    global _cached_config, _cached_stamp, _last_check
+
+    with _CONFIG_LOCK:
+        config = copy.deepcopy(config)
+        # Changes made while the file was being written are still unwritten
+        _apply_updates(config, _pending)
+        changed = _cached_config is not None and _cached_config != config
+        _cached_config = config
+        _cached_stamp = _config_stamp()
+        _last_check = time.monotonic()
+
+    if changed:
+        _notify_subscribers(config)
+
+
+def get_config(force_check: bool = False) -> dict:
+    """
+    Get the parsed configuration from the process-wide cache.
+
+    The config file is only re-read when its mtime or size changed, and
+    is stat'ed at most once per ``CONFIG_CHECK_INTERVAL`` seconds.
+
+    Args:
+        force_check: Stat the config file even if the interval hasn't passed
+
+    Returns:
+        dict: The cached configuration (treat as read-only)
+    """
+    global _cached_config, _cached_stamp, _last_check
+
+    with _CONFIG_LOCK:
+        now = time.monotonic()
+        if (
+            _cached_config is not None
+            and not force_check
+            and now - _last_check < CONFIG_CHECK_INTERVAL
+        ):
+            return _cached_config
+
+        _last_check = now
+        stamp = _config_stamp()
+        if _cached_config is not None and stamp == _cached_stamp:
+            return _cached_config
+
+        previous = _cached_config
+        config = load_config()
+        # Unwritten in-process changes take precedence over the file
+        _apply_updates(config, _pending)
+        _cached_config = config
+        _cached_stamp = _config_stamp()
+        _last_check = time.monotonic()
+
+    if previous is not None and previous != config:
+        _notify_subscribers(config)
+    return config
+
+
+def invalidate_config_cache():
+    """Drop the cached configuration so the next lookup re-reads the file."""
+    global _cached_config, _cached_stamp, _last_check
+
+    with _CONFIG_LOCK:
+        _cached_config = None
+        _cached_stamp = None
+        _last_check = 0.0
+
+
+def subscribe(callback: Callable[[dict], None]):
+    """
+    Register a callback to be invoked whenever the configuration changes.
+
+    Changes are picked up both from in-process saves and from external
+    edits of the config file (detected on the next lookup).
+
+    Args:
+        callback: Callable receiving the new configuration dict
+    """
+    with _CONFIG_LOCK:
+        if callback not in _SUBSCRIBERS:
+            _SUBSCRIBERS.append(callback)
+
+
+def unsubscribe(callback: Callable[[dict], None]) -> bool:
+    """
+    Remove a previously registered change callback.
+
+    Args:
+        callback: The callback passed to ``subscribe``
+
+    Returns:
+        bool: True if the callback was registered, False otherwise
+    """
+    with _CONFIG_LOCK:
+        if callback in _SUBSCRIBERS:
+            _SUBSCRIBERS.remove(callback)
+            return True
+    return False
+
 
 def get_setting(section, key, default=None):
     """
@@ -76,7 +273,7 @@ def get_setting(section, key, default=None):
     Returns:
         The setting value or default if not found
     """
-    config = load_config()
+    config = get_config()
     return config.get(section, {}).get(key, default)
 
 
@@ -84,6 +281,10 @@ def set_setting(section, key, value):
     """
     Set a setting in the configuration.
 
+    The change is visible to ``get_setting`` immediately; the write to
+    disk is debounced and coalesced with other changes (see
+    ``update_settings``).
+
     Args:
         section: Section name
         key: Setting key
@@ -92,10 +293,189 @@ def set_setting(section, key, value):
     Returns:
         bool: True if successful, False otherwise
     """
-    config = load_config()
+    return update_settings({section: {key: value}})
+
+
+def _apply_updates(config: dict, updates: Dict[str, Dict[str, Any]]):
+    """Merge {section: {key: value}} updates into a config dict in place."""
+    for section, values in updates.items():
+        if not isinstance(config.get(section), dict):
+            config[section] = {}
+        config[section].update(values)
+
+
+def update_settings(
+    updates: Dict[str, Dict[str, Any]], flush: bool = False
+) -> bool:
+    """
+    Apply several settings changes in one batch.
+
+    The in-memory config is updated (and subscribers notified) right away,
+    while the disk write is handed to a background writer that coalesces
+    changes into a single atomic save. A write happens at most
+    ``SETTINGS_WRITE_DELAY`` seconds after the last change and never later
+    than ``SETTINGS_MAX_WRITE_LATENCY`` seconds after the first unwritten
+    one. Pending changes are always flushed at interpreter exit.
+
+    Args:
+        updates: Mapping of section name to {key: value} changes
+        flush: Write the changes to disk before returning
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    global _cached_config
+
+    if not updates:
+        return flush_settings() if flush else True
+
+    with _CONFIG_LOCK:
+        # Copy the cached config under the lock, so concurrent updates
+        # each build on the other's changes
+        base = _cached_config if _cached_config is not None else get_config()
+        config = copy.deepcopy(base)
+        _apply_updates(config, updates)
+        _apply_updates(_pending, updates)
+        changed = config != _cached_config
+        _cached_config = config
+
+    if changed:
+        _notify_subscribers(config)
+
+    if flush:
+        return flush_settings()
+
+    _WRITER.schedule()
+    return True
+
+
+def flush_settings() -> bool:
+    """
+    Write any pending settings changes to disk immediately.
+
+    Returns:
+        bool: True if nothing was pending or the write succeeded
+    """
+    global _pending
+
+    with _FLUSH_LOCK:
+        with _CONFIG_LOCK:
+            _WRITER.cancel()
+            if not _pending:
+                return True
+            updates = _pending
+            _pending = {}
+
+        # Write and notify subscribers without holding the config lock, so
+        # lookups (including ones made by subscribers) never wait on disk.
+        # Re-read the file so external edits to other keys are preserved.
+        config = load_config()
+        _apply_updates(config, updates)
+        if save_config(config):
+            return True
+
+        # Keep the changes around for the next attempt, under any newer ones
+        with _CONFIG_LOCK:
+            _apply_updates(updates, _pending)
+            _pending = updates
+        return False
+
+
+class SettingsTransaction:
+    """A batch of settings changes committed together."""
+
+    def __init__(self):
+        """Initialize an empty transaction."""
+        self.updates: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, section, key, default=None):
+        """Get a setting, taking changes staged in this transaction first."""
+        if key in self.updates.get(section, {}):
+            return self.updates[section][key]
+        return get_setting(section, key, default)
+
+    def set(self, section, key, value):
+        """Stage a setting change."""
+        self.updates.setdefault(section, {})[key] = value
+
+
+@contextmanager
+def settings_transaction(
+    flush: bool = False,
+) -> Iterator[SettingsTransaction]:
+    """
+    Context manager that commits all staged changes at once on exit.
+
+    If the block raises, the staged changes are discarded.
+
+    Args:
+        flush: Write the changes to disk when the block exits
+
+    Yields:
+        SettingsTransaction: Object to stage changes on
+    """
+    transaction = SettingsTransaction()
+    yield transaction
+    update_settings(transaction.updates, flush=flush)
+
+
+class _SettingsWriter:
+    """Background thread that coalesces settings changes into one write."""
+
+    def __init__(self):
+        """Initialize an idle writer."""
+        self._cond = threading.Condition()
+        self._first_change: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self):
+        """Note a new change and make sure a write is coming."""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="dolboebify-settings-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self):
+        """Forget the scheduled write (the caller is flushing itself)."""
+        with self._cond:
+            self._first_change = None
+            self._last_change = None
+            self._cond.notify()
+
+    def _deadline(self) -> float:
+        """Return the monotonic time at which the pending write is due."""
+        return min(
+            self._last_change + SETTINGS_WRITE_DELAY,
+            self._first_change + SETTINGS_MAX_WRITE_LATENCY,
+        )
+
+    def _run(self):
+        """Wait for changes to settle, then flush them."""
+        while True:
+            with self._cond:
+                while self._first_change is None:
+                    self._cond.wait()
+                while self._first_change is not None:
+                    remaining = self._deadline() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._first_change is None:
+                    continue
+
+            flush_settings()
 
-    if section not in config:
-        config[section] = {}
 
-    config[section][key] = value
-    return save_config(config)
+_WRITER = _SettingsWriter()
+atexit.register(flush_settings)
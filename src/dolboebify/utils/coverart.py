@@ -1,62 +1,235 @@
 """Utilities for fetching track cover art from external sources."""
 
+import atexit
+import contextvars
 import json
 import os
+import random
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from dolboebify import __version__
 from dolboebify.utils.config import get_setting
+from dolboebify.utils.covercache import COVER_CACHE_DIR, CoverCache
+from dolboebify.utils.embedded import read_album_tags, read_embedded_picture
+from dolboebify.utils.exceptions import ProviderThrottledError
+from dolboebify.utils.misscache import MissCache
+from dolboebify.utils.trackinfo import get_track_parser
+
+# Index of downloaded cover art in COVER_CACHE_DIR
+_COVER_CACHE = CoverCache(COVER_CACHE_DIR)
+
+# Persistent cache of failed fetches to avoid repeated attempts,
+# keyed by the normalized artist/title query (see make_lookup_key)
+_FAILED_FETCH_CACHE = MissCache()
+_failed_fetch_cache_purged = False
+
+# Maximum number of pooled keep-alive connections per provider host
+HTTP_POOL_MAXSIZE = 4
+
+# Number of distinct hosts whose connection pools are kept alive
+HTTP_POOL_HOSTS = 16
+
+# Shared HTTP session used by all cover-art providers
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def _create_http_session() -> requests.Session:
+    """Create a session with bounded keep-alive connection pools."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = f"dolboebify/{__version__}"
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the shared HTTP session used for provider requests.
+
+    The session keeps connections alive and pools them per host, so
+    repeated lookups reuse the same TCP/TLS connection. The underlying
+    connection pools are thread-safe and block when a host's pool is
+    exhausted, which caps concurrent connections per host at
+    ``HTTP_POOL_MAXSIZE``.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _HTTP_SESSION
+
+    session = _HTTP_SESSION
+    if session is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                _HTTP_SESSION = _create_http_session()
+            session = _HTTP_SESSION
+    return session
+
+
+def close_http_session():
+    """Close the shared HTTP session and drop its pooled connections."""
+    global _HTTP_SESSION
+
+    with _HTTP_SESSION_LOCK:
+        session, _HTTP_SESSION = _HTTP_SESSION, None
+    if session is not None:
+        session.close()
+
+
+atexit.register(close_http_session)
+
+# Maximum number of provider lookups running concurrently in hedged mode
+LOOKUP_MAX_WORKERS = 8
+
+# Shared executor for hedged provider lookups
+_LOOKUP_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_LOOKUP_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_lookup_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool used for hedged provider lookups."""
+    global _LOOKUP_EXECUTOR
+
+    with _LOOKUP_EXECUTOR_LOCK:
+        if _LOOKUP_EXECUTOR is None:
+            _LOOKUP_EXECUTOR = ThreadPoolExecutor(
+                max_workers=LOOKUP_MAX_WORKERS,
+                thread_name_prefix="dolboebify-cover",
+            )
+        return _LOOKUP_EXECUTOR
+
+
+def _is_cancelled(cancel: Optional[threading.Event]) -> bool:
+    """Check whether a provider lookup has been cancelled."""
+    return cancel is not None and cancel.is_set()
+
+
+class _AnyEvent:
+    """Read-only view that is set when any of the wrapped events is set."""
 
-# Cache directory for downloaded cover art
-COVER_CACHE_DIR = Path.home() / ".cache" / "dolboebify" / "covers"
+    def __init__(self, *events: Optional[threading.Event]):
+        """Wrap the given events, ignoring None."""
+        self._events = [event for event in events if event is not None]
 
-# Ensure the cache directory exists
-os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+    def is_set(self) -> bool:
+        """Check whether any wrapped event is set."""
+        return any(event.is_set() for event in self._events)
 
-# Cache for failed fetches to avoid repeated attempts
-_FAILED_FETCH_CACHE = {}  # {track_path: timestamp}
+
+# Default maximum number of concurrent requests per provider
+DEFAULT_PROVIDER_LIMIT = 4
+
+
+class _ConcurrencyLimit:
+    """Resizable counting semaphore bounding concurrent provider lookups."""
+
+    def __init__(self, limit: int):
+        """Initialize the limit."""
+        self._cond = threading.Condition()
+        self._limit = max(1, limit)
+        self._active = 0
+
+    @property
+    def limit(self) -> int:
+        """Get the maximum number of concurrent holders."""
+        return self._limit
+
+    def set_limit(self, limit: int):
+        """Change the maximum number of concurrent holders."""
+        with self._cond:
+            self._limit = max(1, limit)
+            self._cond.notify_all()
+
+    def __enter__(self):
+        """Wait for a free slot and take it."""
+        with self._cond:
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        """Release the slot."""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+
+# Concurrency limits keyed by provider name
+_PROVIDER_LIMITS: Dict[str, _ConcurrencyLimit] = {}
+_PROVIDER_LIMITS_LOCK = threading.Lock()
+
+
+def _get_provider_limit(name: str) -> _ConcurrencyLimit:
+    """Get (creating if needed) the concurrency limit for a provider."""
+    with _PROVIDER_LIMITS_LOCK:
+        if name not in _PROVIDER_LIMITS:
+            _PROVIDER_LIMITS[name] = _ConcurrencyLimit(DEFAULT_PROVIDER_LIMIT)
+        return _PROVIDER_LIMITS[name]
+
+
+def set_provider_limit(name: str, limit: int):
+    """
+    Set the maximum number of concurrent lookups for a provider.
+
+    The limit is process-wide and applies to every lookup made through
+    ``fetch_cover_art``.
+
+    Args:
+        name: Provider name ("itunes" or "lastfm")
+        limit: Maximum number of concurrent lookups (at least 1)
+    """
+    _get_provider_limit(name).set_limit(limit)
 
 
-def parse_track_info(filename: str) -> Tuple[str, str]:
+def parse_track_info(filename: Union[str, Path]) -> Tuple[str, str]:
     """
     Parse artist and title from filename.
 
+    Patterns from the ``cover_art.filename_patterns`` setting are tried
+    before the built-in ones (see ``utils.trackinfo``). Given a path, the
+    parent folders are used for layouts like "Artist/Album/01 Title".
+
     Args:
-        filename: The filename of the track
+        filename: The filename (or path) of the track
 
     Returns:
         Tuple[str, str]: Artist and title
     """
-    # Remove file extension
-    name = Path(filename).stem
-
-    # Common patterns: "Artist - Title" or "Artist_-_Title" or "01. Artist - Title"
-    patterns = [
-        # "Artist - Title" or "01. Artist - Title"
-        r"^(?:\d+\.\s*)?(.+?)\s*[-–—]\s*(.+)$",
-        # "Artist_-_Title" or "01. Artist_-_Title"
-        r"^(?:\d+\.\s*)?(.+?)_-_(.+)$",
-    ]
+    patterns = get_setting("cover_art", "filename_patterns", [])
+    return get_track_parser(patterns).parse(filename)
 
-    for pattern in patterns:
-        match = re.match(pattern, name)
-        if match:
-            artist = match.group(1).strip()
-            title = match.group(2).strip()
 
-            # Strip trailing underscores if they exist (for Artist_-_Title format)
-            if pattern.endswith("_-_(.+)$"):
-                artist = artist.rstrip("_")
+def parse_track_infos(
+    filenames: Iterable[Union[str, Path]],
+) -> List[Tuple[str, str]]:
+    """
+    Parse artist and title from many filenames at once.
 
-            return artist, title
+    Args:
+        filenames: Filenames (or paths) of the tracks
 
-    # If no pattern matches, use the whole name as title and empty string as artist
-    return "", name
+    Returns:
+        List[Tuple[str, str]]: Artist and title of each track, in order
+    """
+    patterns = get_setting("cover_art", "filename_patterns", [])
+    return get_track_parser(patterns).parse_many(filenames)
 
 
 def sanitize_filename(name: str) -> str:
@@ -73,13 +246,16 @@ def sanitize_filename(name: str) -> str:
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
 
-def get_cached_cover(artist: str, title: str) -> Optional[str]:
+def get_cached_cover(
+    artist: str, title: str, size: Optional[int] = None
+) -> Optional[str]:
     """
     Check if cover art for the given artist/title is in the cache.
 
     Args:
         artist: Artist name
         title: Track title
+        size: Desired longest edge in pixels (nearest stored size is used)
 
     Returns:
         Optional[str]: Path to cached cover art, or None if not in cache
@@ -88,12 +264,24 @@ def get_cached_cover(artist: str, title: str) -> Optional[str]:
         return None
 
     cache_key = sanitize_filename(f"{artist}_{title}")
-    cache_path = COVER_CACHE_DIR / f"{cache_key}.jpg"
+    return _COVER_CACHE.get(cache_key, size)
 
-    if cache_path.exists():
-        return str(cache_path)
 
-    return None
+def get_cover_thumbnail(cover_path: Union[str, Path], size: int) -> str:
+    """
+    Get the nearest-size rendition of a cover returned by this module.
+
+    Covers that don't come from the cache (e.g. sidecar files) are
+    returned unchanged.
+
+    Args:
+        cover_path: Path to the cover image
+        size: Desired longest edge in pixels
+
+    Returns:
+        str: Path to the image file to display
+    """
+    return _COVER_CACHE.get_thumbnail(cover_path, size)
 
 
 def save_to_cache(artist: str, title: str, image_data: bytes) -> str:
@@ -109,53 +297,474 @@ def save_to_cache(artist: str, title: str, image_data: bytes) -> str:
         str: Path to the cached file
     """
     cache_key = sanitize_filename(f"{artist}_{title}")
-    cache_path = COVER_CACHE_DIR / f"{cache_key}.jpg"
+    return _COVER_CACHE.put(cache_key, image_data)
+
+
+def make_lookup_key(artist: str, title: str) -> str:
+    """
+    Build a normalized key identifying an artist/title query.
+
+    Case and runs of whitespace are ignored, so differently formatted
+    filenames of the same track share one key.
 
-    with open(cache_path, "wb") as f:
-        f.write(image_data)
+    Args:
+        artist: Artist name
+        title: Track title
+
+    Returns:
+        str: The lookup key
+    """
+    artist = " ".join(artist.casefold().split())
+    title = " ".join(title.casefold().split())
+    return f"{artist}\x1f{title}"
+
+
+# File extensions for embedded picture MIME types
+_IMAGE_SUFFIXES = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+}
 
-    return str(cache_path)
+# Tracks known to carry no embedded artwork: {(path, mtime_ns, size)}
+_NO_EMBEDDED_COVER = set()
 
 
-def is_fetch_recently_failed(track_path: str) -> bool:
+def get_embedded_cover(track_path: Union[str, Path]) -> Optional[str]:
     """
-    Check if we recently failed to fetch a cover for this track.
+    Get the artwork embedded in a track, extracted into the cover cache.
+
+    The file's tags are only parsed the first time; afterwards the cached
+    image is found by the track's path, size and modification time.
 
     Args:
-        track_path: Path to the track
+        track_path: Path to the audio file
+
+    Returns:
+        Optional[str]: Path to the extracted cover art, or None if the
+        track has no embedded artwork
+    """
+    path = str(Path(track_path).absolute())
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+
+    stamp = (path, stats.st_mtime_ns, stats.st_size)
+    if stamp in _NO_EMBEDDED_COVER:
+        return None
+
+    cache_key = f"embedded:{stats.st_mtime_ns}:{stats.st_size}:{path}"
+    cached = _COVER_CACHE.get(cache_key)
+    if cached:
+        return cached
+
+    picture = read_embedded_picture(path)
+    if picture is None:
+        if len(_NO_EMBEDDED_COVER) >= 65536:
+            _NO_EMBEDDED_COVER.clear()
+        _NO_EMBEDDED_COVER.add(stamp)
+        return None
+
+    data, mime = picture
+    try:
+        return _COVER_CACHE.put(
+            cache_key, data, _IMAGE_SUFFIXES.get(mime, ".jpg")
+        )
+    except OSError as e:
+        print(f"Error caching embedded cover for {path}: {e}")
+        return None
+
+
+# Disc sub-folders of a multi-disc album ("CD1", "Disc 2", ...)
+_DISC_DIR_PATTERN = re.compile(r"^(?:cd|dis[ck])\s*\d+$", re.IGNORECASE)
+
+# Album folders named "Artist - Album" or "Artist - 2019 - Album"
+_ALBUM_DIR_PATTERN = re.compile(
+    r"^(.+?)\s+[-–—]\s+(?:(?:19|20)\d{2}\s+[-–—]\s+)?(.+)$"
+)
+
+# Album of each track: {(path, mtime_ns, size): (artist, album) or None}
+_ALBUM_INFO: Dict[Tuple[str, int, int], Optional[Tuple[str, str]]] = {}
+
+
+def _album_from_directory(
+    track_path: Path, artist: str
+) -> Optional[Tuple[str, str]]:
+    """
+    Derive a track's album from the folder it is in.
+
+    Only unambiguous layouts are recognised: an "Artist - Album" folder
+    or an "Artist/Album" hierarchy, either one only when its artist
+    matches the track's artist (so "Various - Summer Hits" is not taken
+    for an album by "Various"). Disc folders ("CD1", "Disc 2") are looked
+    through.
+    """
+    if not artist:
+        return None
+
+    def same_artist(name):
+        return " ".join(name.casefold().split()) == " ".join(
+            artist.casefold().split()
+        )
+
+    directory = track_path.parent
+    if _DISC_DIR_PATTERN.match(directory.name):
+        directory = directory.parent
+
+    match = _ALBUM_DIR_PATTERN.match(directory.name)
+    if match and same_artist(match.group(1)):
+        return match.group(1).strip(), match.group(2).strip()
+
+    parent = directory.parent.name
+    if directory.name and same_artist(parent):
+        return parent, directory.name
+
+    return None
+
+
+def get_album_info(
+    track_path: Union[str, Path], artist: str = ""
+) -> Optional[Tuple[str, str]]:
+    """
+    Get the album a track belongs to.
+
+    The album and album artist tags are used when present; otherwise the
+    album is derived from the containing folder (see
+    ``_album_from_directory``). Results are remembered per path, size and
+    modification time.
+
+    Args:
+        track_path: Path to the audio file
+        artist: Artist parsed from the filename; folder layouts are only
+            recognised when their artist matches it
+
+    Returns:
+        Optional[Tuple[str, str]]: Album artist and album title, or None if
+        the album can't be determined
+    """
+    path = Path(track_path).absolute()
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+
+    stamp = (str(path), stats.st_mtime_ns, stats.st_size)
+    if stamp in _ALBUM_INFO:
+        return _ALBUM_INFO[stamp]
+
+    album = read_album_tags(path) or _album_from_directory(path, artist)
+    if len(_ALBUM_INFO) >= 65536:
+        _ALBUM_INFO.clear()
+    _ALBUM_INFO[stamp] = album
+    return album
+
+
+def make_album_lookup_key(artist: str, album: str) -> str:
+    """
+    Build the key identifying an album query.
+
+    Album covers are cached and recorded as misses under this key.
+
+    Args:
+        artist: Album artist
+        album: Album title
+
+    Returns:
+        str: The lookup key
+    """
+    return f"album\x1f{make_lookup_key(artist, album)}"
+
+
+def get_cached_album_cover(
+    artist: str, album: str, size: Optional[int] = None
+) -> Optional[str]:
+    """
+    Check if cover art for the given album is in the cache.
+
+    Args:
+        artist: Album artist
+        album: Album title
+        size: Desired longest edge in pixels (nearest stored size is used)
+
+    Returns:
+        Optional[str]: Path to cached cover art, or None if not in cache
+    """
+    return _COVER_CACHE.get(make_album_lookup_key(artist, album), size)
+
+
+def save_album_to_cache(artist: str, album: str, image_data: bytes) -> str:
+    """
+    Save a downloaded album cover to the cache.
+
+    Args:
+        artist: Album artist
+        album: Album title
+        image_data: Binary image data
+
+    Returns:
+        str: Path to the cached file
+    """
+    return _COVER_CACHE.put(make_album_lookup_key(artist, album), image_data)
+
+
+def is_fetch_recently_failed(artist: str, title: str) -> bool:
+    """
+    Check if we recently failed to fetch a cover for this query.
+
+    Failures are remembered across restarts for ``cover_art.cache_ttl``
+    seconds.
+
+    Args:
+        artist: Artist name
+        title: Track title
 
     Returns:
         bool: True if we recently failed and should not retry yet
     """
-    # Get cache TTL from settings
+    return _is_key_recently_failed(make_lookup_key(artist, title))
+
+
+def _is_key_recently_failed(lookup_key: str) -> bool:
+    """Check the failed-fetch cache for a lookup key."""
+    global _failed_fetch_cache_purged
+
     cache_ttl = get_setting("cover_art", "cache_ttl", 3600)
 
-    if track_path in _FAILED_FETCH_CACHE:
-        last_attempt = _FAILED_FETCH_CACHE[track_path]
-        if time.time() - last_attempt < cache_ttl:
-            return True
-        # Expired entry, remove it
-        del _FAILED_FETCH_CACHE[track_path]
-    return False
+    # Drop entries left over from earlier sessions once per process
+    if not _failed_fetch_cache_purged:
+        _failed_fetch_cache_purged = True
+        _FAILED_FETCH_CACHE.purge(cache_ttl)
+
+    return _FAILED_FETCH_CACHE.contains(lookup_key, cache_ttl)
+
+
+def mark_fetch_failed(artist: str, title: str):
+    """
+    Mark a query as having failed fetching so we don't retry too soon.
+
+    Args:
+        artist: Artist name
+        title: Track title
+    """
+    _FAILED_FETCH_CACHE.add(make_lookup_key(artist, title))
+
+
+# Token bucket size, i.e. how many API requests may be sent in a burst
+DEFAULT_PROVIDER_BURST = 5
+
+# Bounds (seconds) of the exponential backoff after throttling/5xx replies
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Longest Retry-After (seconds) we are willing to wait for in one retry
+MAX_RETRY_WAIT = 300.0
+
+
+class _ProviderThrottle:
+    """Token-bucket rate limiter with adaptive backoff for one provider."""
+
+    def __init__(self, burst: int = DEFAULT_PROVIDER_BURST):
+        """Initialize a full bucket."""
+        self._lock = threading.Lock()
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._failures = 0
+
+    def acquire(self, rate: float, cancel=None, block: bool = True) -> bool:
+        """
+        Wait until a request may be sent and take a token.
+
+        Args:
+            rate: Sustained requests per second (<= 0 disables limiting)
+            cancel: Event that aborts the wait when set
+            block: Wait for a token; if False, give up at once when none
+                is available
+
+        Returns:
+            bool: True once a request may be sent, False if cancelled (or
+            no token was available without blocking)
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if rate > 0:
+                    self._tokens = min(
+                        self.burst,
+                        self._tokens + (now - self._updated) * rate,
+                    )
+                else:
+                    self._tokens = float(self.burst)
+                self._updated = now
+
+                if now >= self._resume_at and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+
+                delay = max(
+                    self._resume_at - now,
+                    (1 - self._tokens) / rate if rate > 0 else 0,
+                )
+
+            if not block or _is_cancelled(cancel):
+                return False
+            time.sleep(min(max(delay, 0.001), 0.1))
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """
+        Pause the provider after a throttled or failed request.
+
+        Args:
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            float: Seconds until requests are allowed again
+        """
+        with self._lock:
+            self._failures += 1
+            if retry_after is not None:
+                delay = min(max(retry_after, 0.0), MAX_RETRY_WAIT)
+            else:
+                delay = min(
+                    BACKOFF_BASE * 2 ** (self._failures - 1), BACKOFF_MAX
+                )
+                delay += random.uniform(0, delay / 10)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            return self._resume_at - time.monotonic()
+
+    def wait_time(self, rate: float) -> float:
+        """Get the seconds until a request may be sent (without taking it)."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._tokens + (now - self._updated) * rate
+            refill = (1 - tokens) / rate if rate > 0 and tokens < 1 else 0
+            return max(self._resume_at - now, refill, 0.0)
+
+    def reset(self):
+        """Forget earlier failures after a successful request."""
+        with self._lock:
+            self._failures = 0
+
+
+# Rate limiters keyed by provider name
+_PROVIDER_THROTTLES: Dict[str, _ProviderThrottle] = {}
+
+# Whether the current lookup may wait for rate limiters and backoff; False
+# for interactive lookups, which are deferred instead (see fetch_cover_art)
+_THROTTLE_BLOCKING = contextvars.ContextVar(
+    "dolboebify_throttle_blocking", default=True
+)
+
+
+def _get_provider_throttle(name: str) -> _ProviderThrottle:
+    """Get (creating if needed) the rate limiter for a provider."""
+    with _PROVIDER_LIMITS_LOCK:
+        if name not in _PROVIDER_THROTTLES:
+            _PROVIDER_THROTTLES[name] = _ProviderThrottle()
+        return _PROVIDER_THROTTLES[name]
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _provider_get(
+    provider: str, *args, api: bool = True, cancel=None, **kwargs
+):
+    """
+    Send a GET request on behalf of a provider.
+
+    API requests are rate limited by the provider's token bucket
+    (``cover_art.provider_rates``). Replies with status 429 or 5xx pause
+    the provider, honouring ``Retry-After``, and raise
+    ``ProviderThrottledError`` so the lookup is retried rather than
+    recorded as a miss. Interactive lookups (``fetch_cover_art`` with
+    ``block=False``) never wait for the rate limiter; they raise
+    ``ProviderThrottledError`` right away instead.
 
+    Args:
+        provider: Provider name
+        *args: Positional arguments for ``requests.Session.get``
+        api: Whether this is a rate-limited API call (not an image download)
+        cancel: Event that aborts waiting for the rate limiter
+        **kwargs: Keyword arguments for ``requests.Session.get``
+
+    Returns:
+        The response, or None if cancelled while waiting
 
-def mark_fetch_failed(track_path: str):
+    Raises:
+        ProviderThrottledError: If the provider throttled the request
     """
-    Mark a track as having failed fetching so we don't retry too soon.
+    throttle = _get_provider_throttle(provider)
+    if api:
+        rates = get_setting("cover_art", "provider_rates", {}) or {}
+        rate = rates.get(provider, 0)
+        if not throttle.acquire(rate, cancel, _THROTTLE_BLOCKING.get()):
+            if _is_cancelled(cancel):
+                return None
+            raise ProviderThrottledError(provider, throttle.wait_time(rate))
+
+    response = get_http_session().get(*args, **kwargs)
+
+    status = response.status_code
+    if status == 429 or (isinstance(status, int) and 500 <= status < 600):
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        raise ProviderThrottledError(provider, throttle.backoff(retry_after))
+
+    throttle.reset()
+    return response
+
+
+# Public API endpoints, overridable through cover_art.provider_urls
+DEFAULT_PROVIDER_URLS = {
+    "itunes": "https://itunes.apple.com",
+    "lastfm": "http://ws.audioscrobbler.com",
+}
+
+
+def get_provider_url(name: str) -> str:
+    """
+    Get the base URL of a provider's API.
 
     Args:
-        track_path: Path to the track
+        name: Provider name
+
+    Returns:
+        str: Base URL without a trailing slash
     """
-    _FAILED_FETCH_CACHE[track_path] = time.time()
+    urls = get_setting("cover_art", "provider_urls", {}) or {}
+    return (urls.get(name) or DEFAULT_PROVIDER_URLS[name]).rstrip("/")
+
+
+# Last.fm API key (you would need to register for a proper key)
+# For this example, we're using a placeholder key - replace with a real one
+LASTFM_API_KEY = "12dec50c463b791ff530a6297d6c5638"
 
 
-def fetch_from_itunes(artist: str, title: str) -> Optional[str]:
+def fetch_from_itunes(
+    artist: str, title: str, cancel: Optional[threading.Event] = None
+) -> Optional[str]:
     """
     Fetch album cover from iTunes API.
 
     Args:
         artist: Artist name
         title: Track title
+        cancel: Event that aborts the lookup before the next request
 
     Returns:
         Optional[str]: Path to downloaded cover art, or None if not found
@@ -178,10 +787,13 @@ def fetch_from_itunes(artist: str, title: str) -> Optional[str]:
     query = f"{artist} {title}"
 
     try:
-        url = f"https://itunes.apple.com/search?term={quote(query)}&media=music&limit=1"
-        response = requests.get(url, timeout=timeout)
+        url = (
+            f"{get_provider_url('itunes')}/search?"
+            f"term={quote(query)}&media=music&limit=1"
+        )
+        response = _provider_get("itunes", url, timeout=timeout, cancel=cancel)
 
-        if response.status_code != 200:
+        if response is None or response.status_code != 200:
             return None
 
         data = response.json()
@@ -197,8 +809,13 @@ def fetch_from_itunes(artist: str, title: str) -> Optional[str]:
             # Try to get higher resolution by modifying the URL
             artwork_url = artwork_url.replace("100x100", "600x600")
 
+            if _is_cancelled(cancel):
+                return None
+
             # Download the image
-            img_response = requests.get(url=artwork_url, timeout=timeout)
+            img_response = _provider_get(
+                "itunes", url=artwork_url, timeout=timeout, api=False
+            )
             if img_response.status_code == 200:
                 return save_to_cache(artist, title, img_response.content)
 
@@ -208,13 +825,16 @@ def fetch_from_itunes(artist: str, title: str) -> Optional[str]:
     return None
 
 
-def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
+def fetch_from_lastfm(
+    artist: str, title: str, cancel: Optional[threading.Event] = None
+) -> Optional[str]:
     """
     Fetch album cover from Last.fm API.
 
     Args:
         artist: Artist name
         title: Track title
+        cancel: Event that aborts the lookup before the next request
 
     Returns:
         Optional[str]: Path to downloaded cover art, or None if not found
@@ -226,9 +846,7 @@ def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
     # Get request timeout from settings
     timeout = get_setting("cover_art", "timeout", 2.0)
 
-    # Last.fm API key (you would need to register for a proper key)
-    # For this example, we're using a placeholder key - replace with a real one
-    api_key = "12dec50c463b791ff530a6297d6c5638"
+    api_key = LASTFM_API_KEY
 
     # Check cache first
     cached = get_cached_cover(artist, title)
@@ -241,13 +859,13 @@ def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
     try:
         # Try track.getInfo first
         url = (
-            f"http://ws.audioscrobbler.com/2.0/?"
+            f"{get_provider_url('lastfm')}/2.0/?"
             f"method=track.getInfo&api_key={api_key}&"
             f"artist={quote(artist)}&track={quote(title)}&format=json"
         )
-        response = requests.get(url, timeout=timeout)
+        response = _provider_get("lastfm", url, timeout=timeout, cancel=cancel)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             data = response.json()
             if "track" in data and "album" in data["track"]:
                 album = data["track"]["album"]
@@ -256,9 +874,14 @@ def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
                     for img in reversed(album["image"]):
                         if img["size"] == "extralarge" and img["#text"]:
                             img_url = img["#text"]
+                            if _is_cancelled(cancel):
+                                return None
                             try:
-                                img_response = requests.get(
-                                    img_url, timeout=timeout
+                                img_response = _provider_get(
+                                    "lastfm",
+                                    img_url,
+                                    timeout=timeout,
+                                    api=False,
                                 )
                                 if img_response.status_code == 200:
                                     return save_to_cache(
@@ -267,24 +890,29 @@ def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
                             except requests.RequestException:
                                 pass
 
+        if _is_cancelled(cancel):
+            return None
+
         # If track.getInfo didn't work, try artist.getInfo
         url = (
-            f"http://ws.audioscrobbler.com/2.0/?"
+            f"{get_provider_url('lastfm')}/2.0/?"
             f"method=artist.getInfo&api_key={api_key}&"
             f"artist={quote(artist)}&format=json"
         )
-        response = requests.get(url, timeout=timeout)
+        response = _provider_get("lastfm", url, timeout=timeout, cancel=cancel)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             data = response.json()
             if "artist" in data and "image" in data["artist"]:
                 # Get the largest image (last in the list)
                 for img in reversed(data["artist"]["image"]):
                     if img["size"] == "mega" and img["#text"]:
                         img_url = img["#text"]
+                        if _is_cancelled(cancel):
+                            return None
                         try:
-                            img_response = requests.get(
-                                img_url, timeout=timeout
+                            img_response = _provider_get(
+                                "lastfm", img_url, timeout=timeout, api=False
                             )
                             if img_response.status_code == 200:
                                 return save_to_cache(
@@ -299,17 +927,462 @@ def fetch_from_lastfm(artist: str, title: str) -> Optional[str]:
     return None
 
 
-def fetch_cover_art(track_path: Union[str, Path]) -> Optional[str]:
+def fetch_album_from_itunes(
+    artist: str, album: str, cancel: Optional[threading.Event] = None
+) -> Optional[str]:
+    """
+    Fetch an album cover from the iTunes API.
+
+    Args:
+        artist: Album artist
+        album: Album title
+        cancel: Event that aborts the lookup before the next request
+
+    Returns:
+        Optional[str]: Path to downloaded cover art, or None if not found
+    """
+    timeout = get_setting("cover_art", "timeout", 2.0)
+    query = f"{artist} {album}"
+
+    try:
+        url = (
+            f"{get_provider_url('itunes')}/search?"
+            f"term={quote(query)}&media=music&entity=album&limit=1"
+        )
+        response = _provider_get("itunes", url, timeout=timeout, cancel=cancel)
+
+        if response is None or response.status_code != 200:
+            return None
+
+        data = response.json()
+        if not data["resultCount"]:
+            return None
+
+        artwork_url = data["results"][0].get("artworkUrl100")
+        if artwork_url and not _is_cancelled(cancel):
+            artwork_url = artwork_url.replace("100x100", "600x600")
+            img_response = _provider_get(
+                "itunes", url=artwork_url, timeout=timeout, api=False
+            )
+            if img_response.status_code == 200:
+                return save_album_to_cache(artist, album, img_response.content)
+
+    except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
+        print(f"Error fetching album cover from iTunes: {e}")
+
+    return None
+
+
+def fetch_album_from_lastfm(
+    artist: str, album: str, cancel: Optional[threading.Event] = None
+) -> Optional[str]:
+    """
+    Fetch an album cover from the Last.fm API (album.getInfo).
+
+    Args:
+        artist: Album artist
+        album: Album title
+        cancel: Event that aborts the lookup before the next request
+
+    Returns:
+        Optional[str]: Path to downloaded cover art, or None if not found
+    """
+    timeout = get_setting("cover_art", "timeout", 2.0)
+
+    try:
+        url = (
+            f"{get_provider_url('lastfm')}/2.0/?"
+            f"method=album.getInfo&api_key={LASTFM_API_KEY}&"
+            f"artist={quote(artist)}&album={quote(album)}&format=json"
+        )
+        response = _provider_get("lastfm", url, timeout=timeout, cancel=cancel)
+
+        if response is None or response.status_code != 200:
+            return None
+
+        data = response.json()
+        images = data.get("album", {}).get("image", [])
+        # Get the largest image (last in the list)
+        for img in reversed(images):
+            if img["size"] in ("mega", "extralarge") and img["#text"]:
+                if _is_cancelled(cancel):
+                    return None
+                img_response = _provider_get(
+                    "lastfm", img["#text"], timeout=timeout, api=False
+                )
+                if img_response.status_code == 200:
+                    return save_album_to_cache(
+                        artist, album, img_response.content
+                    )
+                break
+
+    except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
+        print(f"Error fetching album cover from Last.fm: {e}")
+
+    return None
+
+
+# A named provider lookup function: (name, fetch_from_...)
+Provider = Tuple[str, Callable[..., Optional[str]]]
+
+
+def _get_providers() -> List[Provider]:
+    """Get the cover-art providers in order of preference."""
+    return [("itunes", fetch_from_itunes), ("lastfm", fetch_from_lastfm)]
+
+
+def _get_album_providers() -> List[Provider]:
+    """Get the album cover providers in order of preference."""
+    return [
+        ("itunes", fetch_album_from_itunes),
+        ("lastfm", fetch_album_from_lastfm),
+    ]
+
+
+def _call_provider(
+    provider: Provider, artist: str, title: str, cancel=None
+) -> Optional[str]:
+    """Run one provider lookup within the provider's concurrency limit."""
+    name, fetch = provider
+    with _get_provider_limit(name):
+        if _is_cancelled(cancel):
+            return None
+        return fetch(artist, title, cancel=cancel)
+
+
+def _raise_throttled(errors: List[ProviderThrottledError]):
+    """Combine the throttling errors of several providers and raise them."""
+    if errors:
+        raise ProviderThrottledError(
+            [name for e in errors for name in e.providers],
+            max(e.retry_after for e in errors),
+        )
+
+
+def _lookup_sequential(
+    providers: List[Provider], artist: str, title: str, cancel=None
+) -> Optional[str]:
+    """
+    Query providers one after another and return the first cover.
+
+    Raises:
+        ProviderThrottledError: If no cover was found and some providers
+            were throttled
+    """
+    throttled = []
+    for provider in providers:
+        if _is_cancelled(cancel):
+            return None
+        try:
+            cover = _call_provider(provider, artist, title, cancel)
+        except ProviderThrottledError as e:
+            throttled.append(e)
+            continue
+        if cover:
+            return cover
+    _raise_throttled(throttled)
+    return None
+
+
+def _lookup_hedged(
+    providers: List[Provider],
+    artist: str,
+    title: str,
+    hedge_delay: float,
+    cancel=None,
+) -> Optional[str]:
+    """
+    Query providers concurrently and return the first cover found.
+
+    Providers are started in order. The next one is started as soon as
+    the previous ones have missed or after ``hedge_delay`` seconds without
+    an answer, whichever comes first (a delay of 0 starts all at once).
+    Once a cover is found the remaining lookups are cancelled.
+
+    Args:
+        providers: Named providers in order of preference
+        artist: Artist name
+        title: Track title
+        hedge_delay: Seconds to wait before starting the next provider
+        cancel: Event that aborts all lookups when set
+
+    Returns:
+        Optional[str]: Path to the cover art, or None if no provider found it
+
+    Raises:
+        ProviderThrottledError: If no cover was found and some providers
+            were throttled
+    """
+    executor = _get_lookup_executor()
+    finished = threading.Event()
+    stop = _AnyEvent(finished, cancel)
+    waiting = list(providers)
+    running = set()
+    throttled = []
+
+    try:
+        while waiting or running:
+            if stop.is_set():
+                # Start nothing more; only collect the lookups still running
+                waiting.clear()
+                if not running:
+                    break
+            elif waiting:
+                provider = waiting.pop(0)
+                running.add(
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        _call_provider,
+                        provider,
+                        artist,
+                        title,
+                        stop,
+                    )
+                )
+
+            done, running = wait(
+                running,
+                timeout=max(hedge_delay, 0) if waiting else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                try:
+                    cover = future.result()
+                except ProviderThrottledError as e:
+                    throttled.append(e)
+                    continue
+                except Exception as e:
+                    print(f"Unexpected error fetching cover art: {e}")
+                    continue
+                if cover:
+                    return cover
+    finally:
+        finished.set()
+        for future in running:
+            future.cancel()
+
+    _raise_throttled(throttled)
+    return None
+
+
+class _Call:
+    """An in-flight single-flight call and its eventual outcome."""
+
+    __slots__ = ("done", "result", "error", "cancelled")
+
+    def __init__(self):
+        """Initialize a pending call."""
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+
+
+# How often (seconds) a waiting follower checks its own cancel event
+SINGLE_FLIGHT_POLL = 0.05
+
+# Longest time (seconds) a caller waits for a lookup started by another one
+MAX_SHARED_WAIT = 30.0
+
+
+class _SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Optional[str]],
+        cancel: Optional[threading.Event] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Run ``fn`` unless a call with the same key is already running.
+
+        The first caller for a key runs ``fn``; callers arriving while it
+        runs wait for it and receive the same result (or exception). If
+        the running call was cancelled by its own caller, or deferred as a
+        non-blocking lookup, without finding anything, the waiting callers
+        retry instead of taking its None.
+
+        Args:
+            key: Key identifying the call
+            fn: Function to run (with this caller's ``cancel``)
+            cancel: Event of this caller; stops running or waiting when set
+            timeout: Longest time to wait for another caller's call
+
+        Returns:
+            Optional[str]: The result of the shared call, or None if this
+            caller was cancelled or timed out while waiting
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                break
+
+            while True:
+                poll = SINGLE_FLIGHT_POLL
+                if deadline is not None:
+                    poll = min(poll, max(deadline - time.monotonic(), 0))
+                if call.done.wait(poll):
+                    break
+                if _is_cancelled(cancel):
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+            if call.cancelled and call.result is None:
+                # The leader gave up; retry (or take over) unless we did too
+                if _is_cancelled(cancel):
+                    return None
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.cancelled = (
+                _is_cancelled(cancel) or not _THROTTLE_BLOCKING.get()
+            )
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Get the number of calls currently running."""
+        with self._lock:
+            return len(self._calls)
+
+
+# Online lookups in flight, keyed by make_lookup_key
+_IN_FLIGHT = _SingleFlight()
+
+
+def _fetch_online(
+    artist: str,
+    title: str,
+    cancel: Optional[threading.Event] = None,
+    providers: Optional[List[Provider]] = None,
+    lookup_key: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Look a query up with the online providers and record misses.
+
+    Args:
+        artist: Artist name
+        title: Track (or album) title
+        cancel: Event that aborts the lookup when set
+        providers: Providers to query (default: the track providers)
+        lookup_key: Key a miss is recorded under (default: the track's
+            ``make_lookup_key``)
+
+    Returns:
+        Optional[str]: Path to the downloaded cover art, or None if not found
+    """
+    if providers is None:
+        providers = _get_providers()
+    if lookup_key is None:
+        lookup_key = make_lookup_key(artist, title)
+    retries = get_setting("cover_art", "throttle_retries", 3)
+    if not _THROTTLE_BLOCKING.get():
+        # Waiting for the backoff is left to the background fetchers
+        retries = 0
+
+    for attempt in range(max(retries, 0) + 1):
+        try:
+            if get_setting("cover_art", "lookup_mode", "hedged") == "hedged":
+                hedge_delay = get_setting("cover_art", "hedge_delay", 0.5)
+                cover = _lookup_hedged(
+                    providers, artist, title, hedge_delay, cancel
+                )
+            else:
+                cover = _lookup_sequential(providers, artist, title, cancel)
+            if cover:
+                return cover
+            break
+        except ProviderThrottledError as e:
+            # Re-queue the lookup with only the throttled providers; their
+            # rate limiters hold the retry back until the backoff expires
+            providers = [p for p in providers if p[0] in e.providers]
+            if attempt == retries or _is_cancelled(cancel):
+                print(f"Cover lookup for {artist} - {title} deferred: {e}")
+                # Throttling says nothing about the query, so no miss
+                return None
+        except Exception as e:
+            print(f"Unexpected error fetching cover art: {e}")
+            break
+
+    # A cancelled lookup is not a miss
+    if _is_cancelled(cancel):
+        return None
+
+    # If we get here, we failed to find a cover
+    _FAILED_FETCH_CACHE.add(lookup_key)
+    return None
+
+
+def fetch_cover_art(
+    track_path: Union[str, Path],
+    cancel: Optional[threading.Event] = None,
+    block: bool = True,
+) -> Optional[str]:
     """
     Fetch cover art for a track from various external APIs.
 
     This function tries different sources in the following order:
-    1. Local cache
-    2. iTunes API
-    3. Last.fm API
+    1. Local cache (album cover, then track cover)
+    2. Album lookup (iTunes, then Last.fm)
+    3. Track lookup (iTunes, then Last.fm)
+
+    Tracks are grouped by album (``get_album_info``: tags, or the folder
+    they are in), so an album needs one online lookup and one cached image
+    shared by all its tracks. The per-track lookup is only made when the
+    album is unknown or its lookup found nothing; set
+    ``cover_art.album_lookup`` to false to always look tracks up
+    individually.
+
+    Concurrent calls that resolve to the same artist/title query (e.g.
+    the same track requested by the UI and a prefetch) share a single
+    online lookup. A caller waits at most ``MAX_SHARED_WAIT`` seconds
+    for a lookup started by another one, and takes it over if that
+    caller cancels it.
+
+    With the ``cover_art.lookup_mode`` setting at "hedged" (the default),
+    the Last.fm lookup is started while iTunes is still running once
+    iTunes misses or ``cover_art.hedge_delay`` seconds have passed, and
+    the first cover found wins.
+
+    Provider API requests are rate limited per provider
+    (``cover_art.provider_rates``). Providers that reply 429 or 5xx are
+    backed off exponentially (or for as long as ``Retry-After`` asks) and
+    the lookup is retried up to ``cover_art.throttle_retries`` times;
+    throttled lookups are never recorded as misses.
+
+    Interactive callers (e.g. the UI thread) pass ``block=False``: the
+    lookup then never waits for a rate limiter, a backoff or another
+    caller's lookup of the same query, and returns None right away when
+    it would have to. The waiting is left to background fetchers and the
+    prefetcher, which use the default ``block=True``.
 
     Args:
         track_path: Path to the audio file
+        cancel: Event that aborts the online lookup when set
+        block: Wait for rate limiters and shared lookups (False defers)
 
     Returns:
         Optional[str]: Path to the downloaded cover art, or None if not found
@@ -318,18 +1391,17 @@ def fetch_cover_art(track_path: Union[str, Path]) -> Optional[str]:
     if not get_setting("cover_art", "enabled", True):
         return None
 
-    # Convert to string for consistent handling
-    track_path_str = str(Path(track_path).absolute())
-
-    # Check if we recently failed to fetch this cover
-    if is_fetch_recently_failed(track_path_str):
-        return None
-
-    # Extract the filename
-    filename = Path(track_path).name
+    # Try to parse artist and title from the filename (and its folders)
+    artist, title = parse_track_info(track_path)
 
-    # Try to parse artist and title from the filename
-    artist, title = parse_track_info(filename)
+    # Group the track with the rest of its album, if that is known
+    album = None
+    if get_setting("cover_art", "album_lookup", True):
+        album = get_album_info(track_path, artist)
+        if album:
+            cached = get_cached_album_cover(*album)
+            if cached:
+                return cached
 
     # Check if we already have this cover art in cache
     cached = get_cached_cover(artist, title)
@@ -340,19 +1412,49 @@ def fetch_cover_art(track_path: Union[str, Path]) -> Optional[str]:
     if not get_setting("cover_art", "fetch_online", True):
         return None
 
+    token = _THROTTLE_BLOCKING.set(block)
     try:
-        # Try iTunes API
-        cover = fetch_from_itunes(artist, title)
-        if cover:
-            return cover
+        return _fetch_cover_online(
+            artist, title, album, cancel, MAX_SHARED_WAIT if block else 0
+        )
+    finally:
+        _THROTTLE_BLOCKING.reset(token)
+
+
+def _fetch_cover_online(
+    artist: str,
+    title: str,
+    album: Optional[Tuple[str, str]],
+    cancel: Optional[threading.Event],
+    shared_wait: float,
+) -> Optional[str]:
+    """Run the album, then the track lookup of ``fetch_cover_art``."""
+    if album:
+        album_key = make_album_lookup_key(*album)
+        if not _is_key_recently_failed(album_key):
+            # All tracks of the album share one online fetch
+            cover = _IN_FLIGHT.do(
+                album_key,
+                lambda: _fetch_online(
+                    *album, cancel, _get_album_providers(), album_key
+                ),
+                cancel,
+                shared_wait,
+            )
+            if cover:
+                return cover
+            if not _is_key_recently_failed(album_key):
+                # Deferred by throttling or cancelled, not a miss
+                return None
 
-        # Try Last.fm API
-        cover = fetch_from_lastfm(artist, title)
-        if cover:
-            return cover
-    except Exception as e:
-        print(f"Unexpected error fetching cover art: {e}")
+    # Check if we recently failed to fetch this cover
+    if is_fetch_recently_failed(artist, title):
+        return None
 
-    # If we get here, we failed to find a cover
-    mark_fetch_failed(track_path_str)
-    return None
+    # Concurrent lookups of the same query share one online fetch
+    return _IN_FLIGHT.do(
+        make_lookup_key(artist, title),
+        lambda: _fetch_online(artist, title, cancel),
+        cancel,
+        shared_wait,
+    )
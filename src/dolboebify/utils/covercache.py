@@ -0,0 +1,622 @@
+"""Size-capped, content-addressed LRU cache of downloaded cover art."""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from dolboebify.utils import thumbnails
+from dolboebify.utils.config import get_setting
+from dolboebify.utils.dbutils import connect_db
+
+# Cache directory for downloaded cover art
+COVER_CACHE_DIR = Path.home() / ".cache" / "dolboebify" / "covers"
+
+# Name of the index database inside the cache directory
+INDEX_FILENAME = "index.sqlite3"
+
+# Subdirectory holding the image files, named by content hash
+BLOBS_DIRNAME = "blobs"
+
+# Subdirectory holding the scaled renditions of the images
+THUMBS_DIRNAME = "thumbs"
+
+# Index layout version (stored in PRAGMA user_version)
+INDEX_VERSION = 3
+
+# Minimum interval (seconds) between last-access updates of one entry
+ACCESS_UPDATE_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    dim INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS thumbs (
+    hash TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (hash, dim)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS covers (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS covers_last_access ON covers (last_access);
+CREATE INDEX IF NOT EXISTS covers_hash ON covers (hash);
+"""
+
+
+def content_hash(data: bytes) -> str:
+    """Get the content address (SHA-256 hex digest) of image data."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class _StagedFile(NamedTuple):
+    """A file written to a temporary name, to be renamed into the cache."""
+
+    # Path relative to the cache directory
+    filename: str
+    # Temporary file holding the data
+    tmp_path: str
+    # Size in bytes
+    size: int
+
+
+class _StagedImage(NamedTuple):
+    """A new image and its renditions, written but not indexed yet."""
+
+    digest: str
+    blob: _StagedFile
+    # Longest edge of the image (0 if it can't be decoded), or None if
+    # renditions can't be generated here
+    dimension: Optional[int]
+    # Renditions by longest edge
+    thumbs: List[Tuple[int, _StagedFile]]
+
+
+class CoverCache:
+    """
+    Cover art files on disk with an index of key -> image, last access.
+
+    Images are stored once per distinct content (named by their SHA-256
+    hash) and any number of keys can point at the same image, so e.g. all
+    tracks of an album share one file. Lookups are answered from the index
+    without touching the image files. Whenever a new cover is stored, the
+    least recently used keys are evicted, and images no key refers to any
+    more are deleted, until the cache fits within its byte and entry
+    budget. The byte budget counts each distinct image once.
+
+    When an image is stored, scaled-down renditions for the sizes in
+    ``cover_art.thumbnail_sizes`` are generated alongside it, so views can
+    load the nearest size (see ``get``) instead of decoding and resampling
+    the full image.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = COVER_CACHE_DIR,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding the images and the index
+            max_bytes: Byte budget (defaults to ``cover_art.cache_max_bytes``)
+            max_entries: Entry budget (defaults to
+                ``cover_art.cache_max_entries``)
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._total_entries = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index on first use (caller holds the lock)."""
+        if self._conn is not None:
+            return self._conn
+
+        conn = self._conn = connect_db(
+            self.directory / INDEX_FILENAME, _SCHEMA
+        )
+
+        # Move covers from older cache layouts into content-addressed blobs
+        if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            conn.execute("DROP TABLE IF EXISTS entries")
+            columns = [
+                row[1] for row in conn.execute("PRAGMA table_info(blobs)")
+            ]
+            if "dim" not in columns:
+                conn.execute("ALTER TABLE blobs ADD COLUMN dim INTEGER")
+            if self.directory.is_dir():
+                self._adopt_legacy_files(conn)
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            conn.commit()
+
+        self._total_entries = conn.execute(
+            "SELECT COUNT(*) FROM covers"
+        ).fetchone()[0]
+        self._total_bytes = (
+            conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()[0]
+            + conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM thumbs"
+            ).fetchone()[0]
+        )
+        return conn
+
+    def _adopt_legacy_files(self, conn: sqlite3.Connection):
+        """Index covers stored as ``<key>.jpg`` by earlier versions."""
+        for path in self.directory.glob("*.jpg"):
+            try:
+                data = path.read_bytes()
+                stats = path.stat()
+                digest = self._store_blob(conn, data, path.suffix)
+                os.unlink(path)
+            except OSError as e:
+                print(f"Error adopting cached cover {path}: {e}")
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO covers VALUES (?, ?, ?)",
+                (path.stem, digest, stats.st_mtime),
+            )
+        conn.commit()
+
+    def _has_blob(self, conn: sqlite3.Connection, digest: str) -> bool:
+        """Check whether an image is stored (caller holds the lock)."""
+        return (
+            conn.execute(
+                "SELECT 1 FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            is not None
+        )
+
+    def _store_blob(
+        self, conn: sqlite3.Connection, data: bytes, suffix: str
+    ) -> str:
+        """Write image data unless already stored; return its hash."""
+        digest = content_hash(data)
+        if not self._has_blob(conn, digest):
+            self._index_image(conn, self._stage_image(digest, data, suffix))
+        return digest
+
+    def _stage_image(
+        self, digest: str, data: bytes, suffix: str
+    ) -> _StagedImage:
+        """Write an image and its renditions under temporary names."""
+        blob = _StagedFile(
+            f"{BLOBS_DIRNAME}/{digest[:2]}/{digest}{suffix}",
+            self._write_temp(data),
+            len(data),
+        )
+        dimension, thumbs = self._stage_thumbnails(digest, data)
+        return _StagedImage(digest, blob, dimension, thumbs)
+
+    def _index_image(self, conn: sqlite3.Connection, image: _StagedImage):
+        """Move a staged image into place and index it (caller holds lock)."""
+        if self._has_blob(conn, image.digest):
+            # Stored by another thread meanwhile
+            self._discard(image.blob, *(thumb for _, thumb in image.thumbs))
+            return
+
+        try:
+            self._move_into_place(image.blob)
+        except OSError:
+            self._discard(*(thumb for _, thumb in image.thumbs))
+            raise
+        conn.execute(
+            "INSERT INTO blobs (hash, file, size) VALUES (?, ?, ?)",
+            (image.digest, image.blob.filename, image.blob.size),
+        )
+        self._total_bytes += image.blob.size
+        self._index_thumbnails(
+            conn, image.digest, image.dimension, image.thumbs
+        )
+
+    def _thumbnail_sizes(self) -> List[int]:
+        """Get the rendition sizes to generate."""
+        return get_setting(
+            "cover_art",
+            "thumbnail_sizes",
+            list(thumbnails.DEFAULT_THUMBNAIL_SIZES),
+        )
+
+    def _stage_thumbnails(
+        self, digest: str, data: bytes
+    ) -> Tuple[Optional[int], List[Tuple[int, _StagedFile]]]:
+        """Generate the scaled renditions of an image into temporary files."""
+        if not thumbnails.is_available():
+            return None, []
+
+        dimension, renditions = thumbnails.make_thumbnails(
+            data, self._thumbnail_sizes()
+        )
+        staged = []
+        for dim, thumb_data in renditions.items():
+            filename = f"{THUMBS_DIRNAME}/{digest[:2]}/{digest}_{dim}.jpg"
+            try:
+                tmp_path = self._write_temp(thumb_data)
+            except OSError as e:
+                print(f"Error writing thumbnail {filename}: {e}")
+                continue
+            staged.append(
+                (dim, _StagedFile(filename, tmp_path, len(thumb_data)))
+            )
+        # A dimension of 0 marks images that can't be decoded
+        return dimension or 0, staged
+
+    def _index_thumbnails(
+        self,
+        conn: sqlite3.Connection,
+        digest: str,
+        dimension: Optional[int],
+        thumbs: List[Tuple[int, _StagedFile]],
+    ):
+        """Move staged renditions into place and index them (lock held)."""
+        if dimension is None:
+            return
+
+        conn.execute(
+            "UPDATE blobs SET dim = ? WHERE hash = ?", (dimension, digest)
+        )
+        for dim, thumb in thumbs:
+            try:
+                self._move_into_place(thumb)
+            except OSError as e:
+                print(f"Error writing thumbnail {thumb.filename}: {e}")
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?)",
+                (digest, dim, thumb.filename, thumb.size),
+            )
+            self._total_bytes += thumb.size
+
+    def _budget(self) -> Tuple[int, int]:
+        """Get the current (max_bytes, max_entries) budget."""
+        max_bytes = self.max_bytes
+        if max_bytes is None:
+            max_bytes = get_setting(
+                "cover_art", "cache_max_bytes", 200 * 1024 * 1024
+            )
+        max_entries = self.max_entries
+        if max_entries is None:
+            max_entries = get_setting("cover_art", "cache_max_entries", 5000)
+        return max_bytes, max_entries
+
+    def get(self, key: str, size: Optional[int] = None) -> Optional[str]:
+        """
+        Look up a cached cover and mark it as recently used.
+
+        Args:
+            key: Cache key
+            size: Desired longest edge in pixels; if given, the smallest
+                stored rendition at least that large is returned (or the
+                original if none is)
+
+        Returns:
+            Optional[str]: Path to the cached file, or None if not cached
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT covers.hash, blobs.file, covers.last_access "
+                "FROM covers JOIN blobs ON blobs.hash = covers.hash "
+                "WHERE covers.key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            digest, filename, last_access = row
+            now = time.time()
+            if now - last_access >= ACCESS_UPDATE_INTERVAL:
+                conn.execute(
+                    "UPDATE covers SET last_access = ? WHERE key = ?",
+                    (now, key),
+                )
+                conn.commit()
+
+            if size is not None:
+                return self._nearest_rendition(conn, digest, size)
+        return str(self.directory / filename)
+
+    def get_thumbnail(self, path: Union[str, Path], size: int) -> str:
+        """
+        Get the nearest-size rendition of a cover image by its path.
+
+        Paths outside the cache (e.g. sidecar files next to the tracks)
+        are returned unchanged.
+
+        Args:
+            path: Path to a cover image, as returned by ``get``/``put``
+            size: Desired longest edge in pixels
+
+        Returns:
+            str: Path to the best matching image file
+        """
+        path = Path(path)
+        if path.parent.parent != self.directory / BLOBS_DIRNAME:
+            return str(path)
+
+        with self._lock:
+            conn = self._connect()
+            if conn.execute(
+                "SELECT 1 FROM blobs WHERE hash = ?", (path.stem,)
+            ).fetchone():
+                return self._nearest_rendition(conn, path.stem, size)
+        return str(path)
+
+    def _nearest_rendition(
+        self, conn: sqlite3.Connection, digest: str, size: int
+    ) -> str:
+        """Pick the smallest rendition >= size (caller holds the lock)."""
+        filename, dimension = conn.execute(
+            "SELECT file, dim FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+
+        # Images cached before renditions existed get them on first use
+        if dimension is None:
+            try:
+                data = (self.directory / filename).read_bytes()
+            except OSError:
+                data = None
+            if data is not None and thumbnails.is_available():
+                self._index_thumbnails(
+                    conn, digest, *self._stage_thumbnails(digest, data)
+                )
+                conn.commit()
+
+        renditions = conn.execute(
+            "SELECT dim, file FROM thumbs WHERE hash = ? ORDER BY dim",
+            (digest,),
+        ).fetchall()
+        for dim, thumb_file in renditions:
+            if dim >= size:
+                return str(self.directory / thumb_file)
+        return str(self.directory / filename)
+
+    def get_hash(self, key: str) -> Optional[str]:
+        """
+        Get the content hash of the image cached for a key.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[str]: The hash, or None if the key isn't cached
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT hash FROM covers WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row[0] if row is not None else None
+
+    def put(self, key: str, data: bytes, suffix: str = ".jpg") -> str:
+        """
+        Store a cover, then evict entries until the cache fits its budget.
+
+        If an identical image is already cached, the key is pointed at it
+        and nothing is written. New images (and their renditions) are
+        written to temporary names and renamed into place, so readers never
+        see a partial file; the decoding, scaling and writing happen before
+        the cache is locked, so lookups don't wait on them.
+
+        Args:
+            key: Cache key
+            data: Image data
+            suffix: File extension of the stored image
+
+        Returns:
+            str: Path to the cached file
+        """
+        digest = content_hash(data)
+        with self._lock:
+            stored = self._has_blob(self._connect(), digest)
+        image = None if stored else self._stage_image(digest, data, suffix)
+
+        with self._lock:
+            conn = self._connect()
+            if image is None and not self._has_blob(conn, digest):
+                # Evicted since it was looked up
+                image = self._stage_image(digest, data, suffix)
+            if image is not None:
+                self._index_image(conn, image)
+
+            old = conn.execute(
+                "SELECT hash FROM covers WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO covers VALUES (?, ?, ?)",
+                (key, digest, time.time()),
+            )
+            if old is None:
+                self._total_entries += 1
+            elif old[0] != digest:
+                self._release_blob(conn, old[0])
+            conn.commit()
+
+            self.evict(keep=key)
+            filename = conn.execute(
+                "SELECT file FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()[0]
+        return str(self.directory / filename)
+
+    def _write_temp(self, data: bytes) -> str:
+        """Write ``data`` to a new temporary file in the cache directory."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".cover-", suffix=".tmp", dir=self.directory
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path
+
+    def _move_into_place(self, staged: _StagedFile):
+        """Rename a staged file to its place in the cache."""
+        path = self.directory / staged.filename
+        try:
+            os.makedirs(path.parent, exist_ok=True)
+            os.replace(staged.tmp_path, path)
+        except OSError:
+            self._discard(staged)
+            raise
+
+    def _discard(self, *staged: _StagedFile):
+        """Delete staged files that won't be used."""
+        for item in staged:
+            try:
+                os.unlink(item.tmp_path)
+            except OSError:
+                pass
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used entries until within budget.
+
+        Args:
+            keep: Key that must not be evicted (the one just stored)
+
+        Returns:
+            int: Number of entries removed
+        """
+        max_bytes, max_entries = self._budget()
+        removed = 0
+
+        with self._lock:
+            conn = self._connect()
+            while (
+                self._total_bytes > max_bytes
+                or self._total_entries > max_entries
+            ):
+                rows = conn.execute(
+                    "SELECT key, hash FROM covers "
+                    "WHERE key != ? ORDER BY last_access LIMIT 64",
+                    (keep or "",),
+                ).fetchall()
+                if not rows:
+                    break
+
+                for key, digest in rows:
+                    if (
+                        self._total_bytes <= max_bytes
+                        and self._total_entries <= max_entries
+                    ):
+                        break
+                    self._delete_entry(conn, key, digest)
+                    removed += 1
+            conn.commit()
+        return removed
+
+    def _delete_entry(self, conn: sqlite3.Connection, key: str, digest: str):
+        """Remove one key and, if unused, its image (caller holds lock)."""
+        conn.execute("DELETE FROM covers WHERE key = ?", (key,))
+        self._total_entries -= 1
+        self._release_blob(conn, digest)
+
+    def _release_blob(self, conn: sqlite3.Connection, digest: str):
+        """Delete an image no key refers to any more (caller holds lock)."""
+        if conn.execute(
+            "SELECT 1 FROM covers WHERE hash = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return
+
+        row = conn.execute(
+            "SELECT file, size FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return
+
+        filename, size = row
+        conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+        self._total_bytes -= size
+        self._unlink(filename)
+
+        for thumb_file, thumb_size in conn.execute(
+            "SELECT file, size FROM thumbs WHERE hash = ?", (digest,)
+        ).fetchall():
+            self._total_bytes -= thumb_size
+            self._unlink(thumb_file)
+        conn.execute("DELETE FROM thumbs WHERE hash = ?", (digest,))
+
+    def _unlink(self, filename: str):
+        """Delete a file from the cache directory, ignoring missing ones."""
+        try:
+            os.unlink(self.directory / filename)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {filename}: {e}")
+
+    def remove(self, key: str) -> bool:
+        """
+        Remove a cached cover.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            bool: True if the key was cached, False otherwise
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT hash FROM covers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._delete_entry(conn, key, row[0])
+            conn.commit()
+        return True
+
+    def clear(self) -> int:
+        """
+        Remove all cached covers.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT key, hash FROM covers").fetchall()
+            for row in rows:
+                self._delete_entry(conn, *row)
+            conn.commit()
+        return len(rows)
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        Get the size of the cache.
+
+        Returns:
+            Tuple[int, int]: Number of entries and total bytes
+        """
+        with self._lock:
+            self._connect()
+            return self._total_entries, self._total_bytes
+
+    def close(self):
+        """Close the index database."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
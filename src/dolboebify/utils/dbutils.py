@@ -0,0 +1,46 @@
+"""Helpers for the small SQLite databases used by the caches."""
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional, Union
+
+
+def connect_db(
+    path: Union[str, Path, None], schema: str
+) -> sqlite3.Connection:
+    """
+    Open (creating if needed) a SQLite database shared between threads.
+
+    If the file can't be opened (e.g. a read-only home directory), an
+    in-memory database is used instead so callers keep working for the
+    rest of the session.
+
+    Args:
+        path: Database file, or None for an in-memory database
+        schema: SQL script creating the tables if they don't exist
+
+    Returns:
+        sqlite3.Connection: The open connection (callers serialize access)
+    """
+    conn: Optional[sqlite3.Connection] = None
+    if path is not None:
+        path = Path(path)
+        try:
+            os.makedirs(path.parent, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(schema)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening database {path}: {e}")
+            if conn is not None:
+                conn.close()
+            conn = None
+
+    if conn is None:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.executescript(schema)
+
+    conn.commit()
+    return conn
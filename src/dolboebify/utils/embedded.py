@@ -0,0 +1,545 @@
+"""Header-only extraction of artwork and tags from audio files.
+
+Supports ID3v2 ``APIC``/``PIC`` frames (MP3 and anything else with an ID3v2
+header), FLAC ``PICTURE`` metadata blocks and MP4 ``covr`` atoms (M4A, ALAC,
+AAC in MP4), plus the title, artist, album and track number tags of the
+same formats and of Ogg Vorbis/Opus comments. Only tag structures are
+read; everything else, in particular the audio payload, is skipped with
+seeks.
+"""
+
+import io
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+# Picture type of the front cover in ID3 and FLAC pictures
+FRONT_COVER = 3
+
+# Upper bound on a single tag structure we are willing to read
+MAX_PICTURE_SIZE = 16 * 1024 * 1024
+
+# Container atoms on the way to the MP4 cover: moov/udta/meta/ilst/covr
+_MP4_PATH = (b"moov", b"udta", b"meta", b"ilst", b"covr")
+
+# MP4 "data" atom type indicators for images
+_MP4_IMAGE_TYPES = {13: "image/jpeg", 14: "image/png", 27: "image/bmp"}
+
+# Tag frames/atoms/fields read by read_tags, per format
+_ID3_TEXT_FRAMES = {
+    b"TIT2": "title",
+    b"TALB": "album",
+    b"TPE2": "albumartist",
+    b"TPE1": "artist",
+    b"TRCK": "tracknumber",
+    b"TT2": "title",
+    b"TAL": "album",
+    b"TP2": "albumartist",
+    b"TP1": "artist",
+    b"TRK": "tracknumber",
+}
+_MP4_TEXT_ATOMS = {
+    b"\xa9nam": "title",
+    b"\xa9alb": "album",
+    b"aART": "albumartist",
+    b"\xa9ART": "artist",
+}
+_VORBIS_FIELDS = {
+    "TITLE": "title",
+    "ALBUM": "album",
+    "ALBUMARTIST": "albumartist",
+    "ALBUM ARTIST": "albumartist",
+    "ARTIST": "artist",
+    "TRACKNUMBER": "tracknumber",
+}
+
+# MP4 track number atom (binary: padding, track, total)
+_MP4_TRACK_NUMBER = b"trkn"
+
+# Signatures of the comment packets of Ogg streams
+_OGG_COMMENT_HEADERS = (b"\x03vorbis", b"OpusTags")
+
+# Text encodings of ID3v2 text frames, by encoding byte
+_ID3_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+
+def read_exact(f: BinaryIO, size: int) -> bytes:
+    """Read exactly ``size`` bytes or raise ValueError."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file")
+    return data
+
+
+def _synchsafe(data: bytes) -> int:
+    """Decode a 28-bit ID3v2 synchsafe integer."""
+    value = 0
+    for byte in data:
+        value = (value << 7) | (byte & 0x7F)
+    return value
+
+
+def _split_terminated(data: bytes, encoding: int) -> Tuple[bytes, bytes]:
+    """Split off an ID3 text field terminated for the given encoding."""
+    if encoding in (1, 2):
+        # UTF-16: two zero bytes on an even offset
+        index = 0
+        while index + 1 < len(data):
+            if data[index] == 0 and data[index + 1] == 0:
+                return data[:index], data[index + 2 :]
+            index += 2
+        raise ValueError("Unterminated UTF-16 text")
+
+    index = data.index(b"\x00")
+    return data[:index], data[index + 1 :]
+
+
+def _parse_apic(frame: bytes, v22: bool) -> Tuple[int, bytes, str]:
+    """Parse an APIC (or v2.2 PIC) frame into (type, data, mime)."""
+    encoding = frame[0]
+    if v22:
+        image_format = frame[1:4].decode("latin-1").lower()
+        mime = "image/png" if image_format == "png" else "image/jpeg"
+        rest = frame[4:]
+    else:
+        mime_bytes, rest = _split_terminated(frame[1:], 0)
+        mime = mime_bytes.decode("latin-1").lower() or "image/jpeg"
+        if "/" not in mime:
+            mime = f"image/{mime}"
+
+    picture_type = rest[0]
+    _, data = _split_terminated(rest[1:], encoding)
+    return picture_type, data, mime
+
+
+def skip_id3(f: BinaryIO) -> None:
+    """Seek past an ID3v2 tag at the current position, if there is one."""
+    start = f.tell()
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        footer = 10 if header[5] & 0x10 else 0
+        f.seek(start + 10 + _synchsafe(header[6:10]) + footer)
+    else:
+        f.seek(start)
+
+
+def _id3_frames(f: BinaryIO, wanted) -> Iterator[Tuple[bytes, bytes, int]]:
+    """
+    Yield (frame id, payload, major version) of wanted ID3v2 frames.
+
+    Frames that are compressed or encrypted are skipped; unsynchronisation
+    and data length indicators are undone.
+    """
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return
+
+    major = header[3]
+    flags = header[5]
+    tag_size = _synchsafe(header[6:10])
+    if major not in (2, 3, 4) or tag_size > MAX_PICTURE_SIZE:
+        return
+
+    if major < 4 and flags & 0x80:
+        # Whole-tag unsynchronisation: undo it in memory and parse that
+        tag = read_exact(f, tag_size).replace(b"\xff\x00", b"\xff")
+        f = io.BytesIO(tag)
+        end = len(tag)
+    else:
+        end = 10 + tag_size
+
+    if flags & 0x40 and major >= 3:
+        # Skip the extended header
+        size_bytes = read_exact(f, 4)
+        if major == 4:
+            f.seek(f.tell() - 4 + _synchsafe(size_bytes))
+        else:
+            f.seek(f.tell() + struct.unpack(">I", size_bytes)[0])
+
+    id_size = 3 if major == 2 else 4
+    header_size = 6 if major == 2 else 10
+
+    while f.tell() + header_size <= end:
+        frame_header = read_exact(f, header_size)
+        frame_id = frame_header[:id_size]
+        if not frame_id.strip(b"\x00"):
+            break  # Padding
+
+        if major == 2:
+            frame_size = int.from_bytes(frame_header[3:6], "big")
+            frame_flags = 0
+        elif major == 3:
+            frame_size = struct.unpack(">I", frame_header[4:8])[0]
+            frame_flags = struct.unpack(">H", frame_header[8:10])[0]
+        else:
+            frame_size = _synchsafe(frame_header[4:8])
+            frame_flags = struct.unpack(">H", frame_header[8:10])[0]
+
+        if frame_id not in wanted:
+            f.seek(f.tell() + frame_size)
+            continue
+
+        frame = read_exact(f, frame_size)
+
+        # Compressed or encrypted frames can't be used as they are
+        if (major == 3 and frame_flags & 0x00C0) or (
+            major == 4 and frame_flags & 0x000C
+        ):
+            continue
+        if major == 4:
+            if frame_flags & 0x0001:
+                frame = frame[4:]  # Data length indicator
+            if frame_flags & 0x0002:
+                frame = frame.replace(b"\xff\x00", b"\xff")
+
+        yield frame_id, frame, major
+
+
+def _read_id3(f: BinaryIO) -> Optional[Tuple[bytes, str]]:
+    """Read the best picture from an ID3v2 tag at the start of ``f``."""
+    best = None
+    for _, frame, major in _id3_frames(f, (b"APIC", b"PIC")):
+        try:
+            picture_type, data, mime = _parse_apic(frame, major == 2)
+        except (ValueError, IndexError):
+            continue
+        if not data:
+            continue
+        if picture_type == FRONT_COVER:
+            return data, mime
+        if best is None:
+            best = (data, mime)
+
+    return best
+
+
+def _decode_id3_text(frame: bytes) -> str:
+    """Decode the first value of an ID3v2 text frame."""
+    if not frame:
+        return ""
+    encoding = _ID3_ENCODINGS.get(frame[0], "latin-1")
+    text = frame[1:].decode(encoding, errors="replace")
+    # ID3v2.4 separates multiple values with NULs
+    return text.split("\x00")[0].strip()
+
+
+def _read_id3_tags(f: BinaryIO) -> Dict[str, str]:
+    """Read the album tags from an ID3v2 tag at the start of ``f``."""
+    tags = {}
+    for frame_id, frame, _ in _id3_frames(f, _ID3_TEXT_FRAMES):
+        value = _decode_id3_text(frame)
+        if value:
+            tags.setdefault(_ID3_TEXT_FRAMES[frame_id], value)
+    return tags
+
+
+def _flac_blocks(f: BinaryIO) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (block type, length) of the FLAC metadata blocks at ``f``.
+
+    The file is positioned at the block's data when it is yielded; the
+    consumer may read it or not.
+    """
+    if f.read(4) != b"fLaC":
+        return
+
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        is_last = header[0] & 0x80
+        length = int.from_bytes(header[1:4], "big")
+        start = f.tell()
+        yield header[0] & 0x7F, length
+        f.seek(start + length)
+        if is_last:
+            return
+
+
+def _read_flac(f: BinaryIO) -> Optional[Tuple[bytes, str]]:
+    """Read the best PICTURE block from FLAC metadata at ``f``."""
+    best = None
+    for block_type, length in _flac_blocks(f):
+        if block_type != 6 or length > MAX_PICTURE_SIZE:
+            continue
+
+        block = read_exact(f, length)
+        picture_type, mime_length = struct.unpack(">II", block[:8])
+        offset = 8 + mime_length
+        mime = block[8:offset].decode("latin-1").lower() or "image/jpeg"
+        desc_length = struct.unpack(">I", block[offset : offset + 4])[0]
+        offset += 4 + desc_length + 16  # width, height, depth, colors
+        data_length = struct.unpack(">I", block[offset : offset + 4])[0]
+        data = block[offset + 4 : offset + 4 + data_length]
+        if data:
+            if picture_type == FRONT_COVER:
+                return data, mime
+            if best is None:
+                best = (data, mime)
+
+    return best
+
+
+def _parse_vorbis_comments(data: bytes) -> Dict[str, str]:
+    """Read the tags from a Vorbis comment structure."""
+    tags = {}
+    block = io.BytesIO(data)
+    vendor_length = struct.unpack("<I", read_exact(block, 4))[0]
+    block.seek(vendor_length, 1)
+    count = struct.unpack("<I", read_exact(block, 4))[0]
+    for _ in range(count):
+        comment_length = struct.unpack("<I", read_exact(block, 4))[0]
+        comment = read_exact(block, comment_length)
+        name, _, value = comment.decode("utf-8", "replace").partition("=")
+        field = _VORBIS_FIELDS.get(name.upper())
+        if field and value.strip():
+            tags.setdefault(field, value.strip())
+    return tags
+
+
+def _read_flac_tags(f: BinaryIO) -> Dict[str, str]:
+    """Read the tags from a FLAC VORBIS_COMMENT block at ``f``."""
+    for block_type, length in _flac_blocks(f):
+        if block_type == 4 and length <= MAX_PICTURE_SIZE:
+            return _parse_vorbis_comments(read_exact(f, length))
+    return {}
+
+
+def _ogg_packets(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the packets of the first logical stream of an Ogg file."""
+    packet = b""
+    serial = None
+    while True:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b"OggS":
+            return
+        page_serial = struct.unpack("<I", header[14:18])[0]
+        lacing = read_exact(f, header[26])
+        body = read_exact(f, sum(lacing))
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            continue  # Another multiplexed stream
+
+        offset = 0
+        for segment in lacing:
+            packet += body[offset : offset + segment]
+            offset += segment
+            if segment < 255:
+                yield packet
+                packet = b""
+        if len(packet) > MAX_PICTURE_SIZE:
+            return
+
+
+def _read_ogg_tags(f: BinaryIO) -> Dict[str, str]:
+    """Read the tags from the comment packet of an Ogg Vorbis/Opus file."""
+    for number, packet in enumerate(_ogg_packets(f)):
+        for signature in _OGG_COMMENT_HEADERS:
+            if packet.startswith(signature):
+                return _parse_vorbis_comments(packet[len(signature) :])
+        if number >= 1:
+            break  # The comments are always the second packet
+    return {}
+
+
+def iter_mp4_atoms(f: BinaryIO, end: Optional[int]):
+    """Yield (type, payload start, payload end) for atoms up to ``end``."""
+    while end is None or f.tell() + 8 <= end:
+        start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        payload_start = start + 8
+        if size == 1:
+            size = struct.unpack(">Q", read_exact(f, 8))[0]
+            payload_start += 8
+        elif size == 0:
+            f.seek(0, 2)
+            size = f.tell() - start
+        if size < payload_start - start:
+            return
+
+        atom_end = start + size
+        yield atom_type, payload_start, atom_end
+        f.seek(atom_end)
+
+
+def _find_mp4_ilst(f: BinaryIO) -> Optional[int]:
+    """
+    Descend into the ``moov/udta/meta/ilst`` atom of an MP4 file.
+
+    Returns:
+        Optional[int]: End offset of the ilst atom (the file is positioned
+        at its payload), or None if the file has no ilst
+    """
+    header = f.read(8)
+    if len(header) < 8 or header[4:8] != b"ftyp":
+        return None
+    f.seek(0)
+
+    end = None
+    for wanted in _MP4_PATH[:-1]:
+        for atom_type, payload_start, atom_end in iter_mp4_atoms(f, end):
+            if atom_type == wanted:
+                f.seek(payload_start)
+                if wanted == b"meta":
+                    f.seek(4, 1)  # meta is a full atom (version + flags)
+                end = atom_end
+                break
+        else:
+            return None
+    return end
+
+
+def _mp4_data(f: BinaryIO, end: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (type indicator, payload) of the "data" atoms up to ``end``."""
+    for atom_type, payload_start, atom_end in iter_mp4_atoms(f, end):
+        if atom_type != b"data" or atom_end - payload_start > MAX_PICTURE_SIZE:
+            continue
+        f.seek(payload_start)
+        type_indicator, _locale = struct.unpack(">II", read_exact(f, 8))
+        yield type_indicator, read_exact(f, atom_end - payload_start - 8)
+
+
+def _read_mp4(f: BinaryIO) -> Optional[Tuple[bytes, str]]:
+    """Read the cover from an MP4 ``moov/udta/meta/ilst/covr`` atom."""
+    end = _find_mp4_ilst(f)
+    if end is None:
+        return None
+
+    for atom_type, payload_start, atom_end in iter_mp4_atoms(f, end):
+        if atom_type != _MP4_PATH[-1]:
+            continue
+        # covr holds one or more "data" atoms: type, locale, image bytes
+        f.seek(payload_start)
+        for type_indicator, data in _mp4_data(f, atom_end):
+            if data:
+                return data, _MP4_IMAGE_TYPES.get(type_indicator, "image/jpeg")
+        break
+
+    return None
+
+
+def _read_mp4_tags(f: BinaryIO) -> Dict[str, str]:
+    """Read the tags from an MP4 ``moov/udta/meta/ilst`` atom."""
+    tags = {}
+    end = _find_mp4_ilst(f)
+    if end is None:
+        return tags
+
+    for atom_type, payload_start, atom_end in iter_mp4_atoms(f, end):
+        if atom_type == _MP4_TRACK_NUMBER:
+            f.seek(payload_start)
+            for _, data in _mp4_data(f, atom_end):
+                if len(data) >= 4 and data[2:4] != b"\x00\x00":
+                    number = struct.unpack(">H", data[2:4])[0]
+                    tags.setdefault("tracknumber", str(number))
+                break
+            continue
+        field = _MP4_TEXT_ATOMS.get(atom_type)
+        if field is None:
+            continue
+        f.seek(payload_start)
+        for type_indicator, data in _mp4_data(f, atom_end):
+            if type_indicator == 1:  # UTF-8 text
+                value = data.decode("utf-8", "replace").strip()
+                if value:
+                    tags.setdefault(field, value)
+                break
+
+    return tags
+
+
+def read_embedded_picture(
+    file_path: Union[str, Path],
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Read the artwork embedded in an audio file.
+
+    A front cover is preferred when the file carries several pictures.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        Optional[Tuple[bytes, str]]: Image data and its MIME type, or None
+        if the file has no (readable) embedded artwork
+    """
+    try:
+        with open(file_path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:3] == b"ID3":
+                picture = _read_id3(f)
+                if picture is not None:
+                    return picture
+                # FLAC files are sometimes prefixed with an ID3 tag
+                f.seek(0)
+                skip_id3(f)
+                return _read_flac(f)
+            if magic[:4] == b"fLaC":
+                return _read_flac(f)
+            if magic[4:8] == b"ftyp":
+                return _read_mp4(f)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        print(f"Error reading embedded artwork from {file_path}: {e}")
+    return None
+
+
+def read_tags(file_path: Union[str, Path]) -> Dict[str, str]:
+    """
+    Read the text tags of an audio file.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        Dict[str, str]: The tags found among "title", "artist", "album",
+        "albumartist" and "tracknumber" (as written, e.g. "3/12"); empty
+        if the file has no (readable) tags
+    """
+    try:
+        with open(file_path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:3] == b"ID3":
+                tags = _read_id3_tags(f)
+                if not tags.get("album"):
+                    # FLAC files are sometimes prefixed with an ID3 tag
+                    f.seek(0)
+                    skip_id3(f)
+                    tags = _read_flac_tags(f) or tags
+                return tags
+            if magic[:4] == b"fLaC":
+                return _read_flac_tags(f)
+            if magic[4:8] == b"ftyp":
+                return _read_mp4_tags(f)
+            if magic[:4] == b"OggS":
+                return _read_ogg_tags(f)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        print(f"Error reading tags from {file_path}: {e}")
+    return {}
+
+
+def read_album_tags(file_path: Union[str, Path]) -> Optional[Tuple[str, str]]:
+    """
+    Read the album an audio file belongs to from its tags.
+
+    The album artist is preferred over the track artist, so compilations
+    resolve to a single album.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        Optional[Tuple[str, str]]: Album artist and album title, or None
+        if the file has no (readable) album and artist tags
+    """
+    tags = read_tags(file_path)
+    album = tags.get("album")
+    artist = tags.get("albumartist") or tags.get("artist")
+    if album and artist:
+        return artist, album
+    return None
@@ -23,3 +23,24 @@ class PlaylistError(DolboebifyError):
     """Raised when there is an error with playlist operations."""
 
     pass
+
+
+class ProviderThrottledError(DolboebifyError):
+    """Raised when a cover-art provider throttles or temporarily fails."""
+
+    def __init__(self, providers, retry_after: float = 0.0):
+        """
+        Initialize the error.
+
+        Args:
+            providers: Names of the providers that throttled the lookup
+            retry_after: Seconds until the providers accept requests again
+        """
+        if isinstance(providers, str):
+            providers = [providers]
+        self.providers = list(providers)
+        self.retry_after = retry_after
+        super().__init__(
+            f"Throttled by {', '.join(self.providers)}, "
+            f"retry after {retry_after:.1f}s"
+        )
@@ -0,0 +1,324 @@
+"""Local stand-in for the iTunes and Last.fm cover-art APIs.
+
+The server answers the requests made by ``utils.coverart`` (iTunes search,
+Last.fm ``track.getInfo``/``album.getInfo``/``artist.getInfo`` and the
+image downloads) with responses shaped like the real ones, so lookups can
+be benchmarked and tested without network access. Latency, error and
+throttling rates, the share of unknown tracks and the image dimensions are
+configurable.
+
+Example:
+    with FakeProviderServer(latency=0.05) as server:
+        set_setting("cover_art", "provider_urls", server.urls)
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt5.QtGui import QImage
+except ImportError:  # pragma: no cover - Qt is a hard dependency of the GUI
+    QImage = None
+
+# Marker bytes the placeholder images start with when Qt is unavailable
+_JPEG_HEADER = b"\xff\xd8\xff\xe0"
+
+# Approximate bytes per pixel edge of the placeholder images
+_PLACEHOLDER_BYTES_PER_PIXEL = 100
+
+
+def _fraction(key: str) -> float:
+    """Map a string to a stable pseudo-random number in [0, 1)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler serving the stand-in provider endpoints."""
+
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle delay them
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        """Keep request logs off stderr."""
+
+    def _send(
+        self,
+        status: int,
+        body: bytes = b"",
+        content_type: str = "application/json",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        """Send a complete response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: dict):
+        """Send a 200 JSON response."""
+        self._send(200, json.dumps(data).encode("utf-8"))
+
+    def do_GET(self):
+        """Dispatch a GET request to the provider it imitates."""
+        provider = self.server.provider
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        endpoint = parts.path.strip("/").split("/")
+
+        provider.record(endpoint[0])
+        provider.delay()
+
+        status = provider.failure_status()
+        if status == 429:
+            self._send(
+                429, headers={"Retry-After": f"{provider.retry_after:g}"}
+            )
+            return
+        if status:
+            self._send(status)
+            return
+
+        base = f"http://{self.headers.get('Host')}"
+        if endpoint == ["itunes", "search"]:
+            self._send_json(provider.itunes_search(base, query))
+        elif endpoint[:2] == ["lastfm", "2.0"]:
+            self._send_json(provider.lastfm(base, query))
+        elif endpoint[0] == "images":
+            self._send(
+                200,
+                provider.image("/".join(endpoint[1:])),
+                content_type="image/jpeg",
+            )
+        else:
+            self._send(404)
+
+
+class _Server(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the provider behaviour settings."""
+
+    daemon_threads = True
+    provider: "FakeProviderServer"
+
+
+class FakeProviderServer:
+    """A local HTTP server imitating the cover-art provider APIs."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        miss_rate: float = 0.0,
+        image_size: int = 600,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the server (call ``start`` or use it as a context manager).
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Seconds every response is delayed by
+            latency_jitter: Extra random delay of up to this many seconds
+            error_rate: Fraction of requests answered with 503
+            throttle_rate: Fraction of requests answered with 429
+            retry_after: Retry-After seconds sent with 429 responses
+            miss_rate: Fraction of tracks the providers don't know (stable
+                per query, so retries give the same answer)
+            image_size: Edge length in pixels of the served (square) images
+            seed: Seed for the error/throttle/jitter randomness
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.miss_rate = miss_rate
+        self.image_size = image_size
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests: Counter = Counter()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Get the root URL of the running server."""
+        if self._server is None:
+            raise RuntimeError("Server is not running")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """Get provider base URLs for the ``cover_art.provider_urls`` setting."""
+        return {
+            "itunes": f"{self.base_url}/itunes",
+            "lastfm": f"{self.base_url}/lastfm",
+        }
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        """Get the number of requests served per endpoint."""
+        with self._lock:
+            return dict(self._requests)
+
+    def start(self) -> "FakeProviderServer":
+        """Start serving on a background thread."""
+        if self._server is None:
+            self._server = _Server((self.host, self.port), _Handler)
+            self._server.provider = self
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                name="dolboebify-fake-provider",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for its thread to exit."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self) -> "FakeProviderServer":
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop the server."""
+        self.stop()
+
+    def record(self, endpoint: str):
+        """Count a request to an endpoint."""
+        with self._lock:
+            self._requests[endpoint] += 1
+
+    def delay(self):
+        """Sleep for the configured response latency."""
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter)
+        if self.latency + jitter > 0:
+            time.sleep(self.latency + jitter)
+
+    def failure_status(self) -> Optional[int]:
+        """Pick a failure status for a request, or None to answer normally."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _knows(self, query: str) -> bool:
+        """Check whether the providers have a cover for a query."""
+        return _fraction(query.casefold()) >= self.miss_rate
+
+    def itunes_search(self, base: str, query: Dict[str, str]) -> dict:
+        """Build an iTunes search response."""
+        term = query.get("term", "")
+        if not self._knows(term):
+            return {"resultCount": 0, "results": []}
+
+        image_id = hashlib.blake2b(term.encode(), digest_size=8).hexdigest()
+        return {
+            "resultCount": 1,
+            "results": [
+                {
+                    "trackName": term,
+                    "artworkUrl100": (
+                        f"{base}/images/itunes/{image_id}/100x100bb.jpg"
+                    ),
+                }
+            ],
+        }
+
+    def lastfm(self, base: str, query: Dict[str, str]) -> dict:
+        """Build a Last.fm track/album/artist.getInfo response."""
+        method = query.get("method")
+        artist = query.get("artist", "")
+        track = query.get("track", "")
+        album = query.get("album", "")
+
+        if method == "album.getInfo":
+            if not self._knows(f"{artist} {album}"):
+                return {"error": 6, "message": "Album not found"}
+            key = f"album\x1f{artist}\x1f{album}"
+            size, field = "extralarge", "albuminfo"
+        elif method == "track.getInfo":
+            if not self._knows(f"{artist} {track}"):
+                return {"error": 6, "message": "Track not found"}
+            key = f"{artist}\x1f{track}"
+            size, field = "extralarge", "album"
+        elif method == "artist.getInfo":
+            if not self._knows(artist):
+                return {"error": 6, "message": "Artist not found"}
+            key = artist
+            size, field = "mega", "artist"
+        else:
+            return {"error": 3, "message": "Invalid method"}
+
+        image_id = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        images = [
+            {
+                "#text": f"{base}/images/lastfm/{image_id}/{name}.jpg",
+                "size": name,
+            }
+            for name in ("small", "medium", "large", size)
+        ]
+        if field == "albuminfo":
+            return {"album": {"name": album, "image": images}}
+        if field == "album":
+            return {"track": {"name": track, "album": {"image": images}}}
+        return {"artist": {"name": artist, "image": images}}
+
+    def image(self, name: str) -> bytes:
+        """
+        Generate the (deterministic) image served under a name.
+
+        Each name gets its own solid colour, so distinct covers don't
+        collapse into one entry of the content-addressed cover cache.
+        Without Qt, placeholder bytes roughly the size of a JPEG are served.
+        """
+        seed = hashlib.blake2b(name.encode(), digest_size=16).digest()
+        size = max(self.image_size, 1)
+
+        if QImage is not None:
+            image = QImage(size, size, QImage.Format_RGB32)
+            image.fill(int.from_bytes(seed[:3], "big"))
+            data = QByteArray()
+            buffer = QBuffer(data)
+            buffer.open(QIODevice.WriteOnly)
+            saved = image.save(buffer, "JPG")
+            buffer.close()
+            if saved:
+                return bytes(data)
+
+        length = size * _PLACEHOLDER_BYTES_PER_PIXEL
+        return (_JPEG_HEADER + seed * (length // len(seed) + 1))[:length]
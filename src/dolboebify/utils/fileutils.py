@@ -1,9 +1,11 @@
 """Utilities for file operations."""
 
 from pathlib import Path
-from typing import List, Set, Union
+from typing import Iterator, List, Set, Union
 
 from dolboebify.utils.exceptions import AudioFormatNotSupportedError
+from dolboebify.utils.library import get_library_index
+from dolboebify.utils.scanner import scan_audio_files
 
 
 def get_supported_formats() -> Set[str]:
@@ -21,6 +23,31 @@ def get_supported_formats() -> Set[str]:
     }
 
 
+def iter_audio_files(
+    directory: Union[str, Path], recursive: bool = True
+) -> Iterator[Path]:
+    """
+    Find supported audio files in a directory, yielding them as found.
+
+    Files come in a stable depth-first order; hidden folders are skipped
+    and symlinked folders are followed once (see ``utils.scanner``).
+
+    Args:
+        directory: Directory to search
+        recursive: Whether to search recursively
+
+    Yields:
+        Path: Each supported audio file
+
+    Raises:
+        FileNotFoundError: If the directory doesn't exist
+    """
+    for file_path in scan_audio_files(
+        directory, get_supported_formats(), recursive=recursive
+    ):
+        yield Path(file_path)
+
+
 def get_audio_files(
     directory: Union[str, Path], recursive: bool = True
 ) -> List[Path]:
@@ -34,29 +61,7 @@ def get_audio_files(
     Returns:
         List of Path objects for supported audio files
     """
-    path = Path(directory)
-    if not path.exists() or not path.is_dir():
-        raise FileNotFoundError(f"Directory not found: {path}")
-
-    supported_formats = get_supported_formats()
-    audio_files = []
-
-    if recursive:
-        for file_path in path.glob("**/*"):
-            if (
-                file_path.is_file()
-                and file_path.suffix.lower()[1:] in supported_formats
-            ):
-                audio_files.append(file_path)
-    else:
-        for file_path in path.glob("*"):
-            if (
-                file_path.is_file()
-                and file_path.suffix.lower()[1:] in supported_formats
-            ):
-                audio_files.append(file_path)
-
-    return sorted(audio_files)
+    return sorted(iter_audio_files(directory, recursive))
 
 
 def check_file_type(file_path: Union[str, Path]) -> str:
@@ -88,12 +93,19 @@ def get_file_info(file_path: Union[str, Path]) -> dict:
     """
     Get basic file information.
 
+    Files in the library index are answered from the index (as of the
+    last scan) without touching the disk.
+
     Args:
         file_path: Path to the file
 
     Returns:
         dict: File information
     """
+    info = get_library_index().get_file_info(file_path)
+    if info is not None:
+        return info
+
     path = Path(file_path)
     stats = path.stat()
 
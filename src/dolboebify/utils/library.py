@@ -0,0 +1,586 @@
+"""Persistent index of the audio files in the user's music folders.
+
+The index keeps, per folder, its mtime and, per file, its size, mtime and
+format. A rescan stats every known folder but only lists the ones whose
+mtime changed (entries were added, removed or renamed in them) and only
+stats the files of those folders, so rescanning a mostly unchanged
+library costs one ``stat`` per folder.
+
+Rewriting a file in place doesn't change its folder's mtime; such edits
+are only picked up by a ``full`` rescan.
+"""
+
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from dolboebify.utils.config import get_setting
+from dolboebify.utils.dbutils import connect_db
+from dolboebify.utils.scanner import (
+    ScannedFolder,
+    scan_audio_files,
+    scan_folders,
+)
+
+# Default location of the library index
+LIBRARY_INDEX_FILE = Path.home() / ".cache" / "dolboebify" / "library.sqlite3"
+
+# Extensions indexed, covering the formats of both player backends
+INDEXED_EXTENSIONS = frozenset(
+    {
+        "mp3",
+        "wav",
+        "ogg",
+        "flac",
+        "aac",
+        "wma",
+        "m4a",
+        "aiff",
+        "alac",
+        "opus",
+    }
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS folders_parent ON folders (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+"""
+
+# An indexed file: (size, mtime_ns)
+_FileStamp = Tuple[int, int]
+
+
+class LibraryScan(NamedTuple):
+    """Outcome of a library rescan."""
+
+    added: List[str]
+    modified: List[str]
+    removed: List[str]
+    # (old path, new path) of files renamed or moved within the tree
+    moved: List[Tuple[str, str]]
+    total: int
+    folders_checked: int
+    folders_listed: int
+    elapsed: float
+
+
+def _subtree_range(path: str) -> Tuple[str, str]:
+    """Get the [low, high) string range of the paths below a folder."""
+    prefix = path.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def _list_folder(
+    folder: str, extensions: Collection[str]
+) -> Tuple[Dict[str, _FileStamp], List[str]]:
+    """List a folder: indexed files with their stamps, and subfolders."""
+    files: Dict[str, _FileStamp] = {}
+    folders: List[str] = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.name.startswith("."):
+                        folders.append(entry.path)
+                    continue
+                extension = os.path.splitext(entry.name)[1][1:].lower()
+                if extension in extensions and entry.is_file():
+                    result = entry.stat()
+                    files[entry.path] = (result.st_size, result.st_mtime_ns)
+            except OSError:
+                continue  # Broken symlink or entry removed meanwhile
+    return files, folders
+
+
+def _match_moves(
+    added: Dict[str, _FileStamp], removed: Dict[str, _FileStamp]
+) -> List[Tuple[str, str]]:
+    """
+    Pair removed and added files that are the same file under a new name.
+
+    A rename keeps a file's size and mtime, so a removed and an added file
+    with the same unique (size, mtime) stamp are taken as a move. Paired
+    files are taken out of ``added`` and ``removed``.
+    """
+    gone: Dict[_FileStamp, Optional[str]] = {}
+    for path, stamp in removed.items():
+        gone[stamp] = None if stamp in gone else path
+    new: Dict[_FileStamp, Optional[str]] = {}
+    for path, stamp in added.items():
+        new[stamp] = None if stamp in new else path
+
+    moved = []
+    for stamp, old in gone.items():
+        path = new.get(stamp)
+        if old is not None and path is not None:
+            moved.append((old, path))
+            del removed[old]
+            del added[path]
+    return moved
+
+
+class LibraryIndex:
+    """Folder and file index persisted in a small SQLite database."""
+
+    def __init__(self, path: Union[str, Path, None] = LIBRARY_INDEX_FILE):
+        """
+        Initialize the index.
+
+        Args:
+            path: Database file, or None to keep the index in memory only
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)."""
+        if self._conn is None:
+            self._conn = connect_db(self.path, _SCHEMA)
+        return self._conn
+
+    def has_root(self, directory: Union[str, Path]) -> bool:
+        """Check whether a folder has been scanned into the index."""
+        folder = os.path.abspath(directory)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT 1 FROM folders WHERE path = ?", (folder,))
+                .fetchone()
+            )
+        return row is not None
+
+    def rescan(
+        self,
+        directory: Union[str, Path],
+        extensions: Collection[str] = INDEXED_EXTENSIONS,
+        full: bool = False,
+    ) -> LibraryScan:
+        """
+        Bring the index of a folder tree up to date.
+
+        Args:
+            directory: Root of the tree
+            extensions: Lower-case extensions (without the dot) indexed
+            full: List every folder and stat every file, catching files
+                rewritten in place
+
+        Returns:
+            LibraryScan: The files added, modified and removed
+
+        Raises:
+            FileNotFoundError: If the folder doesn't exist
+        """
+        start = time.perf_counter()
+        root = os.path.abspath(directory)
+        extensions = frozenset(extensions)
+        try:
+            root_stat = os.stat(root)
+        except OSError:
+            root_stat = None
+        if root_stat is None or not stat.S_ISDIR(root_stat.st_mode):
+            raise FileNotFoundError(f"Directory not found: {root}")
+
+        with self._lock:
+            conn = self._connect()
+            low, high = _subtree_range(root)
+            rows = conn.execute(
+                "SELECT path, parent, mtime_ns FROM folders "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, low, high),
+            ).fetchall()
+            root_parent = None
+            known: Dict[str, int] = {}
+            children: Dict[str, List[str]] = defaultdict(list)
+            for path, parent, mtime_ns in rows:
+                known[path] = mtime_ns
+                if path == root:
+                    root_parent = parent
+                else:
+                    children[parent].append(path)
+
+            added: Dict[str, _FileStamp] = {}
+            modified: List[str] = []
+            removed: Dict[str, _FileStamp] = {}
+            upserts: List[tuple] = []
+            folder_rows: List[tuple] = []
+            gone_folders: List[str] = []
+            listed = 0
+            seen = set()
+            visited: List[str] = []
+            stack: List[Tuple[str, Optional[str]]] = [(root, root_parent)]
+
+            while stack:
+                folder, parent = stack.pop()
+                try:
+                    result = os.stat(folder)
+                except OSError:
+                    gone_folders.append(folder)
+                    continue
+                identity = (result.st_dev, result.st_ino)
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                visited.append(folder)
+
+                if not full and known.get(folder) == result.st_mtime_ns:
+                    stack.extend((child, folder) for child in children[folder])
+                    continue
+
+                # Changed (or new) folder: list it and diff its files
+                try:
+                    files, subfolders = _list_folder(folder, extensions)
+                except OSError as e:
+                    print(f"Error scanning {folder}: {e}")
+                    continue
+                listed += 1
+                folder_rows.append((folder, parent, result.st_mtime_ns))
+
+                indexed = {
+                    path: (size, mtime_ns)
+                    for path, size, mtime_ns in conn.execute(
+                        "SELECT path, size, mtime_ns FROM files "
+                        "WHERE folder = ?",
+                        (folder,),
+                    )
+                }
+                for path, stamp in files.items():
+                    old = indexed.pop(path, None)
+                    if old == stamp:
+                        continue
+                    if old is None:
+                        added[path] = stamp
+                    else:
+                        modified.append(path)
+                    extension = os.path.splitext(path)[1][1:].lower()
+                    upserts.append((path, folder, *stamp, extension))
+                removed.update(indexed)
+
+                current = set(subfolders)
+                gone_folders.extend(
+                    child for child in children[folder] if child not in current
+                )
+                stack.extend(
+                    (child, folder)
+                    for child in sorted(subfolders, reverse=True)
+                )
+
+            # Folders that disappeared take their whole subtree along
+            for folder in gone_folders:
+                low, high = _subtree_range(folder)
+                removed.update(
+                    (path, (size, mtime_ns))
+                    for path, size, mtime_ns in conn.execute(
+                        "SELECT path, size, mtime_ns FROM files "
+                        "WHERE folder = ? OR (folder >= ? AND folder < ?)",
+                        (folder, low, high),
+                    )
+                )
+                conn.execute(
+                    "DELETE FROM folders WHERE path = ? "
+                    "OR (path >= ? AND path < ?)",
+                    (folder, low, high),
+                )
+                conn.execute(
+                    "DELETE FROM files WHERE folder = ? "
+                    "OR (folder >= ? AND folder < ?)",
+                    (folder, low, high),
+                )
+
+            conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                ((path,) for path in removed),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO files "
+                "(path, folder, size, mtime_ns, format) VALUES (?, ?, ?, ?, ?)",
+                upserts,
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO folders (path, parent, mtime_ns) "
+                "VALUES (?, ?, ?)",
+                folder_rows,
+            )
+            conn.commit()
+            moved = _match_moves(added, removed)
+            total = conn.execute(
+                "SELECT COUNT(*) FROM files "
+                "WHERE folder = ? OR (folder >= ? AND folder < ?)",
+                (root, *_subtree_range(root)),
+            ).fetchone()[0]
+
+        return LibraryScan(
+            added=list(added),
+            modified=modified,
+            removed=list(removed),
+            moved=moved,
+            total=total,
+            folders_checked=len(visited),
+            folders_listed=listed,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def record_scan(
+        self,
+        directory: Union[str, Path],
+        folders: Iterable[ScannedFolder],
+    ):
+        """
+        Index a folder tree from a scan that has already been made.
+
+        Replaces what the index held for the tree, so a first scan of a
+        folder doesn't have to be repeated by ``rescan``.
+
+        Args:
+            directory: Root of the tree, as scanned
+            folders: Every folder of the tree, from ``scan_folders`` with
+                ``stat_files`` and ``INDEXED_EXTENSIONS``
+        """
+        root = os.path.abspath(directory)
+        folder_rows = []
+        file_rows = []
+        for folder in folders:
+            path = os.path.abspath(folder.path)
+            parent = (
+                os.path.abspath(folder.parent)
+                if folder.parent is not None
+                else None
+            )
+            folder_rows.append((path, parent, folder.mtime_ns))
+            for file, (size, mtime_ns) in zip(folder.files, folder.stamps):
+                extension = os.path.splitext(file)[1][1:].lower()
+                file_rows.append(
+                    (os.path.abspath(file), path, size, mtime_ns, extension)
+                )
+
+        low, high = _subtree_range(root)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "DELETE FROM folders WHERE path = ? "
+                "OR (path >= ? AND path < ?)",
+                (root, low, high),
+            )
+            conn.execute(
+                "DELETE FROM files WHERE folder = ? "
+                "OR (folder >= ? AND folder < ?)",
+                (root, low, high),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO folders (path, parent, mtime_ns) "
+                "VALUES (?, ?, ?)",
+                folder_rows,
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO files "
+                "(path, folder, size, mtime_ns, format) VALUES (?, ?, ?, ?, ?)",
+                file_rows,
+            )
+            conn.commit()
+
+    def refresh(self, paths: Collection[Union[str, Path]]) -> List[str]:
+        """
+        Re-stat indexed files, e.g. ones known to have been rewritten.
+
+        Files that aren't indexed or no longer exist are left to
+        ``rescan``.
+
+        Args:
+            paths: Paths to the files
+
+        Returns:
+            List[str]: The files whose size or mtime changed
+        """
+        modified = []
+        with self._lock:
+            conn = self._connect()
+            for path in sorted({os.path.abspath(p) for p in paths}):
+                row = conn.execute(
+                    "SELECT size, mtime_ns FROM files WHERE path = ?", (path,)
+                ).fetchone()
+                if row is None:
+                    continue
+                try:
+                    result = os.stat(path)
+                except OSError:
+                    continue
+                stamp = (result.st_size, result.st_mtime_ns)
+                if tuple(row) != stamp:
+                    conn.execute(
+                        "UPDATE files SET size = ?, mtime_ns = ? "
+                        "WHERE path = ?",
+                        (*stamp, path),
+                    )
+                    modified.append(path)
+            conn.commit()
+        return modified
+
+    def files(
+        self,
+        directory: Union[str, Path],
+        extensions: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        """
+        Get the indexed files of a folder tree.
+
+        Args:
+            directory: Root of the tree
+            extensions: Only return these formats (default: all)
+
+        Returns:
+            List[str]: Absolute paths, in the depth-first order of the
+            scanner (each folder's files by name, then its subfolders)
+        """
+        root = os.path.abspath(directory)
+        low, high = _subtree_range(root)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT path, folder, format FROM files "
+                "WHERE folder = ? OR (folder >= ? AND folder < ?)",
+                (root, low, high),
+            )
+            if extensions is not None:
+                wanted = frozenset(extensions)
+                rows = [row for row in rows if row[2] in wanted]
+            # Comparing folders component by component puts "A/sub" right
+            # after "A", before "A-B", as a depth-first walk does
+            return [
+                path
+                for path, _, _ in sorted(
+                    rows, key=lambda row: (row[1].split(os.sep), row[0])
+                )
+            ]
+
+    def get_file_info(self, file_path: Union[str, Path]) -> Optional[dict]:
+        """
+        Get the indexed information about a file.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            Optional[dict]: The same fields as ``fileutils.get_file_info``
+            as of the last scan, or None if the file isn't indexed
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT size, mtime_ns, format FROM files WHERE path = ?",
+                    (path,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        size, mtime_ns, fmt = row
+        return {
+            "name": os.path.basename(path),
+            "path": path,
+            "size": size,
+            "modified": mtime_ns / 1e9,
+            "format": fmt,
+        }
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM folders")
+            conn.commit()
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        """Get the number of indexed files."""
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+# Process-wide library index
+_LIBRARY = LibraryIndex()
+
+
+def get_library_index() -> LibraryIndex:
+    """Get the process-wide library index."""
+    return _LIBRARY
+
+
+def iter_library_files(
+    directory: Union[str, Path], extensions: Collection[str]
+) -> Iterator[str]:
+    """
+    Get the audio files of a folder tree, through the library index.
+
+    A folder scanned before is rescanned incrementally and its files come
+    from the index. A new folder is streamed straight from the scanner
+    (so the first files arrive at once) and indexed from that same scan
+    once it has been consumed. With the ``library.index`` setting off, the
+    folder is always scanned.
+
+    Args:
+        directory: Root of the tree
+        extensions: Lower-case extensions (without the dot) to return
+
+    Yields:
+        str: Path to each audio file
+
+    Raises:
+        FileNotFoundError: If the folder doesn't exist
+    """
+    if not get_setting("library", "index", True):
+        yield from scan_audio_files(directory, extensions)
+        return
+
+    index = get_library_index()
+    if index.has_root(directory):
+        index.rescan(directory)
+        yield from index.files(directory, extensions)
+        return
+
+    # Scan for every indexed format and keep the listings for the index
+    wanted = frozenset(extensions)
+    folders = []
+    for folder in scan_folders(
+        os.path.abspath(directory), INDEXED_EXTENSIONS, stat_files=True
+    ):
+        folders.append(folder)
+        for path in folder.files:
+            if os.path.splitext(path)[1][1:].lower() in wanted:
+                yield path
+    index.record_scan(directory, folders)
@@ -0,0 +1,264 @@
+"""Load-test driver for cover-art lookups against a local stand-in server.
+
+Runs ``fetch_cover_art`` for many distinct tracks at several concurrency
+levels against ``FakeProviderServer`` and reports lookups per second and
+p50/p99 latency. The user's config and caches are left untouched: the run
+uses a temporary config file and temporary caches.
+
+Usage:
+    python -m dolboebify.utils.loadtest --concurrency 1,8,32 --latency 0.05
+"""
+
+import argparse
+import math
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from dolboebify.utils import config, coverart
+from dolboebify.utils.covercache import CoverCache
+from dolboebify.utils.fakeprovider import FakeProviderServer
+from dolboebify.utils.misscache import MissCache
+
+# Concurrency levels measured when none are given
+DEFAULT_CONCURRENCY_LEVELS = (1, 4, 16, 64)
+
+# Lookups performed per concurrency level
+DEFAULT_LOOKUPS = 200
+
+
+class LoadTestResult(NamedTuple):
+    """Measurements for one concurrency level."""
+
+    concurrency: int
+    lookups: int
+    found: int
+    elapsed: float
+    lookups_per_sec: float
+    p50: float
+    p99: float
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    Get a nearest-rank percentile.
+
+    Args:
+        values: Measurements
+        fraction: Percentile as a fraction (0.5 for the median)
+
+    Returns:
+        float: The percentile, or 0.0 if there are no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@contextmanager
+def isolated_environment(settings: Dict[str, dict]) -> Iterator[Path]:
+    """
+    Point config and caches at a temporary directory for a benchmark.
+
+    Provider rate and concurrency limiters start fresh and the previous
+    ones are restored afterwards.
+
+    Args:
+        settings: {section: {key: value}} settings to apply
+
+    Yields:
+        Path: The temporary directory
+    """
+    saved = (
+        config.CONFIG_DIR,
+        config.CONFIG_FILE,
+        coverart._COVER_CACHE,
+        coverart._FAILED_FETCH_CACHE,
+        dict(coverart._PROVIDER_THROTTLES),
+        dict(coverart._PROVIDER_LIMITS),
+    )
+    with tempfile.TemporaryDirectory(prefix="dolboebify-loadtest-") as tmp:
+        directory = Path(tmp)
+        covers = CoverCache(directory / "covers")
+        misses = MissCache(directory / "misses.sqlite3")
+        try:
+            config.CONFIG_DIR = directory
+            config.CONFIG_FILE = directory / "config.json"
+            config.invalidate_config_cache()
+            config.update_settings(settings, flush=True)
+            coverart._COVER_CACHE = covers
+            coverart._FAILED_FETCH_CACHE = misses
+            coverart._PROVIDER_THROTTLES.clear()
+            coverart._PROVIDER_LIMITS.clear()
+            yield directory
+        finally:
+            config.flush_settings()
+            (
+                config.CONFIG_DIR,
+                config.CONFIG_FILE,
+                coverart._COVER_CACHE,
+                coverart._FAILED_FETCH_CACHE,
+                throttles,
+                limits,
+            ) = saved
+            coverart._PROVIDER_THROTTLES.clear()
+            coverart._PROVIDER_THROTTLES.update(throttles)
+            coverart._PROVIDER_LIMITS.clear()
+            coverart._PROVIDER_LIMITS.update(limits)
+            config.invalidate_config_cache()
+            covers.close()
+            misses.close()
+
+
+def run_level(concurrency: int, lookups: int) -> LoadTestResult:
+    """
+    Measure ``fetch_cover_art`` for distinct tracks at one concurrency.
+
+    Args:
+        concurrency: Number of lookups running at once
+        lookups: Number of lookups to perform
+
+    Returns:
+        LoadTestResult: Throughput and latency of the run
+    """
+    run_id = uuid.uuid4().hex[:8]
+    paths = [f"Artist {run_id}-{i} - Title {i}.mp3" for i in range(lookups)]
+
+    def timed_lookup(path: str):
+        start = time.perf_counter()
+        cover = coverart.fetch_cover_art(path)
+        return time.perf_counter() - start, cover is not None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_lookup, paths))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return LoadTestResult(
+        concurrency=concurrency,
+        lookups=lookups,
+        found=sum(found for _, found in results),
+        elapsed=elapsed,
+        lookups_per_sec=lookups / elapsed if elapsed > 0 else 0.0,
+        p50=percentile(latencies, 0.50),
+        p99=percentile(latencies, 0.99),
+    )
+
+
+def run_load_test(
+    server: FakeProviderServer,
+    concurrency_levels: Sequence[int] = DEFAULT_CONCURRENCY_LEVELS,
+    lookups: int = DEFAULT_LOOKUPS,
+    lookup_mode: str = "hedged",
+    provider_rates: Optional[Dict[str, float]] = None,
+    provider_limits: Optional[Dict[str, int]] = None,
+) -> List[LoadTestResult]:
+    """
+    Benchmark cover lookups against a running stand-in server.
+
+    Args:
+        server: Started stand-in provider server
+        concurrency_levels: Concurrency levels to measure
+        lookups: Lookups per level
+        lookup_mode: "hedged" or "sequential"
+        provider_rates: Provider rate limits (default: unlimited)
+        provider_limits: Per-provider concurrency limit overrides
+
+    Returns:
+        List[LoadTestResult]: One result per concurrency level
+    """
+    settings = {
+        "cover_art": {
+            "enabled": True,
+            "fetch_online": True,
+            "lookup_mode": lookup_mode,
+            "provider_urls": server.urls,
+            "provider_rates": provider_rates or {},
+        }
+    }
+    with isolated_environment(settings):
+        for name, limit in (provider_limits or {}).items():
+            coverart.set_provider_limit(name, limit)
+        return [run_level(level, lookups) for level in concurrency_levels]
+
+
+def format_results(results: Sequence[LoadTestResult]) -> str:
+    """Format results as a text table."""
+    lines = [
+        f"{'concurrency':>11} {'lookups':>8} {'found':>6} "
+        f"{'lookups/s':>10} {'p50 ms':>8} {'p99 ms':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r.concurrency:>11} {r.lookups:>8} {r.found:>6} "
+            f"{r.lookups_per_sec:>10.1f} {r.p50 * 1000:>8.1f} "
+            f"{r.p99 * 1000:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark cover-art lookups against a local server."
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=",".join(map(str, DEFAULT_CONCURRENCY_LEVELS)),
+        help="comma-separated concurrency levels",
+    )
+    parser.add_argument("--lookups", type=int, default=DEFAULT_LOOKUPS)
+    parser.add_argument(
+        "--mode", choices=("hedged", "sequential"), default="hedged"
+    )
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--miss-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--image-size", type=int, default=600, help="image edge in pixels"
+    )
+    parser.add_argument(
+        "--provider-limit",
+        type=int,
+        help="concurrent lookups allowed per provider",
+    )
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    server = FakeProviderServer(
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        miss_rate=args.miss_rate,
+        image_size=args.image_size,
+    )
+    with server:
+        limits = None
+        if args.provider_limit:
+            limits = {
+                name: args.provider_limit
+                for name, _ in coverart._get_providers()
+            }
+        results = run_load_test(
+            server, levels, args.lookups, args.mode, provider_limits=limits
+        )
+
+    print(format_results(results))
+    print(f"Requests served: {server.requests}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
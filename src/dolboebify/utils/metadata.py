@@ -0,0 +1,548 @@
+"""Track metadata (tags and duration) read in parallel and cached on disk.
+
+Tags come from ``utils.embedded``; the duration is computed from stream
+headers (MP3 frame headers with their Xing/Info or VBRI summary, FLAC
+STREAMINFO, the MP4 ``mvhd`` atom, the last Ogg granule position, WAV
+chunk sizes) without decoding any audio.
+
+Reading is spread over a pool of worker processes, since parsing tags is
+CPU-bound Python code. Every result is stored in a SQLite cache keyed by
+the file's path, size and mtime, so a library is only read once and later
+loads cost one ``stat`` and an indexed lookup per file.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import struct
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from dolboebify.utils.config import get_setting
+from dolboebify.utils.dbutils import connect_db
+from dolboebify.utils.embedded import (
+    iter_mp4_atoms,
+    read_exact,
+    read_tags,
+    skip_id3,
+)
+
+# Default location of the metadata cache
+METADATA_CACHE_FILE = (
+    Path.home() / ".cache" / "dolboebify" / "metadata.sqlite3"
+)
+
+# Files read per task handed to a worker process
+METADATA_BATCH_SIZE = 256
+
+# Below this many uncached files, they are read in this process (starting
+# worker processes would take longer than reading them)
+MIN_PARALLEL_FILES = 512
+
+# Seconds between checks of the cancel event while workers are reading
+_CANCEL_POLL = 0.1
+
+# Bytes searched for the first MPEG audio frame after the tags
+_MPEG_SYNC_WINDOW = 64 * 1024
+
+# Bytes read from the end of an Ogg file to find its last page
+_OGG_TAIL_SIZE = 64 * 1024
+
+# MPEG audio bitrates (kbps) by (MPEG-1?, layer), indexed by bitrate index
+# fmt: off
+_MPEG_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384,
+                416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256,
+                320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224,
+                256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192,
+                 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144,
+                 160),
+}
+# fmt: on
+_MPEG_BITRATES[False, 3] = _MPEG_BITRATES[False, 2]
+
+# MPEG audio sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_MPEG_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    track_number INTEGER,
+    duration INTEGER
+) WITHOUT ROWID;
+"""
+
+# Paths looked up per query (below SQLite's bound parameter limit)
+_LOOKUP_CHUNK = 500
+
+# A file's identity in the cache: (size, mtime_ns)
+_FileStamp = Tuple[int, int]
+
+
+class TrackMetadata(NamedTuple):
+    """What is known about a track from its tags and stream headers."""
+
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    track_number: Optional[int] = None
+    # Duration in milliseconds
+    duration: Optional[int] = None
+
+
+def _mpeg_frame(header: bytes) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Decode an MPEG audio frame header.
+
+    Returns:
+        Optional[Tuple[int, int, int, int]]: Frame length, sample rate,
+        samples per frame and bitrate (bps), or None if it isn't a valid
+        header
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or rate_index == 3:
+        return None
+    if bitrate_index in (0, 15):
+        return None  # Free format or invalid
+
+    mpeg1 = version == 3
+    bitrate = _MPEG_BITRATES[mpeg1, layer][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, sample_rate, samples, bitrate
+
+
+def _mp3_duration(f: BinaryIO, size: int) -> Optional[float]:
+    """Get the duration (seconds) of an MPEG audio stream after the tags."""
+    skip_id3(f)
+    start = f.tell()
+    window = f.read(_MPEG_SYNC_WINDOW)
+
+    offset = window.find(b"\xff")
+    while offset >= 0:
+        frame = _mpeg_frame(window[offset : offset + 4])
+        # Require a second frame right after the first to rule out
+        # sync-like bytes in the data
+        if frame is not None:
+            following = offset + frame[0]
+            if following + 4 > len(window) or _mpeg_frame(
+                window[following : following + 4]
+            ):
+                break
+        offset = window.find(b"\xff", offset + 1)
+    else:
+        return None
+
+    length, sample_rate, samples, bitrate = frame
+    frame_data = window[offset : offset + length]
+
+    # A Xing/Info summary follows the side information of the first frame
+    mpeg1 = (frame_data[1] >> 3) & 3 == 3
+    mono = frame_data[3] >> 6 == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = frame_data[4 + side_info : 4 + side_info + 12]
+    if xing[:4] in (b"Xing", b"Info") and len(xing) == 12:
+        if struct.unpack(">I", xing[4:8])[0] & 1:
+            frames = struct.unpack(">I", xing[8:12])[0]
+            return frames * samples / sample_rate
+    # A VBRI summary sits at a fixed offset instead
+    vbri = frame_data[36:54]
+    if vbri[:4] == b"VBRI" and len(vbri) == 18:
+        frames = struct.unpack(">I", vbri[14:18])[0]
+        return frames * samples / sample_rate
+
+    # Constant bitrate: the stream size says it all (minus an ID3v1 tag)
+    audio_bytes = size - start - offset
+    f.seek(max(size - 128, 0))
+    if f.read(3) == b"TAG":
+        audio_bytes -= 128
+    return max(audio_bytes, 0) * 8 / bitrate
+
+
+def _flac_duration(f: BinaryIO) -> Optional[float]:
+    """Get the duration (seconds) from FLAC's STREAMINFO block."""
+    skip_id3(f)
+    header = f.read(8)
+    if len(header) < 8 or header[:4] != b"fLaC" or header[4] & 0x7F:
+        return None
+    streaminfo = f.read(34)
+    if len(streaminfo) < 18:
+        return None
+    fields = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = fields >> 44
+    samples = fields & ((1 << 36) - 1)
+    if not sample_rate or not samples:
+        return None
+    return samples / sample_rate
+
+
+def _mp4_duration(f: BinaryIO) -> Optional[float]:
+    """Get the duration (seconds) from an MP4 ``moov/mvhd`` atom."""
+    end = None
+    for wanted in (b"moov", b"mvhd"):
+        for atom_type, payload_start, atom_end in iter_mp4_atoms(f, end):
+            if atom_type == wanted:
+                f.seek(payload_start)
+                end = atom_end
+                break
+        else:
+            return None
+
+    version = read_exact(f, 4)[0]
+    if version == 1:
+        timescale, duration = struct.unpack(">16xIQ", read_exact(f, 28))
+    else:
+        timescale, duration = struct.unpack(">8xII", read_exact(f, 16))
+    if not timescale:
+        return None
+    return duration / timescale
+
+
+def _ogg_duration(f: BinaryIO, size: int) -> Optional[float]:
+    """Get the duration (seconds) from the last Ogg page's granule."""
+    first = f.read(27 + 255 + 19)
+    segments = first[26]
+    packet = first[27 + segments :]
+    if packet.startswith(b"\x01vorbis"):
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        pre_skip = 0
+    elif packet.startswith(b"OpusHead"):
+        sample_rate = 48000  # Opus granules always count 48 kHz samples
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+    else:
+        return None
+
+    f.seek(max(size - _OGG_TAIL_SIZE, 0))
+    tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last < 0 or last + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack("<q", tail[last + 6 : last + 14])[0]
+    if granule <= pre_skip:
+        return None
+    return (granule - pre_skip) / sample_rate
+
+
+def _wav_duration(f: BinaryIO) -> Optional[float]:
+    """Get the duration (seconds) from a WAV file's fmt and data chunks."""
+    f.seek(12)
+    byte_rate = 0
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk, length = struct.unpack("<4sI", header)
+        if chunk == b"fmt ":
+            byte_rate = struct.unpack("<8xI", f.read(12))[0]
+            f.seek(length - 12 + (length & 1), 1)
+        elif chunk == b"data":
+            return length / byte_rate if byte_rate else None
+        else:
+            f.seek(length + (length & 1), 1)
+
+
+def read_duration(file_path: Union[str, Path]) -> Optional[int]:
+    """
+    Get the duration of an audio file from its stream headers.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        Optional[int]: Duration in milliseconds, or None if the format
+        isn't recognised or the headers can't be read
+    """
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:4] == b"fLaC":
+                seconds = _flac_duration(f)
+            elif magic[4:8] == b"ftyp":
+                seconds = _mp4_duration(f)
+            elif magic[:4] == b"OggS":
+                seconds = _ogg_duration(f, size)
+            elif magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+                seconds = _wav_duration(f)
+            else:
+                # MP3, possibly with an ID3 tag hiding a FLAC stream
+                seconds = _flac_duration(f)
+                if seconds is None:
+                    f.seek(0)
+                    seconds = _mp3_duration(f, size)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        print(f"Error reading the duration of {file_path}: {e}")
+        return None
+
+    if seconds is None or seconds <= 0:
+        return None
+    return int(round(seconds * 1000))
+
+
+def _track_number(value: Optional[str]) -> Optional[int]:
+    """Parse a track number tag such as "3" or "03/12"."""
+    if not value:
+        return None
+    number = value.split("/")[0].strip()
+    return int(number) if number.isdigit() else None
+
+
+def read_metadata(file_path: Union[str, Path]) -> TrackMetadata:
+    """
+    Read the tags and duration of an audio file (without the cache).
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        TrackMetadata: What could be read; unknown fields are None
+    """
+    tags = read_tags(file_path)
+    return TrackMetadata(
+        title=tags.get("title"),
+        artist=tags.get("artist") or tags.get("albumartist"),
+        album=tags.get("album"),
+        track_number=_track_number(tags.get("tracknumber")),
+        duration=read_duration(file_path),
+    )
+
+
+def _read_batch(paths: List[str]) -> List[TrackMetadata]:
+    """Read the metadata of several files (run in a worker process)."""
+    return [read_metadata(path) for path in paths]
+
+
+class MetadataCache:
+    """Track metadata persisted in a small SQLite database."""
+
+    def __init__(self, path: Union[str, Path, None] = METADATA_CACHE_FILE):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Database file, or None to keep the cache in memory only
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)."""
+        if self._conn is None:
+            self._conn = connect_db(self.path, _SCHEMA)
+        return self._conn
+
+    def lookup(
+        self, stamps: Dict[str, _FileStamp]
+    ) -> Dict[str, TrackMetadata]:
+        """
+        Get the cached metadata of files that haven't changed since.
+
+        Args:
+            stamps: (size, mtime_ns) of each file, by absolute path
+
+        Returns:
+            Dict[str, TrackMetadata]: Metadata of the files found with the
+            same size and mtime, by path
+        """
+        found = {}
+        paths = list(stamps)
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(paths), _LOOKUP_CHUNK):
+                chunk = paths[start : start + _LOOKUP_CHUNK]
+                rows = conn.execute(
+                    "SELECT path, size, mtime_ns, title, artist, album, "
+                    "track_number, duration FROM metadata WHERE path IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for path, size, mtime_ns, *fields in rows:
+                    if stamps[path] == (size, mtime_ns):
+                        found[path] = TrackMetadata(*fields)
+        return found
+
+    def store(self, entries: Iterable[Tuple[str, _FileStamp, TrackMetadata]]):
+        """
+        Remember the metadata of files.
+
+        Args:
+            entries: (absolute path, (size, mtime_ns), metadata) of each
+                file
+        """
+        rows = [
+            (path, size, mtime_ns, *metadata)
+            for path, (size, mtime_ns), metadata in entries
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metadata VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def clear(self):
+        """Forget every file."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM metadata")
+
+    def close(self):
+        """Close the database (it is reopened on next use)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        """Get the number of files cached."""
+        with self._lock:
+            return (
+                self._connect()
+                .execute("SELECT COUNT(*) FROM metadata")
+                .fetchone()[0]
+            )
+
+
+# Process-wide metadata cache shared by the player backends
+_METADATA = MetadataCache()
+
+
+def get_metadata_cache() -> MetadataCache:
+    """Get the shared metadata cache."""
+    return _METADATA
+
+
+def extract_metadata(
+    paths: Iterable[Union[str, Path]],
+    workers: Optional[int] = None,
+    cache: Optional[MetadataCache] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[Tuple[str, TrackMetadata]]:
+    """
+    Get the metadata of many files, reading only those not cached.
+
+    Cached files are yielded first; the others are read by a pool of
+    worker processes and yielded (and cached) batch by batch as they are
+    done, so not in the order given. Files that don't exist are skipped.
+    Closing the generator early, or setting ``cancel``, cancels the
+    batches not started yet.
+
+    Args:
+        paths: Paths to the audio files
+        workers: Worker processes (default: the ``library.metadata_workers``
+            setting, 0 meaning one per CPU); 1 reads in this process
+        cache: Metadata cache (default: the shared one)
+        cancel: Event that stops the search early when set, even while
+            the files are being stat-ed or the workers are reading
+
+    Yields:
+        Tuple[str, TrackMetadata]: Each path, as given, and its metadata
+    """
+    if cache is None:
+        cache = get_metadata_cache()
+    if workers is None:
+        workers = get_setting("library", "metadata_workers", 0)
+    workers = workers or os.cpu_count() or 1
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    given: Dict[str, str] = {}
+    stamps: Dict[str, _FileStamp] = {}
+    for path in paths:
+        if cancelled():
+            return
+        path = os.fspath(path)
+        absolute = os.path.abspath(path)
+        try:
+            result = os.stat(absolute)
+        except OSError:
+            continue
+        given[absolute] = path
+        stamps[absolute] = (result.st_size, result.st_mtime_ns)
+
+    cached = cache.lookup(stamps)
+    for absolute, metadata in cached.items():
+        yield given[absolute], metadata
+
+    missing = [path for path in stamps if path not in cached]
+    batches = [
+        missing[start : start + METADATA_BATCH_SIZE]
+        for start in range(0, len(missing), METADATA_BATCH_SIZE)
+    ]
+
+    def finish(batch, results):
+        cache.store(
+            (path, stamps[path], metadata)
+            for path, metadata in zip(batch, results)
+        )
+        for path, metadata in zip(batch, results):
+            yield given[path], metadata
+
+    if workers == 1 or len(missing) < MIN_PARALLEL_FILES:
+        for batch in batches:
+            if cancelled():
+                return
+            yield from finish(batch, _read_batch(batch))
+        return
+
+    # Spawned rather than forked workers: the player runs other threads
+    # (libVLC, Qt) that a fork would copy in an arbitrary state
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(batches)),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    futures = {executor.submit(_read_batch, batch): batch for batch in batches}
+    pending = set(futures)
+    try:
+        while pending and not cancelled():
+            done, pending = wait(
+                pending, timeout=_CANCEL_POLL, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                yield from finish(futures[future], future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
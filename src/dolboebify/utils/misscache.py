@@ -0,0 +1,140 @@
+"""Persistent cache of cover-art lookups that found nothing."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from dolboebify.utils.dbutils import connect_db
+
+# Default location of the on-disk miss cache
+MISS_CACHE_FILE = Path.home() / ".cache" / "dolboebify" / "misses.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS misses (
+    key BLOB PRIMARY KEY,
+    failed_at INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _digest(key: str) -> bytes:
+    """Hash a lookup key to a compact fixed-size identifier."""
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+
+class MissCache:
+    """
+    TTL-bounded set of lookup keys, persisted in a small SQLite database.
+
+    Keys are stored as 8-byte hashes together with the time of the miss,
+    so thousands of entries take a few dozen kilobytes. Expiry is checked
+    against the TTL given at lookup time, which means changes to the
+    ``cover_art.cache_ttl`` setting apply to existing entries too.
+    """
+
+    def __init__(self, path: Union[str, Path, None] = MISS_CACHE_FILE):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Database file, or None to keep the cache in memory only
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)."""
+        if self._conn is None:
+            self._conn = connect_db(self.path, _SCHEMA)
+        return self._conn
+
+    def contains(self, key: str, ttl: float) -> bool:
+        """
+        Check whether a key missed less than ``ttl`` seconds ago.
+
+        Expired entries are removed as they are found.
+
+        Args:
+            key: Lookup key
+            ttl: Maximum age of an entry in seconds
+
+        Returns:
+            bool: True if the key has a fresh miss recorded
+        """
+        digest = _digest(key)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT failed_at FROM misses WHERE key = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return False
+            if time.time() - row[0] < ttl:
+                return True
+            conn.execute("DELETE FROM misses WHERE key = ?", (digest,))
+            conn.commit()
+        return False
+
+    def add(self, key: str, timestamp: Optional[float] = None):
+        """
+        Record a miss for a key.
+
+        Args:
+            key: Lookup key
+            timestamp: Time of the miss (defaults to now)
+        """
+        failed_at = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO misses (key, failed_at) VALUES (?, ?)",
+                (_digest(key), failed_at),
+            )
+            conn.commit()
+
+    def discard(self, key: str):
+        """Forget a recorded miss, if any."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM misses WHERE key = ?", (_digest(key),))
+            conn.commit()
+
+    def purge(self, ttl: float) -> int:
+        """
+        Remove all entries older than ``ttl`` seconds.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM misses WHERE failed_at <= ?",
+                (int(time.time() - ttl),),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM misses")
+            conn.commit()
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        """Get the number of recorded misses (including expired ones)."""
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT COUNT(*) FROM misses").fetchone()[0]
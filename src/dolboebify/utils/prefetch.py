@@ -0,0 +1,99 @@
+"""Asynchronous bulk prefetching of track cover art."""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple, Union
+
+from dolboebify.utils import coverart
+
+# Default number of tracks looked up concurrently
+DEFAULT_PREFETCH_CONCURRENCY = 16
+
+
+def _resolve_cover(
+    path: Union[str, Path], cancel: threading.Event
+) -> Optional[str]:
+    """Find a track's cover: embedded artwork first, then online."""
+    cover = coverart.get_embedded_cover(path)
+    if cover:
+        return cover
+    return coverart.fetch_cover_art(path, cancel=cancel)
+
+
+async def prefetch_covers(
+    paths: Iterable[Union[str, Path]],
+    concurrency: int = DEFAULT_PREFETCH_CONCURRENCY,
+    provider_limits: Optional[Dict[str, int]] = None,
+) -> AsyncIterator[Tuple[str, Optional[str]]]:
+    """
+    Warm the cover cache for many tracks, yielding results as they finish.
+
+    Artwork embedded in the files is used without a network lookup.
+    At most ``concurrency`` lookups run at once on a private worker pool,
+    so arbitrarily long (or lazily generated) path lists never spawn more
+    than that many threads. Results are yielded in completion order.
+
+    Closing the iterator (or cancelling the task consuming it) cancels
+    queued lookups and tells running ones to stop before their next
+    request; cancelled lookups are not recorded as misses.
+
+    Args:
+        paths: Paths to the audio files
+        concurrency: Maximum number of concurrent track lookups
+        provider_limits: Optional {provider name: limit} overrides applied
+            process-wide with ``coverart.set_provider_limit``
+
+    Yields:
+        Tuple[str, Optional[str]]: Track path and its cover art path (or
+        None if no cover was found)
+    """
+    concurrency = max(1, concurrency)
+    for name, limit in (provider_limits or {}).items():
+        coverart.set_provider_limit(name, limit)
+
+    loop = asyncio.get_running_loop()
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="dolboebify-prefetch"
+    )
+    remaining = iter(paths)
+    running: Dict[asyncio.Future, str] = {}
+
+    def submit_next() -> bool:
+        path = next(remaining, None)
+        if path is None:
+            return False
+        future = loop.run_in_executor(
+            executor,
+            functools.partial(_resolve_cover, path, cancel),
+        )
+        running[future] = str(path)
+        return True
+
+    try:
+        while len(running) < concurrency and submit_next():
+            pass
+
+        while running:
+            done, _ = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                path = running.pop(future)
+                # Keep the pool busy while the consumer handles the result
+                submit_next()
+
+                try:
+                    cover = future.result()
+                except Exception as e:
+                    print(f"Error prefetching cover for {path}: {e}")
+                    cover = None
+                yield path, cover
+    finally:
+        cancel.set()
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=False)
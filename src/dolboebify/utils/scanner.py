@@ -0,0 +1,230 @@
+"""Streaming, parallel scanning of music folders.
+
+Folders are listed with ``os.scandir`` on a small thread pool, ahead of
+the consumer, while files are yielded in a stable depth-first order (each
+folder's files by name, then its subfolders by name). The first tracks
+are therefore available as soon as the first folders are listed, not
+after the whole tree has been walked.
+
+Hidden folders (names starting with ".") are skipped, and symlinked
+folders are followed at most once: every folder is identified by its
+device and inode, so symlink loops and links back into the library don't
+produce duplicates or endless walks.
+"""
+
+import os
+import stat
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Collection,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+# Folders listed concurrently during a scan
+DEFAULT_SCAN_WORKERS = 8
+
+# A subfolder found while listing: (path, (device, inode), mtime_ns)
+_Subfolder = Tuple[str, Tuple[int, int], int]
+
+
+class ScannedFolder(NamedTuple):
+    """A folder listed by ``scan_folders``."""
+
+    path: str
+    # Folder it was found in (None for the root)
+    parent: Optional[str]
+    mtime_ns: int
+    # Matching files, sorted by name
+    files: List[str]
+    # (size, mtime_ns) of each file, if the scan stats files
+    stamps: List[Tuple[int, int]]
+
+
+def _identity(result: os.stat_result) -> Tuple[int, int]:
+    """Get the (device, inode) pair identifying a folder."""
+    return result.st_dev, result.st_ino
+
+
+def _list_directory(
+    directory: str,
+    extensions: Optional[Collection[str]],
+    include_hidden: bool,
+    follow_symlinks: bool,
+    stat_files: bool,
+) -> Optional[Tuple[List[Tuple[str, Optional[tuple]]], List[_Subfolder]]]:
+    """List one folder: matching files and subfolders, sorted by name."""
+    files = []
+    folders = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        if not include_hidden and entry.name.startswith("."):
+                            continue
+                        result = entry.stat()
+                        folders.append(
+                            (entry.path, _identity(result), result.st_mtime_ns)
+                        )
+                    elif entry.is_file():
+                        if extensions is not None:
+                            extension = os.path.splitext(entry.name)[1]
+                            if extension[1:].lower() not in extensions:
+                                continue
+                        stamp = None
+                        if stat_files:
+                            result = entry.stat()
+                            stamp = (result.st_size, result.st_mtime_ns)
+                        files.append((entry.path, stamp))
+                except OSError:
+                    continue  # Broken symlink or entry removed meanwhile
+    except OSError as e:
+        print(f"Error scanning {directory}: {e}")
+        return None
+
+    files.sort()
+    folders.sort()
+    return files, folders
+
+
+def scan_folders(
+    directory: Union[str, Path],
+    extensions: Optional[Collection[str]] = None,
+    recursive: bool = True,
+    include_hidden: bool = False,
+    follow_symlinks: bool = True,
+    workers: int = DEFAULT_SCAN_WORKERS,
+    stat_files: bool = False,
+) -> Iterator[ScannedFolder]:
+    """
+    List the folders of a tree, yielding each as soon as it's listed.
+
+    Folders come in the depth-first order of ``scan_audio_files``.
+    Folders that can't be listed are skipped. Closing the generator early
+    stops the scan.
+
+    Args:
+        directory: Folder to scan
+        extensions: Lower-case extensions without the dot to match
+            (default: every file)
+        recursive: Whether to descend into subfolders
+        include_hidden: Whether to descend into hidden folders
+        follow_symlinks: Whether to descend into symlinked folders
+        workers: Number of folders listed concurrently
+        stat_files: Also get the size and mtime of every matching file
+
+    Yields:
+        ScannedFolder: Each listed folder
+
+    Raises:
+        FileNotFoundError: If the folder doesn't exist
+    """
+    root = os.fspath(directory)
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        root_stat = None
+    if root_stat is None or not stat.S_ISDIR(root_stat.st_mode):
+        raise FileNotFoundError(f"Directory not found: {root}")
+    if extensions is not None:
+        extensions = frozenset(extensions)
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="dolboebify-scan"
+    )
+    # Folders already listed or queued, by (device, inode)
+    seen = {_identity(root_stat)}
+    # Listings in progress as (path, parent, mtime_ns, future), consumed
+    # from the end (depth first)
+    pending: List[Tuple[str, Optional[str], int, Future]] = []
+
+    def submit(path: str) -> Future:
+        return executor.submit(
+            _list_directory,
+            path,
+            extensions,
+            include_hidden,
+            follow_symlinks,
+            stat_files,
+        )
+
+    try:
+        pending.append((root, None, root_stat.st_mtime_ns, submit(root)))
+        while pending:
+            path, parent, mtime_ns, future = pending.pop()
+            listing = future.result()
+            if listing is None:
+                continue
+            files, folders = listing
+            yield ScannedFolder(
+                path,
+                parent,
+                mtime_ns,
+                [file for file, _ in files],
+                [stamp for _, stamp in files] if stat_files else [],
+            )
+
+            if not recursive:
+                break
+            # Listed in name order, consumed in name order
+            listings = []
+            for child, identity, child_mtime_ns in folders:
+                if identity not in seen:
+                    seen.add(identity)
+                    listings.append(
+                        (child, path, child_mtime_ns, submit(child))
+                    )
+            pending.extend(reversed(listings))
+    finally:
+        for *_, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def scan_audio_files(
+    directory: Union[str, Path],
+    extensions: Optional[Collection[str]] = None,
+    recursive: bool = True,
+    include_hidden: bool = False,
+    follow_symlinks: bool = True,
+    workers: int = DEFAULT_SCAN_WORKERS,
+) -> Iterator[str]:
+    """
+    Find the audio files in a folder tree, yielding them as they're found.
+
+    Closing the generator early stops the scan.
+
+    Args:
+        directory: Folder to scan
+        extensions: Lower-case extensions without the dot to match
+            (default: every file)
+        recursive: Whether to descend into subfolders
+        include_hidden: Whether to descend into hidden folders
+        follow_symlinks: Whether to descend into symlinked folders
+        workers: Number of folders listed concurrently
+
+    Yields:
+        str: Path to each matching file
+
+    Raises:
+        FileNotFoundError: If the folder doesn't exist
+    """
+    folders = scan_folders(
+        directory,
+        extensions,
+        recursive,
+        include_hidden,
+        follow_symlinks,
+        workers,
+    )
+    try:
+        for folder in folders:
+            yield from folder.files
+    finally:
+        folders.close()
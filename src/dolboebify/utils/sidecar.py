@@ -0,0 +1,144 @@
+"""Lookup of cover images stored next to audio files ("sidecar" covers).
+
+Each folder is listed once and the chosen cover is cached per folder. The
+entry is only re-validated against the folder's mtime (one stat), at most
+once per ``DIRECTORY_CHECK_INTERVAL`` seconds, so resolving the cover of
+every track on a slow or network filesystem costs a dictionary lookup.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+# Sidecar names, in order of preference (matched case-insensitively)
+SIDECAR_NAMES = ("cover", "folder", "front", "album", "artwork")
+
+# Sidecar extensions, in order of preference (matched case-insensitively)
+SIDECAR_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Minimum interval (seconds) between mtime checks of a cached folder
+DIRECTORY_CHECK_INTERVAL = 2.0
+
+# Folders remembered before the least recently used are dropped
+MAX_CACHED_DIRECTORIES = 4096
+
+# A cached folder: (mtime_ns, last check, cover path or None)
+_Entry = Tuple[int, float, Optional[str]]
+
+
+def _choose_cover(directory: str) -> Optional[str]:
+    """List a folder and pick its preferred sidecar cover, if any."""
+    candidates = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                candidates.setdefault(entry.name.casefold(), entry.name)
+    except OSError:
+        return None
+
+    for stem in SIDECAR_NAMES:
+        for extension in SIDECAR_EXTENSIONS:
+            name = candidates.get(stem + extension)
+            if name is not None:
+                return os.path.join(directory, name)
+    return None
+
+
+class SidecarCoverCache:
+    """Per-folder cache of sidecar cover lookups."""
+
+    def __init__(self, max_directories: int = MAX_CACHED_DIRECTORIES):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_directories: Number of folders remembered
+        """
+        self.max_directories = max_directories
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def find(self, directory: Union[str, Path]) -> Optional[str]:
+        """
+        Get the sidecar cover of a folder.
+
+        Args:
+            directory: Folder containing the audio files
+
+        Returns:
+            Optional[str]: Path to the cover image, or None if the folder
+            has none
+        """
+        directory = os.path.abspath(directory)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(directory)
+            if entry is not None:
+                self._entries.move_to_end(directory)
+                if now - entry[1] < DIRECTORY_CHECK_INTERVAL:
+                    return entry[2]
+
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.invalidate(directory)
+            return None
+
+        if entry is not None and entry[0] == mtime:
+            cover = entry[2]
+        else:
+            cover = _choose_cover(directory)
+
+        with self._lock:
+            self._entries[directory] = (mtime, now, cover)
+            self._entries.move_to_end(directory)
+            while len(self._entries) > self.max_directories:
+                self._entries.popitem(last=False)
+        return cover
+
+    def invalidate(self, directory: Optional[Union[str, Path]] = None):
+        """
+        Forget a folder (or all folders), forcing a new listing.
+
+        Args:
+            directory: Folder to forget, or None to forget all
+        """
+        with self._lock:
+            if directory is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(directory), None)
+
+
+# Process-wide sidecar cache shared by the player backends
+_SIDECARS = SidecarCoverCache()
+
+
+def find_sidecar_cover(track_path: Union[str, Path]) -> Optional[str]:
+    """
+    Find the cover image stored next to a track.
+
+    Names like cover/folder/front/album/artwork with a JPEG, PNG or WebP
+    extension are recognised, in any letter case.
+
+    Args:
+        track_path: Path to the audio file
+
+    Returns:
+        Optional[str]: Path to the cover image, or None if there is none
+    """
+    return _SIDECARS.find(os.path.dirname(os.path.abspath(track_path)))
+
+
+def invalidate_sidecar_covers(directory: Optional[Union[str, Path]] = None):
+    """
+    Forget cached sidecar lookups, e.g. after adding a cover to a folder.
+
+    Args:
+        directory: Folder to forget, or None to forget all
+    """
+    _SIDECARS.invalidate(directory)
@@ -0,0 +1,63 @@
+"""Scaling of cover images to display-sized thumbnails."""
+
+from typing import Optional, Tuple
+
+try:
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+    from PyQt5.QtGui import QImage
+except ImportError:  # pragma: no cover - Qt is a hard dependency of the GUI
+    QImage = None
+
+# Default edge lengths (pixels) of the stored cover renditions
+DEFAULT_THUMBNAIL_SIZES = (64, 200, 600)
+
+# JPEG quality of generated thumbnails
+THUMBNAIL_QUALITY = 90
+
+
+def is_available() -> bool:
+    """Check whether thumbnails can be generated in this environment."""
+    return QImage is not None
+
+
+def make_thumbnails(
+    data: bytes, sizes=DEFAULT_THUMBNAIL_SIZES
+) -> Tuple[Optional[int], dict]:
+    """
+    Decode an image once and scale it down to each requested size.
+
+    Sizes at or above the image's own longest edge are skipped, since the
+    original already serves them.
+
+    Args:
+        data: Encoded image data
+        sizes: Longest-edge lengths to generate
+
+    Returns:
+        Tuple[Optional[int], dict]: The original's longest edge (None if
+        the image can't be decoded) and a {size: JPEG bytes} mapping
+    """
+    if QImage is None:
+        return None, {}
+
+    image = QImage()
+    if not image.loadFromData(data):
+        return None, {}
+
+    dimension = max(image.width(), image.height())
+    thumbnails = {}
+    for size in sorted(set(sizes)):
+        if size <= 0 or size >= dimension:
+            continue
+
+        scaled = image.scaled(
+            size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation
+        )
+        buffer_data = QByteArray()
+        buffer = QBuffer(buffer_data)
+        buffer.open(QIODevice.WriteOnly)
+        if scaled.save(buffer, "JPG", THUMBNAIL_QUALITY):
+            thumbnails[size] = bytes(buffer_data)
+        buffer.close()
+
+    return dimension, thumbnails
@@ -0,0 +1,293 @@
+"""Parsing of artist and title from track file names.
+
+Names are matched against a table of regular expressions with ``artist``
+and ``title`` named groups, tried in order:
+
+1. Patterns without a "/" that capture an artist, matched against the
+   file's stem ("01. Artist - Title").
+2. Patterns with "/" separators (outside character classes), matched
+   against the stem and as many of the parent folder names as the pattern
+   has separators ("Artist/Album/01 Title").
+3. Patterns without a "/" that only capture a title ("01 - Title").
+
+The stem patterns are combined into a single precompiled alternation, and
+results are memoized by stem, so parsing a whole library costs one regex
+match per distinct name.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Optional track number prefix: "01. ", "01) ", "01 - "
+_TRACK_NUMBER = r"(?:\d{1,3}\s*[.)]\s*|\d{1,3}\s+[-–—]\s+)"
+
+# Built-in patterns, from the most to the least specific
+DEFAULT_TRACK_PATTERNS = (
+    # "Artist - Title", "01. Artist - Title", "01 - Artist - Title"
+    rf"^{_TRACK_NUMBER}?(?P<artist>.+?)\s+[-–—]\s+(?P<title>.+)$",
+    # "Artist_-_Title", "01. Artist_-_Title"
+    rf"^{_TRACK_NUMBER}?(?P<artist>.+?)_-_(?P<title>.+)$",
+    # "Artist-Title" (unspaced separator)
+    rf"^{_TRACK_NUMBER}?(?P<artist>.+?)\s*[-–—]\s*(?P<title>.+)$",
+    # "Artist - Album/01 Title"
+    r"^(?P<artist>[^/]+?)\s+[-–—]\s+[^/]+/\d{1,3}\s*[-–—.)]?\s*"
+    r"(?P<title>[^/]+)$",
+    # "Artist/Album/01 Title"
+    r"^(?P<artist>[^/]+)/[^/]+/\d{1,3}\s*[-–—.)]?\s*(?P<title>[^/]+)$",
+    # "01 Title", "01 - Title"
+    r"^\d{1,3}\s*[-–—.)]?\s*(?P<title>\D.*)$",
+)
+
+# Upper bound on memoized stems before the memo is reset
+MAX_MEMO_ENTRIES = 262144
+
+# Character classes, ignored when counting a pattern's "/" separators
+_CHAR_CLASS = re.compile(r"\[(?:\\.|[^\]])*\]")
+
+# Named groups (and references to them) in user-supplied patterns
+_GROUP_NAME = re.compile(r"\(\?P([<=])(\w+)")
+
+# A parse result: (artist, title) or None if the pattern didn't apply
+_Match = Optional[Tuple[str, str]]
+
+
+def _split_stem(name: str) -> Tuple[str, str]:
+    """Split a path into (parent part, stem) like ``Path.parent``/``stem``."""
+    if os.sep != "/":
+        name = name.replace(os.sep, "/")
+    head, _, base = name.rpartition("/")
+    dot = base.rfind(".")
+    if 0 < dot < len(base) - 1:
+        base = base[:dot]
+    return head, base
+
+
+def _clean(artist: Optional[str], title: str) -> _Match:
+    """Clean a raw (artist, title) split, rejecting bogus ones."""
+    title = title.strip()
+    artist = (artist or "").strip().rstrip("_").strip()
+    if not title:
+        return None
+    # A bare number is a track or year prefix, not an artist
+    if artist and artist.isdigit():
+        return None
+    return artist, title
+
+
+def _result(match: "re.Match") -> _Match:
+    """Turn a match of a single pattern into a cleaned (artist, title)."""
+    groups = match.groupdict()
+    return _clean(groups.get("artist"), groups["title"])
+
+
+class TrackNameParser:
+    """Parses artist and title from file names with a table of patterns."""
+
+    def __init__(self, patterns: Optional[Sequence[str]] = None):
+        """
+        Compile a pattern table.
+
+        Args:
+            patterns: Regular expressions with an ``artist`` (optional) and
+                ``title`` named group, tried before the built-in ones.
+                Invalid patterns are reported and skipped.
+        """
+        self.patterns = tuple(patterns or ()) + DEFAULT_TRACK_PATTERNS
+        self._artist_stem: List["re.Pattern"] = []
+        self._title_stem: List["re.Pattern"] = []
+        self._path: List[Tuple[int, "re.Pattern"]] = []
+
+        branches = []
+        for source in self.patterns:
+            try:
+                regex = re.compile(source)
+            except re.error as e:
+                print(f"Ignoring invalid track name pattern {source!r}: {e}")
+                continue
+            if "title" not in regex.groupindex:
+                print(f"Ignoring track name pattern without title: {source!r}")
+                continue
+
+            depth = _CHAR_CLASS.sub("", source).count("/")
+            if depth:
+                self._path.append((depth, regex))
+            elif "artist" in regex.groupindex:
+                index = len(self._artist_stem)
+                self._artist_stem.append(regex)
+                renamed = _GROUP_NAME.sub(rf"(?P\1\2_{index}", source)
+                branches.append(f"(?P<b{index}>{renamed})")
+            else:
+                self._title_stem.append(regex)
+
+        # One alternation of all artist patterns; the branch that matched
+        # is found from its wrapper group, its fields by group number
+        self._combined = None
+        self._branches: Dict[str, Tuple[int, int, int]] = {}
+        if branches:
+            self._combined = re.compile("|".join(branches))
+            for index in range(len(branches)):
+                self._branches[f"b{index}"] = (
+                    index,
+                    self._combined.groupindex[f"artist_{index}"],
+                    self._combined.groupindex[f"title_{index}"],
+                )
+        self._memo: Dict[str, Tuple[_Match, _Match]] = {}
+
+    def _match_stem(self, stem: str) -> Tuple[_Match, _Match]:
+        """
+        Match a stem against the stem patterns (not memoized).
+
+        Returns:
+            Tuple[_Match, _Match]: The artist pattern result, and (only
+            when that is None) the title-only pattern result
+        """
+        found = None
+        start = len(self._artist_stem)
+        if self._combined is not None:
+            match = self._combined.match(stem)
+            if match:
+                index, artist, title = self._branches[match.lastgroup]
+                found = _clean(match.group(artist), match.group(title))
+                start = index + 1
+
+        # The first branch that matched gave a bogus split; try the rest
+        for regex in self._artist_stem[start:]:
+            if found is not None:
+                break
+            match = regex.match(stem)
+            if match:
+                found = _result(match)
+        if found is not None:
+            return found, None
+
+        for regex in self._title_stem:
+            match = regex.match(stem)
+            if match:
+                title_only = _result(match)
+                if title_only is not None:
+                    return None, title_only
+        return None, None
+
+    def _match_path(self, head: str, stem: str) -> _Match:
+        """Match a stem with its parent folders against the path patterns."""
+        if not head or not self._path:
+            return None
+        parents = [part for part in head.split("/") if part]
+        for depth, regex in self._path:
+            if len(parents) < depth:
+                continue
+            subject = "/".join(parents[len(parents) - depth :] + [stem])
+            match = regex.match(subject)
+            if match:
+                found = _result(match)
+                if found is not None:
+                    return found
+        return None
+
+    def _fallback(
+        self, head: str, stem: str, title_only: _Match
+    ) -> Tuple[str, str]:
+        """Resolve a stem no artist pattern matched."""
+        found = self._match_path(head, stem)
+        if found is not None:
+            return found
+        if title_only is not None:
+            return title_only
+        return "", stem
+
+    def parse(self, name: Union[str, "os.PathLike"]) -> Tuple[str, str]:
+        """
+        Parse artist and title from a file name or path.
+
+        Args:
+            name: File name, or path (parent folders enable the path
+                patterns)
+
+        Returns:
+            Tuple[str, str]: Artist (empty if unknown) and title
+        """
+        head, stem = _split_stem(os.fspath(name))
+
+        memo = self._memo.get(stem)
+        if memo is None:
+            if len(self._memo) >= MAX_MEMO_ENTRIES:
+                self._memo.clear()
+            memo = self._memo[stem] = self._match_stem(stem)
+
+        if memo[0] is not None:
+            return memo[0]
+        return self._fallback(head, stem, memo[1])
+
+    def parse_many(
+        self, names: Iterable[Union[str, "os.PathLike"]]
+    ) -> List[Tuple[str, str]]:
+        """
+        Parse a batch of file names or paths.
+
+        This is ``parse`` applied to every name, with the per-name work
+        inlined into a single loop.
+
+        Args:
+            names: File names or paths
+
+        Returns:
+            List[Tuple[str, str]]: (artist, title) for each name, in order
+        """
+        if len(self._memo) >= MAX_MEMO_ENTRIES:
+            self._memo.clear()
+
+        memo = self._memo
+        lookup = memo.get
+        match_stem = self._match_stem
+        fspath = os.fspath
+        sep = os.sep if os.sep != "/" else None
+        results = []
+        append = results.append
+
+        for name in names:
+            name = fspath(name)
+            if sep:
+                name = name.replace(sep, "/")
+            slash = name.rfind("/")
+            base = name[slash + 1 :]
+            dot = base.rfind(".")
+            stem = base[:dot] if 0 < dot < len(base) - 1 else base
+
+            hit = lookup(stem)
+            if hit is None:
+                hit = memo[stem] = match_stem(stem)
+            if hit[0] is not None:
+                append(hit[0])
+            else:
+                append(self._fallback(name[: max(slash, 0)], stem, hit[1]))
+
+        return results
+
+
+# Parser built from the configured patterns, rebuilt when they change
+_PARSER: Optional[TrackNameParser] = None
+
+
+def get_track_parser(
+    patterns: Optional[Sequence[str]] = None,
+) -> TrackNameParser:
+    """
+    Get the shared parser for a pattern table.
+
+    Args:
+        patterns: Extra patterns tried before the built-in ones
+
+    Returns:
+        TrackNameParser: A parser whose memo persists while the patterns
+        stay the same
+    """
+    global _PARSER
+
+    patterns = tuple(patterns or ()) + DEFAULT_TRACK_PATTERNS
+    parser = _PARSER
+    if parser is None or parser.patterns != patterns:
+        parser = _PARSER = TrackNameParser(
+            patterns[: len(patterns) - len(DEFAULT_TRACK_PATTERNS)]
+        )
+    return parser
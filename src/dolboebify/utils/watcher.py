@@ -0,0 +1,381 @@
+"""Live watching of a music folder for added, removed and renamed files.
+
+On Linux the folder tree is watched with inotify (through ``ctypes``, no
+extra dependency); elsewhere, or when inotify is unavailable or out of
+watches, the tree is polled. Either way a burst of filesystem events is
+coalesced into a single incremental rescan of the library index (see
+``utils.library``), and the resulting changes are reported as one
+``LibraryDelta``.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Callable,
+    Collection,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from dolboebify.utils.library import (
+    INDEXED_EXTENSIONS,
+    LibraryIndex,
+    get_library_index,
+)
+
+# Quiet period (seconds) after the last event before changes are reported
+DEFAULT_COALESCE_DELAY = 0.5
+
+# Upper bound (seconds) on how long a steady stream of events can delay
+# reporting
+MAX_COALESCE_DELAY = 5.0
+
+# Interval (seconds) between rescans when polling
+DEFAULT_POLL_INTERVAL = 5.0
+
+# inotify event flags (from <sys/inotify.h>)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+# Events that change a folder's listing
+_IN_STRUCTURE = (
+    _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+
+_WATCH_MASK = _IN_STRUCTURE | _IN_CLOSE_WRITE | _IN_ONLYDIR
+
+# struct inotify_event header: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class LibraryDelta(NamedTuple):
+    """Changes to a watched folder tree."""
+
+    added: List[str]
+    removed: List[str]
+    modified: List[str]
+    # (old path, new path) of renamed or moved files
+    moved: List[Tuple[str, str]]
+
+    def __bool__(self) -> bool:
+        """Check whether anything changed."""
+        return bool(self.added or self.removed or self.modified or self.moved)
+
+
+class _Inotify:
+    """Minimal inotify binding."""
+
+    def __init__(self):
+        """Create an inotify instance.
+
+        Raises:
+            OSError: If inotify is unavailable
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        # Written to by wake() to interrupt a waiting read()
+        self._wake_read, self._wake_write = os.pipe()
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Watch a folder; returns the watch descriptor."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def read(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """
+        Wait for events.
+
+        Args:
+            timeout: Seconds to wait for the first event
+
+        Returns:
+            List[Tuple[int, int, str]]: (watch descriptor, mask, name)
+            for each event
+        """
+        ready, _, _ = select.select(
+            [self.fd, self._wake_read], [], [], max(timeout, 0)
+        )
+        if self.fd not in ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def wake(self):
+        """Make a waiting ``read`` return at once."""
+        os.write(self._wake_write, b"\0")
+
+    def close(self):
+        """Close the inotify instance (which removes all watches)."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self.fd = -1
+
+
+class LibraryWatcher:
+    """Watches a folder tree and reports changes to its audio files."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        on_change: Callable[[LibraryDelta], None],
+        extensions: Collection[str] = INDEXED_EXTENSIONS,
+        index: Optional[LibraryIndex] = None,
+        coalesce_delay: float = DEFAULT_COALESCE_DELAY,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        """
+        Initialize the watcher (call ``start`` or use it as a context
+        manager).
+
+        Args:
+            directory: Root of the folder tree
+            on_change: Called (on the watcher's thread) with each non-empty
+                batch of changes
+            extensions: Lower-case extensions (without the dot) of the
+                files reported
+            index: Library index kept up to date (default: the shared one)
+            coalesce_delay: Quiet period after the last event before the
+                changes are reported
+            poll_interval: Seconds between rescans when polling
+            use_inotify: Whether to try inotify before falling back to
+                polling
+        """
+        self.directory = os.path.abspath(directory)
+        self.on_change = on_change
+        self.extensions = frozenset(extensions)
+        self.index = index if index is not None else get_library_index()
+        self.coalesce_delay = coalesce_delay
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+        self._watches = {}  # watch descriptor -> folder
+
+    @property
+    def mode(self) -> Optional[str]:
+        """Get how the tree is watched: "inotify", "polling" or None."""
+        if self._thread is None:
+            return None
+        return "inotify" if self._inotify is not None else "polling"
+
+    def start(self) -> "LibraryWatcher":
+        """
+        Index the tree and start watching it on a background thread.
+
+        Raises:
+            FileNotFoundError: If the folder doesn't exist
+        """
+        if self._thread is not None:
+            return self
+
+        # Watch before indexing, so nothing changes unseen in between
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(self.directory)
+            except OSError as e:
+                print(f"Watching {self.directory} by polling: {e}")
+                self._close_inotify()
+        try:
+            self.index.rescan(self.directory)
+        except FileNotFoundError:
+            self._close_inotify()
+            raise
+
+        self._stop.clear()
+        target = self._run_inotify if self._inotify else self._run_polling
+        self._thread = threading.Thread(
+            target=target, name="dolboebify-library-watcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching and wait for the watcher thread to exit."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            if self._inotify is not None:
+                self._inotify.wake()
+            if thread is not threading.current_thread():
+                thread.join()
+        self._close_inotify()
+
+    def __enter__(self) -> "LibraryWatcher":
+        """Start watching."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop watching."""
+        self.stop()
+
+    def _close_inotify(self):
+        """Drop the inotify instance, if any."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+
+    def _watch_tree(self, directory: str):
+        """
+        Watch a folder and its (non-hidden) subfolders.
+
+        Raises:
+            OSError: If inotify runs out of watches
+        """
+        seen: Set[Tuple[int, int]] = set()
+        stack = [directory]
+        while stack:
+            folder = stack.pop()
+            try:
+                result = os.stat(folder)
+                identity = (result.st_dev, result.st_ino)
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                wd = self._inotify.add_watch(folder, _WATCH_MASK)
+                with os.scandir(folder) as entries:
+                    subfolders = [
+                        entry.path
+                        for entry in entries
+                        if not entry.name.startswith(".") and entry.is_dir()
+                    ]
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise  # Out of watches: poll instead
+                continue  # Removed meanwhile
+            self._watches[wd] = folder
+            stack.extend(subfolders)
+
+    def _run_inotify(self):
+        """Collect inotify events and report them in coalesced batches."""
+        written: Set[str] = set()
+        changed = False
+        first = deadline = None
+        while not self._stop.is_set():
+            timeout = 0.5 if deadline is None else deadline - time.monotonic()
+            try:
+                events = self._inotify.read(min(timeout, 0.5))
+            except (OSError, ValueError):
+                return  # Closed by stop()
+
+            now = time.monotonic()
+            for wd, mask, name in events:
+                if mask & _IN_Q_OVERFLOW:
+                    changed = True
+                    continue
+                folder = self._watches.get(wd)
+                if mask & _IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                if folder is None:
+                    continue
+                path = os.path.join(folder, name) if name else folder
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    if not name.startswith("."):
+                        try:
+                            self._watch_tree(path)
+                        except OSError as e:
+                            print(f"Error watching {path}: {e}")
+                if mask & _IN_STRUCTURE:
+                    changed = True
+                elif mask & _IN_CLOSE_WRITE:
+                    written.add(path)
+
+            if events:
+                first = now if first is None else first
+                deadline = min(
+                    now + self.coalesce_delay, first + MAX_COALESCE_DELAY
+                )
+            if deadline is not None and time.monotonic() >= deadline:
+                self._report(changed, written)
+                written = set()
+                changed = False
+                first = deadline = None
+
+    def _run_polling(self):
+        """Rescan the tree periodically."""
+        while not self._stop.wait(self.poll_interval):
+            self._report(True, ())
+
+    def _wanted(self, path: str) -> bool:
+        """Check whether a file has one of the reported extensions."""
+        return os.path.splitext(path)[1][1:].lower() in self.extensions
+
+    def _report(self, changed: bool, written: Collection[str]):
+        """Update the index and report the changes, if any."""
+        added, removed, moved = [], [], []
+        modified = set()
+        if changed:
+            try:
+                scan = self.index.rescan(self.directory)
+            except FileNotFoundError:
+                return  # The watched folder itself is gone
+            added, removed, moved = scan.added, scan.removed, scan.moved
+            modified.update(scan.modified)
+        if written:
+            modified.update(self.index.refresh(written))
+
+        delta = LibraryDelta(
+            added=[path for path in added if self._wanted(path)],
+            removed=[path for path in removed if self._wanted(path)],
+            modified=[path for path in sorted(modified) if self._wanted(path)],
+            moved=[move for move in moved if self._wanted(move[1])],
+        )
+        if delta:
+            try:
+                self.on_change(delta)
+            except Exception as e:
+                print(f"Error applying library changes: {e}")
@@ -0,0 +1,52 @@
+"""Shared fixtures for the Dolboebify test suite."""
+
+from unittest import mock
+
+import pytest
+
+from dolboebify.utils import coverart, library, metadata
+from dolboebify.utils.covercache import CoverCache
+from dolboebify.utils.misscache import MissCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_miss_cache(tmp_path):
+    """Keep failed-fetch records out of the user's real cache."""
+    cache = MissCache(tmp_path / "misses.sqlite3")
+    with mock.patch.object(coverart, "_FAILED_FETCH_CACHE", cache):
+        yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_cover_cache(tmp_path):
+    """Keep downloaded covers out of the user's real cache."""
+    cache = CoverCache(tmp_path / "covers")
+    with mock.patch.object(coverart, "_COVER_CACHE", cache):
+        yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_provider_throttles():
+    """Start every test with fresh provider rate limiters."""
+    with mock.patch.object(coverart, "_PROVIDER_THROTTLES", {}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_library_index(tmp_path):
+    """Keep scanned folders out of the user's real library index."""
+    index = library.LibraryIndex(tmp_path / "library.sqlite3")
+    with mock.patch.object(library, "_LIBRARY", index):
+        yield index
+    index.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_metadata_cache(tmp_path):
+    """Keep read track metadata out of the user's real cache."""
+    cache = metadata.MetadataCache(tmp_path / "metadata.sqlite3")
+    with mock.patch.object(metadata, "_METADATA", cache):
+        yield cache
+    cache.close()
@@ -0,0 +1,215 @@
+"""Tests for the configuration utilities."""
+
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from dolboebify.utils import config
+
+
+@pytest.fixture(autouse=True)
+def config_file(tmp_path):
+    """Point the config module at a temporary config file."""
+    config_file = tmp_path / "config.json"
+    with mock.patch.object(config, "CONFIG_DIR", tmp_path), mock.patch.object(
+        config, "CONFIG_FILE", config_file
+    ):
+        config.invalidate_config_cache()
+        yield config_file
+        config.flush_settings()
+        config.invalidate_config_cache()
+
+
+class TestConfigCache:
+    """Tests for the in-memory config cache."""
+
+    def test_defaults_created(self, config_file):
+        """Test that a missing config file is created with defaults."""
+        assert config.get_setting("cover_art", "timeout") == 2.0
+        assert config_file.exists()
+
+    def test_lookup_does_not_reparse(self, config_file):
+        """Test that repeated lookups hit the cache instead of the file."""
+        config.get_setting("cover_art", "timeout")
+
+        with mock.patch.object(config, "load_config") as mock_load:
+            for _ in range(100):
+                config.get_setting("cover_art", "timeout")
+            config.get_config(force_check=True)
+            assert not mock_load.called
+
+    def test_external_edit_invalidates(self, config_file):
+        """Test that editing the file on disk is picked up."""
+        config.get_setting("cover_art", "timeout")
+
+        data = json.loads(config_file.read_text())
+        data["cover_art"]["timeout"] = 5.5
+        config_file.write_text(json.dumps(data))
+        stats = config_file.stat()
+        os.utime(
+            config_file, ns=(stats.st_atime_ns, stats.st_mtime_ns + 10**9)
+        )
+
+        assert (
+            config.get_config(force_check=True)["cover_art"]["timeout"] == 5.5
+        )
+
+    def test_subscribers_notified(self, config_file):
+        """Test that subscribers receive the new config on change."""
+        config.get_config()
+        received = []
+        config.subscribe(received.append)
+        try:
+            assert config.set_setting("player", "default_volume", 42)
+            assert config.get_setting("player", "default_volume") == 42
+            assert received[-1]["player"]["default_volume"] == 42
+        finally:
+            assert config.unsubscribe(received.append)
+        assert not config.unsubscribe(received.append)
+
+
+class TestSettingsWrites:
+    """Tests for batched and debounced settings writes."""
+
+    def test_changes_coalesced_into_one_write(self, config_file):
+        """Test that many changes result in a single save."""
+        config.get_config()
+
+        with mock.patch.object(
+            config, "save_config", wraps=config.save_config
+        ) as mock_save:
+            for volume in range(50):
+                config.set_setting("player", "default_volume", volume)
+            assert config.get_setting("player", "default_volume") == 49
+            assert not mock_save.called
+
+            assert config.flush_settings()
+            assert mock_save.call_count == 1
+
+        data = json.loads(config_file.read_text())
+        assert data["player"]["default_volume"] == 49
+        assert list(config_file.parent.glob("*.tmp")) == []
+
+    def test_background_writer_flushes(self, config_file):
+        """Test that the debounced writer persists changes on its own."""
+        config.get_config()
+
+        def theme_on_disk():
+            return json.loads(config_file.read_text())["ui"]["theme"]
+
+        with mock.patch.object(config, "SETTINGS_WRITE_DELAY", 0.01):
+            config.set_setting("ui", "theme", "light")
+            deadline = time.monotonic() + 5
+            while theme_on_disk() != "light" and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert theme_on_disk() == "light"
+
+    def test_transaction(self, config_file):
+        """Test committing and discarding settings transactions."""
+        with config.settings_transaction(flush=True) as tx:
+            tx.set("player", "default_volume", 10)
+            tx.set("ui", "theme", "light")
+            assert tx.get("player", "default_volume") == 10
+            assert config.get_setting("player", "default_volume") == 70
+
+        data = json.loads(config_file.read_text())
+        assert data["player"]["default_volume"] == 10
+        assert data["ui"]["theme"] == "light"
+
+        with pytest.raises(RuntimeError):
+            with config.settings_transaction() as tx:
+                tx.set("ui", "theme", "neon")
+                raise RuntimeError("abort")
+        assert config.get_setting("ui", "theme") == "light"
+
+    def test_pending_changes_survive_external_edit(self, config_file):
+        """Test that unwritten changes are kept when the file is re-read."""
+        config.get_config()
+        config.update_settings({"ui": {"theme": "light"}})
+
+        data = json.loads(config_file.read_text())
+        data["cover_art"]["timeout"] = 9.0
+        config_file.write_text(json.dumps(data, indent=4))
+
+        current = config.get_config(force_check=True)
+        assert current["ui"]["theme"] == "light"
+        assert current["cover_art"]["timeout"] == 9.0
+
+        assert config.flush_settings()
+        data = json.loads(config_file.read_text())
+        assert data["ui"]["theme"] == "light"
+        assert data["cover_art"]["timeout"] == 9.0
+
+    def test_concurrent_updates_both_kept(self, config_file):
+        """Test that updates from two threads don't overwrite each other."""
+        config.get_config()
+        real_get_config = config.get_config
+        both_read = threading.Barrier(2)
+
+        def get_config_together(*args, **kwargs):
+            # Let both threads read the config before either applies its
+            # update (an update copying a stale config would lose a key)
+            result = real_get_config(*args, **kwargs)
+            try:
+                both_read.wait(timeout=0.5)
+            except threading.BrokenBarrierError:
+                pass
+            return result
+
+        updates = (
+            {"ui": {"theme": "light"}},
+            {"player": {"default_volume": 10}},
+        )
+        with mock.patch.object(config, "get_config", get_config_together):
+            threads = [
+                threading.Thread(target=config.update_settings, args=(u,))
+                for u in updates
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        current = config.get_config()
+        assert current["ui"]["theme"] == "light"
+        assert current["player"]["default_volume"] == 10
+
+    def test_flush_does_not_hold_lock_for_write(self, config_file):
+        """Test that lookups and subscribers run while a flush writes."""
+        config.get_config()
+        config.update_settings({"ui": {"theme": "light"}})
+        seen = []
+
+        def subscriber(new_config):
+            # Read settings from another thread, as a GUI callback might
+            reader = threading.Thread(
+                target=lambda: seen.append(config.get_setting("ui", "theme"))
+            )
+            reader.start()
+            reader.join(timeout=2)
+            seen.append(not reader.is_alive())
+
+        real_fsync = os.fsync
+
+        def slow_fsync(fd):
+            lookup = threading.Thread(target=config.get_config)
+            lookup.start()
+            lookup.join(timeout=2)
+            seen.append(not lookup.is_alive())
+            real_fsync(fd)
+
+        config.subscribe(subscriber)
+        try:
+            config.update_settings({"ui": {"theme": "neon"}})
+            with mock.patch.object(config.os, "fsync", slow_fsync):
+                assert config.flush_settings()
+        finally:
+            config.unsubscribe(subscriber)
+
+        assert all(item is not False for item in seen)
+        assert json.loads(config_file.read_text())["ui"]["theme"] == "neon"
@@ -1,16 +1,25 @@
 """Tests for the cover art fetching functionality."""
 
+import asyncio
+import threading
+import time
 from unittest import mock
 
+from dolboebify.utils import coverart
 from dolboebify.utils.coverart import (
+    close_http_session,
     fetch_cover_art,
     fetch_from_itunes,
     fetch_from_lastfm,
     get_cached_cover,
+    get_http_session,
     parse_track_info,
     sanitize_filename,
     save_to_cache,
 )
+from dolboebify.utils.exceptions import ProviderThrottledError
+from dolboebify.utils.misscache import MissCache
+from dolboebify.utils.prefetch import prefetch_covers
 
 
 class TestCoverArtFetching:
@@ -30,8 +39,8 @@ class TestCoverArtFetching:
 
         # Test with underscore format
         artist, title = parse_track_info("Artist_-_Title.mp3")
-        assert artist == "Artist_"
-        assert title == "_Title"
+        assert artist == "Artist"
+        assert title == "Title"
 
         # Test with no artist
         artist, title = parse_track_info("JustTitle.mp3")
@@ -57,32 +66,49 @@ class TestCoverArtFetching:
         assert ">" not in sanitized
         assert "|" not in sanitized
 
-    @mock.patch("os.path.exists")
-    def test_get_cached_cover(self, mock_exists):
+    def test_get_cached_cover(self):
         """Test getting cached cover art."""
-        # Mock that the cache file exists
-        mock_exists.return_value = True
+        # Nothing cached yet
+        assert get_cached_cover("Artist", "Title") is None
+
+        save_to_cache("Artist", "Title", b"fake_image_data")
 
         # Test with valid artist and title
-        with mock.patch("pathlib.Path.exists", return_value=True):
-            cached = get_cached_cover("Artist", "Title")
-            assert cached is not None
-            assert "Artist_Title.jpg" in cached
+        cached = get_cached_cover("Artist", "Title")
+        assert cached is not None
+        assert cached.endswith(".jpg")
 
         # Test with empty artist
         cached = get_cached_cover("", "Title")
         assert cached is None
 
-    @mock.patch("builtins.open", mock.mock_open())
     def test_save_to_cache(self):
         """Test saving cover art to cache."""
         image_data = b"fake_image_data"
 
         path = save_to_cache("Artist", "Title", image_data)
         assert path is not None
-        assert "Artist_Title.jpg" in path
+        assert path.endswith(".jpg")
+        with open(path, "rb") as f:
+            assert f.read() == image_data
+
+        # Identical artwork for another track is stored only once
+        assert save_to_cache("Artist", "Other Title", image_data) == path
 
-    @mock.patch("requests.get")
+    def test_http_session_shared(self):
+        """Test that providers share one pooled keep-alive session."""
+        close_http_session()
+        session = get_http_session()
+        assert get_http_session() is session
+
+        adapter = session.get_adapter("https://itunes.apple.com/search")
+        assert adapter._pool_maxsize == coverart.HTTP_POOL_MAXSIZE
+        assert adapter._pool_block is True
+
+        close_http_session()
+        assert get_http_session() is not session
+
+    @mock.patch("requests.Session.get")
     def test_fetch_from_itunes(self, mock_get):
         """Test fetching cover art from iTunes API."""
         # Mock a successful API response
@@ -126,7 +152,7 @@ class TestCoverArtFetching:
             _, kwargs = mock_get.call_args_list[1]
             assert "600x600" in kwargs.get("url", "")
 
-    @mock.patch("requests.get")
+    @mock.patch("requests.Session.get")
     def test_fetch_from_lastfm(self, mock_get):
         """Test fetching cover art from Last.fm API."""
         # Mock a successful API response for track.getInfo
@@ -230,3 +256,457 @@ class TestCoverArtFetching:
         assert result is None
         assert mock_itunes.called
         assert mock_lastfm.called
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_hedged_lookup(self, mock_lastfm, mock_itunes):
+        """Test that a slow primary provider is hedged by the secondary."""
+        released = threading.Event()
+
+        def slow_itunes(artist, title, cancel=None):
+            released.wait(5)
+            return None if cancel.is_set() else "/path/to/itunes/cover.jpg"
+
+        mock_itunes.side_effect = slow_itunes
+        mock_lastfm.return_value = "/path/to/lastfm/cover.jpg"
+
+        start = time.monotonic()
+        result = coverart._lookup_hedged(
+            coverart._get_providers(),
+            "Artist",
+            "Title",
+            hedge_delay=0.05,
+        )
+        elapsed = time.monotonic() - start
+        released.set()
+
+        assert result == "/path/to/lastfm/cover.jpg"
+        assert elapsed < 2
+        # The losing lookup was told to stop
+        _, kwargs = mock_itunes.call_args
+        assert kwargs["cancel"].is_set()
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_hedged_lookup_primary_wins(self, mock_lastfm, mock_itunes):
+        """Test that a fast primary answer never starts the secondary."""
+        mock_itunes.return_value = "/path/to/itunes/cover.jpg"
+
+        result = coverart._lookup_hedged(
+            coverart._get_providers(),
+            "Artist",
+            "Title",
+            hedge_delay=5,
+        )
+        assert result == "/path/to/itunes/cover.jpg"
+        assert not mock_lastfm.called
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_hedged_lookup_cancelled_while_queued(
+        self, mock_lastfm, mock_itunes
+    ):
+        """Test that cancelling with a provider still queued returns."""
+
+        def slow_itunes(artist, title, cancel=None):
+            time.sleep(0.2)
+            return None
+
+        mock_itunes.side_effect = slow_itunes
+        cancel = threading.Event()
+        threading.Timer(0.05, cancel.set).start()
+
+        start = time.monotonic()
+        result = coverart._lookup_hedged(
+            coverart._get_providers(),
+            "Artist",
+            "Title",
+            hedge_delay=5,
+            cancel=cancel,
+        )
+        assert result is None
+        assert time.monotonic() - start < 2
+        assert not mock_lastfm.called
+
+
+class TestCoverPrefetch:
+    """Tests for the asyncio bulk prefetch engine."""
+
+    @mock.patch("dolboebify.utils.coverart.fetch_cover_art")
+    def test_prefetch_covers(self, mock_fetch):
+        """Test that all tracks are looked up with bounded concurrency."""
+        lock = threading.Lock()
+        active = [0, 0]  # current, peak
+
+        def fake_fetch(path, cancel=None):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return None if path.startswith("miss") else f"{path}.jpg"
+
+        mock_fetch.side_effect = fake_fetch
+        paths = [f"track{i}.mp3" for i in range(20)] + ["miss.mp3"]
+
+        async def collect():
+            return [r async for r in prefetch_covers(paths, concurrency=3)]
+
+        results = dict(asyncio.run(collect()))
+        assert set(results) == set(paths)
+        assert results["track0.mp3"] == "track0.mp3.jpg"
+        assert results["miss.mp3"] is None
+        assert active[1] <= 3
+
+    @mock.patch("dolboebify.utils.coverart.fetch_cover_art")
+    def test_prefetch_covers_cancel(self, mock_fetch):
+        """Test that closing the iterator stops outstanding lookups."""
+        cancels = []
+
+        def fake_fetch(path, cancel=None):
+            cancels.append(cancel)
+            time.sleep(0.01)
+            return f"{path}.jpg"
+
+        mock_fetch.side_effect = fake_fetch
+        paths = (f"track{i}.mp3" for i in range(1000))
+
+        async def first():
+            results = prefetch_covers(paths, concurrency=2)
+            result = await results.__anext__()
+            await results.aclose()
+            return result
+
+        asyncio.run(first())
+        assert len(cancels) < 10
+        assert all(cancel.is_set() for cancel in cancels)
+
+
+class TestFailedFetchCache:
+    """Tests for the persistent negative cache."""
+
+    def test_lookup_key_normalized(self):
+        """Test that formatting differences map to the same key."""
+        assert coverart.make_lookup_key(
+            "The  Artist", "Title "
+        ) == coverart.make_lookup_key("the artist", "TITLE")
+        assert coverart.make_lookup_key(
+            "Artist", "Title"
+        ) != coverart.make_lookup_key("Artist", "Other")
+
+    def test_misses_persist_across_restarts(self, tmp_path):
+        """Test that misses survive reopening the cache and expire."""
+        path = tmp_path / "misses.sqlite3"
+        cache = MissCache(path)
+        cache.add("key")
+        cache.add("old", timestamp=time.time() - 7200)
+        cache.close()
+
+        cache = MissCache(path)
+        assert cache.contains("key", ttl=3600)
+        assert not cache.contains("old", ttl=3600)
+        assert not cache.contains("other", ttl=3600)
+        assert len(cache) == 1
+
+        cache.clear()
+        assert not cache.contains("key", ttl=3600)
+        cache.close()
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_miss_shared_between_paths(self, mock_lastfm, mock_itunes):
+        """Test that a miss is keyed by the query, not the track path."""
+        mock_itunes.return_value = None
+        mock_lastfm.return_value = None
+
+        assert fetch_cover_art("/music/a/Nobody - Nothing.mp3") is None
+        assert mock_itunes.call_count == 1
+
+        assert fetch_cover_art("/music/b/nobody - nothing.flac") is None
+        assert mock_itunes.call_count == 1
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_concurrent_lookups_coalesced(self, mock_lastfm, mock_itunes):
+        """Test that concurrent lookups of one query share a fetch."""
+        released = threading.Event()
+
+        def slow_itunes(artist, title, cancel=None):
+            released.wait(5)
+            return "/path/to/itunes/cover.jpg"
+
+        mock_itunes.side_effect = slow_itunes
+        results = []
+
+        def lookup(path):
+            results.append(fetch_cover_art(path))
+
+        threads = [
+            threading.Thread(
+                target=lookup, args=(f"{i:02d}. Band - Song.mp3",)
+            )
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+
+        deadline = time.monotonic() + 5
+        while not mock_itunes.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        released.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["/path/to/itunes/cover.jpg"] * 8
+        assert mock_itunes.call_count == 1
+        assert coverart._IN_FLIGHT.in_flight() == 0
+
+    def test_cancelled_leader_handed_over(self):
+        """Test that followers retry when the leading caller cancels."""
+        flight = coverart._SingleFlight()
+        leader_cancel = threading.Event()
+        started = threading.Event()
+        results = {}
+
+        def leader_fn():
+            started.set()
+            leader_cancel.wait(5)
+            return None
+
+        leader = threading.Thread(
+            target=lambda: results.setdefault(
+                "leader", flight.do("key", leader_fn, leader_cancel)
+            )
+        )
+        leader.start()
+        started.wait(5)
+
+        follower = threading.Thread(
+            target=lambda: results.setdefault(
+                "follower", flight.do("key", lambda: "/cover.jpg")
+            )
+        )
+        follower.start()
+        time.sleep(0.05)
+        leader_cancel.set()
+        leader.join(5)
+        follower.join(5)
+
+        assert results == {"leader": None, "follower": "/cover.jpg"}
+        assert flight.in_flight() == 0
+
+    def test_follower_cancel_and_timeout(self):
+        """Test that waiting followers honour their own cancel and timeout."""
+        flight = coverart._SingleFlight()
+        released = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            released.wait(5)
+            return "/cover.jpg"
+
+        leader = threading.Thread(target=flight.do, args=("key", slow))
+        leader.start()
+        started.wait(5)
+
+        cancel = threading.Event()
+        threading.Timer(0.05, cancel.set).start()
+        start = time.monotonic()
+        assert flight.do("key", slow, cancel) is None
+        assert flight.do("key", slow, timeout=0.05) is None
+        assert time.monotonic() - start < 2
+
+        released.set()
+        leader.join(5)
+
+
+class TestProviderThrottling:
+    """Tests for provider rate limiting and backoff."""
+
+    def test_token_bucket(self):
+        """Test that requests beyond the burst wait for new tokens."""
+        throttle = coverart._ProviderThrottle(burst=2)
+        start = time.monotonic()
+        for _ in range(3):
+            assert throttle.acquire(rate=20)
+        assert time.monotonic() - start >= 0.04
+
+    def test_acquire_cancelled(self):
+        """Test that waiting for a token can be cancelled."""
+        throttle = coverart._ProviderThrottle(burst=1)
+        throttle.backoff(retry_after=30)
+        cancel = threading.Event()
+        cancel.set()
+        assert not throttle.acquire(rate=1, cancel=cancel)
+
+    def test_acquire_non_blocking(self):
+        """Test that a non-blocking acquire gives up at once."""
+        throttle = coverart._ProviderThrottle(burst=1)
+        assert throttle.acquire(rate=0.5, block=False)
+        start = time.monotonic()
+        assert not throttle.acquire(rate=0.5, block=False)
+        assert time.monotonic() - start < 0.5
+        assert 1.5 < throttle.wait_time(rate=0.5) <= 2
+
+    @mock.patch("requests.Session.get")
+    def test_interactive_lookup_deferred(self, mock_get):
+        """Test that a non-blocking lookup never waits out a backoff."""
+        for name in ("itunes", "lastfm"):
+            coverart._get_provider_throttle(name).backoff(retry_after=30)
+
+        start = time.monotonic()
+        assert fetch_cover_art("Artist - Title.mp3", block=False) is None
+        assert time.monotonic() - start < 2
+        assert not mock_get.called
+        assert not coverart.is_fetch_recently_failed("Artist", "Title")
+
+    def test_retry_after_parsing(self):
+        """Test parsing of both Retry-After formats."""
+        assert coverart._parse_retry_after("120") == 120
+        assert coverart._parse_retry_after(None) is None
+        assert coverart._parse_retry_after("soon") is None
+        delay = coverart._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+        assert delay < 0
+
+    @mock.patch("requests.Session.get")
+    def test_throttled_reply_honours_retry_after(self, mock_get):
+        """Test that a 429 reply pauses the provider for Retry-After."""
+        mock_get.return_value = mock.MagicMock(
+            status_code=429, headers={"Retry-After": "7"}
+        )
+
+        try:
+            fetch_from_itunes("Artist", "Title")
+        except ProviderThrottledError as e:
+            assert e.providers == ["itunes"]
+            assert 6 < e.retry_after <= 7
+        else:
+            raise AssertionError("ProviderThrottledError not raised")
+
+    def test_backoff_grows(self):
+        """Test that consecutive failures back off exponentially."""
+        throttle = coverart._ProviderThrottle()
+        first = throttle.backoff()
+        second = throttle.backoff()
+        assert 0.9 < first < second
+        throttle.reset()
+        assert throttle._failures == 0
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    def test_throttled_lookup_retried(self, mock_lastfm, mock_itunes):
+        """Test that only throttled providers are retried, without a miss."""
+        mock_itunes.side_effect = ProviderThrottledError("itunes", 0)
+        mock_lastfm.return_value = None
+
+        with mock.patch.object(coverart, "get_setting") as mock_setting:
+            mock_setting.side_effect = lambda section, key, default=None: {
+                "lookup_mode": "sequential",
+                "throttle_retries": 2,
+            }.get(key, default)
+            assert fetch_cover_art("Artist - Title.mp3") is None
+
+        assert mock_itunes.call_count == 3
+        assert mock_lastfm.call_count == 1
+        assert not coverart.is_fetch_recently_failed("Artist", "Title")
+
+        # Once the provider recovers the cover is found
+        mock_itunes.side_effect = None
+        mock_itunes.return_value = "/path/to/itunes/cover.jpg"
+        assert fetch_cover_art("Artist - Title.mp3") == (
+            "/path/to/itunes/cover.jpg"
+        )
+
+
+class TestAlbumLookup:
+    """Tests for album-level cover lookups."""
+
+    def _album(self, directory, count=10):
+        """Create an album folder with untagged tracks."""
+        directory.mkdir(parents=True)
+        paths = []
+        for i in range(count):
+            path = directory / f"{i + 1:02d}. Band - Song {i}.mp3"
+            path.write_bytes(b"\xff\xfb" * 10)
+            paths.append(path)
+        return paths
+
+    def test_album_from_directory(self, tmp_path):
+        """Test deriving albums from folder layouts."""
+        (tmp_path / "Band - 2019 - Record" / "CD1").mkdir(parents=True)
+        (tmp_path / "Band" / "Record").mkdir(parents=True)
+        (tmp_path / "Downloads").mkdir()
+        (tmp_path / "Various - Summer Hits").mkdir()
+
+        for folder, expected in (
+            ("Band - 2019 - Record/CD1", ("Band", "Record")),
+            ("Band/Record", ("Band", "Record")),
+            ("Downloads", None),
+            ("Various - Summer Hits", None),
+        ):
+            path = tmp_path / folder / "Band - Song.mp3"
+            path.write_bytes(b"")
+            assert coverart.get_album_info(path, "band") == expected
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_album_from_itunes")
+    def test_album_shares_one_lookup(self, mock_album, mock_track, tmp_path):
+        """Test that all tracks of an album share one lookup and image."""
+        mock_album.side_effect = lambda artist, album, cancel=None: (
+            coverart.save_album_to_cache(artist, album, b"cover")
+        )
+        paths = self._album(tmp_path / "Band - Record")
+
+        covers = {fetch_cover_art(path) for path in paths}
+
+        assert len(covers) == 1
+        assert mock_album.call_count == 1
+        assert mock_album.call_args[0][:2] == ("Band", "Record")
+        assert not mock_track.called
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_album_from_itunes")
+    def test_mixed_artist_folder_not_an_album(
+        self, mock_album, mock_track, tmp_path
+    ):
+        """Test that an "X - Y" folder of other artists isn't an album."""
+        mock_track.side_effect = lambda artist, title, cancel=None: (
+            f"/covers/{artist}.jpg"
+        )
+        directory = tmp_path / "Various - Summer Hits"
+        directory.mkdir()
+        covers = []
+        for name in ("01. Band - Song.mp3", "02. Other - Tune.mp3"):
+            path = directory / name
+            path.write_bytes(b"\xff\xfb" * 10)
+            covers.append(fetch_cover_art(path))
+
+        assert covers == ["/covers/Band.jpg", "/covers/Other.jpg"]
+        assert not mock_album.called
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    @mock.patch("dolboebify.utils.coverart.fetch_album_from_itunes")
+    @mock.patch("dolboebify.utils.coverart.fetch_album_from_lastfm")
+    def test_album_miss_falls_back_to_tracks(
+        self,
+        mock_album_lastfm,
+        mock_album_itunes,
+        mock_lastfm,
+        mock_itunes,
+        tmp_path,
+    ):
+        """Test that tracks are looked up once the album lookup missed."""
+        mock_album_itunes.return_value = None
+        mock_album_lastfm.return_value = None
+        mock_itunes.return_value = "/path/to/itunes/cover.jpg"
+        paths = self._album(tmp_path / "Band - Record", count=3)
+
+        for path in paths:
+            assert fetch_cover_art(path) == "/path/to/itunes/cover.jpg"
+
+        assert mock_album_itunes.call_count == 1
+        assert mock_itunes.call_count == 3
@@ -0,0 +1,190 @@
+"""Tests for the cover art cache manager."""
+
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+from dolboebify.utils import covercache
+from dolboebify.utils.covercache import CoverCache
+
+
+class TestCoverCache:
+    """Tests for the size-capped LRU cover cache."""
+
+    def test_put_and_get(self, tmp_path):
+        """Test storing and looking up covers."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        path = cache.put("Artist_Title", b"x" * 10)
+
+        assert cache.get("Artist_Title") == path
+        assert cache.get("Other_Title") is None
+        assert cache.stats() == (1, 10)
+        assert list(tmp_path.glob("*.tmp")) == []
+
+    def test_lookup_does_not_stat(self, tmp_path):
+        """Test that lookups are answered from the index."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        cache.put("Artist_Title", b"x")
+
+        with mock.patch("os.stat") as mock_stat, mock.patch(
+            "pathlib.Path.exists"
+        ) as mock_exists:
+            assert cache.get("Artist_Title") is not None
+            assert not mock_stat.called
+            assert not mock_exists.called
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that least recently used entries are evicted first."""
+        cache = CoverCache(tmp_path, max_bytes=30, max_entries=10)
+        with mock.patch.object(covercache, "ACCESS_UPDATE_INTERVAL", 0):
+            with mock.patch("time.time", side_effect=range(1, 100)):
+                a = cache.put("a", b"a" * 10)
+                b = cache.put("b", b"b" * 10)
+                cache.put("c", b"c" * 10)
+                # Touch "a" so "b" becomes the least recently used
+                cache.get("a")
+                cache.put("d", b"d" * 10)
+
+        assert cache.get("a") == a
+        assert cache.get("b") is None
+        assert not os.path.exists(b)
+        assert cache.stats() == (3, 30)
+
+    def test_entry_budget(self, tmp_path):
+        """Test that the entry budget is enforced."""
+        cache = CoverCache(tmp_path, max_bytes=10**6, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.encode())
+
+        assert cache.stats() == (2, 2)
+        assert cache.get("c") is not None
+
+    def test_existing_files_adopted(self, tmp_path):
+        """Test that covers cached before the index existed are indexed."""
+        (tmp_path / "Old_Cover.jpg").write_bytes(b"x" * 5)
+
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        path = cache.get("Old_Cover")
+        assert path is not None
+        with open(path, "rb") as f:
+            assert f.read() == b"x" * 5
+        assert not (tmp_path / "Old_Cover.jpg").exists()
+        assert cache.stats() == (1, 5)
+
+    def test_clear(self, tmp_path):
+        """Test removing all cached covers."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        cache.put("a", b"a")
+        cache.put("b", b"b")
+
+        assert cache.clear() == 2
+        assert cache.stats() == (0, 0)
+        assert list(tmp_path.rglob("*.jpg")) == []
+
+    def test_identical_images_stored_once(self, tmp_path):
+        """Test that keys with identical artwork share one file."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=100)
+        paths = {cache.put(f"Album_Track {i}", b"artwork") for i in range(15)}
+
+        assert len(paths) == 1
+        assert len(list(tmp_path.rglob("*.jpg"))) == 1
+        assert cache.stats() == (15, len(b"artwork"))
+        assert cache.get_hash("Album_Track 0") == cache.get_hash(
+            "Album_Track 14"
+        )
+
+        # The image stays until the last key referring to it is gone
+        for i in range(14):
+            cache.remove(f"Album_Track {i}")
+        assert os.path.exists(paths.pop())
+        cache.remove("Album_Track 14")
+        assert list(tmp_path.rglob("*.jpg")) == []
+        assert cache.stats() == (0, 0)
+
+    def test_replacing_image_releases_old_one(self, tmp_path):
+        """Test that re-storing a key with new artwork drops the old file."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        old = cache.put("a", b"old")
+        new = cache.put("a", b"new")
+
+        assert old != new
+        assert not os.path.exists(old)
+        assert cache.stats() == (1, 3)
+
+
+class TestCoverThumbnails:
+    """Tests for the pre-scaled cover renditions."""
+
+    @pytest.fixture
+    def jpeg_600(self):
+        """Encode a 600x600 test image."""
+        QtGui = pytest.importorskip("PyQt5.QtGui")
+        QtCore = pytest.importorskip("PyQt5.QtCore")
+
+        image = QtGui.QImage(600, 600, QtGui.QImage.Format_RGB32)
+        image.fill(0x3366CC)
+        data = QtCore.QByteArray()
+        buffer = QtCore.QBuffer(data)
+        buffer.open(QtCore.QIODevice.WriteOnly)
+        image.save(buffer, "JPG")
+        return bytes(data)
+
+    def test_renditions_generated(self, tmp_path, jpeg_600):
+        """Test that display sizes are generated when a cover is stored."""
+        cache = CoverCache(tmp_path, max_bytes=10**7, max_entries=10)
+        with mock.patch.object(
+            cache, "_thumbnail_sizes", return_value=[64, 200, 600]
+        ):
+            original = cache.put("Artist_Title", jpeg_600)
+
+        small = cache.get("Artist_Title", size=50)
+        medium = cache.get("Artist_Title", size=200)
+        large = cache.get("Artist_Title", size=300)
+        assert small.endswith("_64.jpg")
+        assert medium.endswith("_200.jpg")
+        # No 600 rendition is needed, the original serves it
+        assert large == original
+        assert cache.get_thumbnail(original, 200) == medium
+        assert os.path.getsize(small) < os.path.getsize(original)
+
+        # Renditions count towards the budget and go with their image
+        _, total = cache.stats()
+        assert total > len(jpeg_600)
+        cache.remove("Artist_Title")
+        assert cache.stats() == (0, 0)
+        assert list(tmp_path.rglob("*.jpg")) == []
+
+    def test_lookups_do_not_wait_for_scaling(self, tmp_path):
+        """Test that the cache isn't locked while renditions are made."""
+        cache = CoverCache(tmp_path, max_bytes=10**7, max_entries=10)
+        other = cache.put("Other_Title", b"other")
+        seen = []
+
+        def make_thumbnails(data, sizes):
+            # Look up another cover from another thread, as the GUI would
+            lookup = threading.Thread(
+                target=lambda: seen.append(cache.get("Other_Title"))
+            )
+            lookup.start()
+            lookup.join(timeout=2)
+            return 64, {32: b"thumb"}
+
+        with mock.patch.object(
+            covercache.thumbnails, "is_available", return_value=True
+        ), mock.patch.object(
+            covercache.thumbnails, "make_thumbnails", make_thumbnails
+        ):
+            cache.put("Artist_Title", b"image")
+
+        assert seen == [other]
+        assert cache.get("Artist_Title", size=16).endswith("_32.jpg")
+        assert list(tmp_path.glob("*.tmp")) == []
+
+    def test_foreign_paths_unchanged(self, tmp_path):
+        """Test that covers outside the cache are returned as they are."""
+        cache = CoverCache(tmp_path, max_bytes=1000, max_entries=10)
+        assert cache.get_thumbnail("/music/album/cover.jpg", 64) == (
+            "/music/album/cover.jpg"
+        )
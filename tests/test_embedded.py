@@ -0,0 +1,215 @@
+"""Tests for embedded artwork extraction."""
+
+import struct
+from unittest import mock
+
+from dolboebify.utils import coverart
+from dolboebify.utils.embedded import (
+    read_album_tags,
+    read_embedded_picture,
+    read_tags,
+)
+
+
+def _synchsafe(value):
+    """Encode an ID3v2 synchsafe integer."""
+    return bytes((value >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def _id3_tag(frames, major=3):
+    """Build an ID3v2 tag from (frame id, payload) pairs."""
+    body = b""
+    for frame_id, payload in frames:
+        size = (
+            _synchsafe(len(payload))
+            if major == 4
+            else struct.pack(">I", len(payload))
+        )
+        body += frame_id + size + b"\x00\x00" + payload
+    body += b"\x00" * 16  # padding
+    return b"ID3" + bytes([major, 0, 0]) + _synchsafe(len(body)) + body
+
+
+def _apic(data, picture_type=3, mime=b"image/jpeg", encoding=0):
+    """Build an APIC frame payload."""
+    description = b"d\x00\x00\x00" if encoding == 1 else b"desc\x00"
+    return (
+        bytes([encoding])
+        + mime
+        + b"\x00"
+        + bytes([picture_type])
+        + description
+        + data
+    )
+
+
+def _atom(atom_type, payload):
+    """Build an MP4 atom."""
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+class TestEmbeddedArtwork:
+    """Tests for reading embedded pictures from tags."""
+
+    def test_id3v23_apic(self, tmp_path):
+        """Test reading an APIC frame and skipping other frames."""
+        path = tmp_path / "track.mp3"
+        tag = _id3_tag(
+            [(b"TIT2", b"\x00Title"), (b"APIC", _apic(b"JPEGDATA"))]
+        )
+        path.write_bytes(tag + b"\xff\xfb" * 1000)
+
+        assert read_embedded_picture(path) == (b"JPEGDATA", "image/jpeg")
+
+    def test_id3v24_prefers_front_cover(self, tmp_path):
+        """Test that the front cover wins over other picture types."""
+        path = tmp_path / "track.mp3"
+        tag = _id3_tag(
+            [
+                (b"APIC", _apic(b"BACK", picture_type=4)),
+                (b"APIC", _apic(b"FRONT", mime=b"image/png", encoding=1)),
+            ],
+            major=4,
+        )
+        path.write_bytes(tag)
+
+        assert read_embedded_picture(path) == (b"FRONT", "image/png")
+
+    def test_flac_picture(self, tmp_path):
+        """Test reading a FLAC PICTURE metadata block."""
+        mime = b"image/jpeg"
+        picture = (
+            struct.pack(">II", 3, len(mime))
+            + mime
+            + struct.pack(">I", 0)
+            + struct.pack(">IIII", 600, 600, 24, 0)
+            + struct.pack(">I", 8)
+            + b"FLACJPEG"
+        )
+        streaminfo = b"\x00" + (34).to_bytes(3, "big") + b"\x00" * 34
+        block = b"\x86" + len(picture).to_bytes(3, "big") + picture
+        path = tmp_path / "track.flac"
+        path.write_bytes(b"fLaC" + streaminfo + block + b"\x00" * 100)
+
+        assert read_embedded_picture(path) == (b"FLACJPEG", "image/jpeg")
+
+    def test_mp4_covr(self, tmp_path):
+        """Test reading the cover atom of an MP4 file after its mdat."""
+        data_atom = _atom(b"data", struct.pack(">II", 14, 0) + b"PNGDATA")
+        ilst = _atom(b"ilst", _atom(b"covr", data_atom))
+        meta = _atom(b"meta", b"\x00\x00\x00\x00" + ilst)
+        moov = _atom(b"moov", _atom(b"udta", meta))
+        path = tmp_path / "track.m4a"
+        path.write_bytes(
+            _atom(b"ftyp", b"M4A \x00\x00\x00\x00")
+            + _atom(b"mdat", b"\x00" * 4096)
+            + moov
+        )
+
+        assert read_embedded_picture(path) == (b"PNGDATA", "image/png")
+
+    def test_no_artwork(self, tmp_path):
+        """Test files without artwork or in unknown formats."""
+        tagged = tmp_path / "track.mp3"
+        tagged.write_bytes(_id3_tag([(b"TIT2", b"\x00Title")]))
+        plain = tmp_path / "track.wav"
+        plain.write_bytes(b"RIFF" + b"\x00" * 40)
+
+        assert read_embedded_picture(tagged) is None
+        assert read_embedded_picture(plain) is None
+        assert read_embedded_picture(tmp_path / "missing.mp3") is None
+
+    def test_get_embedded_cover_cached(self, tmp_path):
+        """Test that embedded art is extracted once into the cover cache."""
+        path = tmp_path / "track.mp3"
+        path.write_bytes(_id3_tag([(b"APIC", _apic(b"JPEGDATA"))]))
+
+        cover = coverart.get_embedded_cover(path)
+        with open(cover, "rb") as f:
+            assert f.read() == b"JPEGDATA"
+
+        with mock.patch.object(coverart, "read_embedded_picture") as mock_read:
+            assert coverart.get_embedded_cover(path) == cover
+            assert not mock_read.called
+
+
+class TestAlbumTags:
+    """Tests for reading album tags."""
+
+    def test_id3_album_artist_preferred(self, tmp_path):
+        """Test that the album artist wins over the track artist."""
+        path = tmp_path / "track.mp3"
+        path.write_bytes(
+            _id3_tag(
+                [
+                    (b"TPE1", b"\x00Guest"),
+                    (b"TALB", b"\x01" + "Альбом".encode("utf-16")),
+                    (b"TPE2", b"\x03Various Artists"),
+                    (b"APIC", _apic(b"JPEGDATA")),
+                ],
+                major=4,
+            )
+        )
+
+        assert read_album_tags(path) == ("Various Artists", "Альбом")
+
+    def test_flac_vorbis_comments(self, tmp_path):
+        """Test reading the album from FLAC Vorbis comments."""
+        comments = [b"ARTIST=Band", b"album=Record", b"TITLE=Song"]
+        payload = struct.pack("<I", 3) + b"ref" + struct.pack("<I", 3)
+        for comment in comments:
+            payload += struct.pack("<I", len(comment)) + comment
+        streaminfo = b"\x00" + (34).to_bytes(3, "big") + b"\x00" * 34
+        block = b"\x84" + len(payload).to_bytes(3, "big") + payload
+        path = tmp_path / "track.flac"
+        path.write_bytes(b"fLaC" + streaminfo + block)
+
+        assert read_album_tags(path) == ("Band", "Record")
+
+    def test_mp4_atoms(self, tmp_path):
+        """Test reading the album from MP4 ilst atoms."""
+
+        def text(value):
+            return _atom(b"data", struct.pack(">II", 1, 0) + value)
+
+        ilst = _atom(
+            b"ilst",
+            _atom(b"\xa9ART", text(b"Band")) + _atom(b"\xa9alb", text(b"LP")),
+        )
+        meta = _atom(b"meta", b"\x00\x00\x00\x00" + ilst)
+        path = tmp_path / "track.m4a"
+        path.write_bytes(
+            _atom(b"ftyp", b"M4A \x00\x00\x00\x00")
+            + _atom(b"moov", _atom(b"udta", meta))
+        )
+
+        assert read_album_tags(path) == ("Band", "LP")
+
+    def test_mp4_title_and_track_number(self, tmp_path):
+        """Test reading the title and the binary trkn atom."""
+
+        def data(type_indicator, value):
+            return _atom(
+                b"data", struct.pack(">II", type_indicator, 0) + value
+            )
+
+        ilst = _atom(
+            b"ilst",
+            _atom(b"\xa9nam", data(1, b"Song"))
+            + _atom(b"trkn", data(0, struct.pack(">HHHH", 0, 4, 10, 0))),
+        )
+        meta = _atom(b"meta", b"\x00\x00\x00\x00" + ilst)
+        path = tmp_path / "track.m4a"
+        path.write_bytes(
+            _atom(b"ftyp", b"M4A \x00\x00\x00\x00")
+            + _atom(b"moov", _atom(b"udta", meta))
+        )
+
+        assert read_tags(path) == {"title": "Song", "tracknumber": "4"}
+
+    def test_no_album(self, tmp_path):
+        """Test files without an album tag."""
+        path = tmp_path / "track.mp3"
+        path.write_bytes(_id3_tag([(b"TPE1", b"\x00Band")]))
+
+        assert read_album_tags(path) is None
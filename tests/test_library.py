@@ -0,0 +1,190 @@
+"""Tests for the persistent library index."""
+
+import os
+
+import pytest
+
+from dolboebify.utils import fileutils, library
+from dolboebify.utils.library import LibraryIndex, iter_library_files
+
+
+def _touch(path, data=b""):
+    """Create a file, with its parent folders."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def music(tmp_path):
+    """Create a small library: two albums and a stray text file."""
+    root = tmp_path / "music"
+    _touch(root / "Artist" / "Album 1" / "01.mp3")
+    _touch(root / "Artist" / "Album 1" / "02.mp3")
+    _touch(root / "Artist" / "Album 2" / "01.flac")
+    _touch(root / "Artist" / "notes.txt")
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Fixture to create an empty index."""
+    index = LibraryIndex(tmp_path / "index.sqlite3")
+    yield index
+    index.close()
+
+
+class TestLibraryIndex:
+    """Tests for LibraryIndex."""
+
+    def test_initial_scan(self, index, music):
+        """Test that the first scan indexes every audio file."""
+        scan = index.rescan(music)
+
+        assert len(scan.added) == 3
+        assert scan.total == 3 == len(index)
+        assert scan.folders_listed == scan.folders_checked == 4
+        assert index.has_root(music)
+        assert index.files(music) == [
+            str(music / "Artist" / "Album 1" / "01.mp3"),
+            str(music / "Artist" / "Album 1" / "02.mp3"),
+            str(music / "Artist" / "Album 2" / "01.flac"),
+        ]
+        assert index.files(music, {"flac"}) == [
+            str(music / "Artist" / "Album 2" / "01.flac")
+        ]
+
+    def test_unchanged_rescan_lists_nothing(self, index, music):
+        """Test that an unchanged tree is only stat'ed."""
+        index.rescan(music)
+        scan = index.rescan(music)
+
+        assert scan.folders_listed == 0
+        assert scan.folders_checked == 4
+        assert (scan.added, scan.modified, scan.removed) == ([], [], [])
+        assert scan.total == 3
+
+    def test_only_changed_folders_are_listed(self, index, music):
+        """Test that new files are found by listing just their folder."""
+        index.rescan(music)
+        new = _touch(music / "Artist" / "Album 2" / "02.flac")
+
+        scan = index.rescan(music)
+        assert scan.added == [new]
+        assert scan.folders_listed == 1
+
+    def test_replaced_file_is_modified(self, index, music):
+        """Test that a file replaced through a rename is re-indexed."""
+        index.rescan(music)
+        track = music / "Artist" / "Album 1" / "01.mp3"
+        _touch(track.with_suffix(".tmp"), b"new tags")
+        os.replace(track.with_suffix(".tmp"), track)
+
+        scan = index.rescan(music)
+        assert scan.modified == [str(track)]
+        assert index.get_file_info(track)["size"] == len(b"new tags")
+
+    def test_in_place_edit_needs_full_rescan(self, index, music):
+        """Test that files rewritten in place are caught by a full scan."""
+        index.rescan(music)
+        track = music / "Artist" / "Album 1" / "02.mp3"
+        folder = track.parent
+        folder_mtime = os.stat(folder).st_mtime_ns
+        track.write_bytes(b"rewritten")
+        os.utime(folder, ns=(folder_mtime, folder_mtime))
+
+        assert index.rescan(music).modified == []
+        assert index.rescan(music, full=True).modified == [str(track)]
+
+    def test_removed_folder(self, index, music):
+        """Test that a deleted folder removes its files from the index."""
+        index.rescan(music)
+        album = music / "Artist" / "Album 2"
+        os.remove(album / "01.flac")
+        os.rmdir(album)
+
+        scan = index.rescan(music)
+        assert scan.removed == [str(album / "01.flac")]
+        assert scan.total == 2
+        assert not index.has_root(album)
+
+    def test_symlink_loop(self, index, music):
+        """Test that a symlink loop is indexed once."""
+        os.symlink(music, music / "Artist" / "loop")
+        assert index.rescan(music).total == 3
+        assert index.rescan(music).total == 3
+
+    def test_missing_directory(self, index, tmp_path):
+        """Test that rescanning a missing folder raises."""
+        with pytest.raises(FileNotFoundError):
+            index.rescan(tmp_path / "missing")
+
+    def test_get_file_info(self, index, music):
+        """Test indexed file information."""
+        index.rescan(music)
+        info = index.get_file_info(music / "Artist" / "Album 2" / "01.flac")
+        assert info["name"] == "01.flac"
+        assert info["format"] == "flac"
+        assert info["size"] == 0
+        assert index.get_file_info(music / "Artist" / "notes.txt") is None
+
+
+class TestLibraryFiles:
+    """Tests for the shared index used by the backends."""
+
+    def test_fileutils_uses_index(self, music, isolated_library_index):
+        """Test that get_file_info answers indexed files from the index."""
+        track = music / "Artist" / "Album 1" / "01.mp3"
+        isolated_library_index.rescan(music)
+        os.remove(track)
+
+        assert fileutils.get_file_info(track)["path"] == str(track)
+        with pytest.raises(FileNotFoundError):
+            fileutils.get_file_info(music / "unindexed.mp3")
+
+    def test_iter_library_files(self, music, isolated_library_index):
+        """Test that a folder is indexed on first use, then served from it."""
+        assert not isolated_library_index.has_root(music)
+        first = list(iter_library_files(music, {"mp3", "flac"}))
+        assert isolated_library_index.has_root(music)
+
+        new = _touch(music / "Artist" / "Album 1" / "03.mp3")
+        second = list(iter_library_files(music, {"mp3", "flac"}))
+        assert second == sorted(first + [new])
+
+    def test_first_load_indexes_from_scan(self, music, isolated_library_index):
+        """Test that a new folder is indexed without walking it again."""
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(
+                isolated_library_index,
+                "rescan",
+                lambda *args, **kwargs: pytest.fail("second walk"),
+            )
+            first = list(iter_library_files(music, {"mp3", "flac"}))
+
+        assert isolated_library_index.files(music) == first
+        scan = isolated_library_index.rescan(music)
+        assert scan.folders_listed == 0
+        assert (scan.added, scan.modified, scan.removed) == ([], [], [])
+
+    def test_index_keeps_scan_order(self, tmp_path, isolated_library_index):
+        """Test that indexed files come in the scanner's order."""
+        root = tmp_path / "music"
+        expected = [
+            _touch(root / "A" / "1.mp3"),
+            _touch(root / "A" / "sub" / "2.mp3"),
+            _touch(root / "A-B" / "3.mp3"),
+        ]
+
+        first = list(iter_library_files(root, {"mp3"}))
+        second = list(iter_library_files(root, {"mp3"}))
+        assert first == second == expected
+
+    def test_index_disabled(self, music):
+        """Test that the library.index setting turns the index off."""
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(
+                library, "get_setting", lambda section, key, default: False
+            )
+            assert len(list(iter_library_files(music, {"mp3"}))) == 2
+        assert len(library.get_library_index()) == 0
@@ -0,0 +1,93 @@
+"""Tests for the stand-in provider server and the load-test driver."""
+
+import pytest
+
+from dolboebify.utils import coverart
+from dolboebify.utils.fakeprovider import FakeProviderServer
+from dolboebify.utils.loadtest import (
+    format_results,
+    isolated_environment,
+    percentile,
+    run_load_test,
+)
+
+
+@pytest.fixture
+def server():
+    """Run a stand-in provider server for one test."""
+    with FakeProviderServer(image_size=32, seed=1) as server:
+        yield server
+
+
+def _settings(server, **overrides):
+    """Build cover-art settings pointing at the stand-in server."""
+    settings = {
+        "lookup_mode": "sequential",
+        "provider_urls": server.urls,
+        "provider_rates": {},
+    }
+    settings.update(overrides)
+    return {"cover_art": settings}
+
+
+def _image_name(server, term):
+    """Get the name of the 600px iTunes image served for a search term."""
+    data = server.itunes_search("", {"term": term})
+    url = data["results"][0]["artworkUrl100"].replace("100x100", "600x600")
+    return url.split("/images/", 1)[1]
+
+
+class TestFakeProviderServer:
+    """Tests for lookups against the stand-in provider server."""
+
+    def test_lookup_through_server(self, server):
+        """Test a full lookup against the stand-in iTunes API."""
+        with isolated_environment(_settings(server)):
+            cover = coverart.fetch_cover_art("Artist - Title.mp3")
+            assert cover is not None
+            with open(cover, "rb") as f:
+                assert f.read() == server.image(
+                    _image_name(server, "Artist Title")
+                )
+
+        assert server.requests == {"itunes": 1, "images": 1}
+
+    def test_unknown_track_falls_back_to_lastfm(self, server):
+        """Test that iTunes misses are looked up on Last.fm."""
+        server.miss_rate = 1.0
+        with isolated_environment(_settings(server)):
+            assert coverart.fetch_cover_art("Artist - Title.mp3") is None
+            assert coverart.is_fetch_recently_failed("Artist", "Title")
+
+        assert server.requests == {"itunes": 1, "lastfm": 2}
+
+    def test_throttled_server_not_recorded_as_miss(self, server):
+        """Test that 429 replies defer the lookup instead of failing it."""
+        server.throttle_rate = 1.0
+        server.retry_after = 0.01
+        with isolated_environment(_settings(server, throttle_retries=1)):
+            assert coverart.fetch_cover_art("Artist - Title.mp3") is None
+            assert not coverart.is_fetch_recently_failed("Artist", "Title")
+
+        assert server.requests == {"itunes": 2, "lastfm": 2}
+
+
+class TestLoadTest:
+    """Tests for the load-test driver."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([3.0], 0.99) == 3.0
+        assert percentile([], 0.5) == 0.0
+
+    def test_run_load_test(self, server):
+        """Test that each concurrency level is measured."""
+        results = run_load_test(server, [1, 4], lookups=8)
+
+        assert [r.concurrency for r in results] == [1, 4]
+        assert all(r.found == 8 for r in results)
+        assert all(r.p50 <= r.p99 for r in results)
+        assert "lookups/s" in format_results(results)
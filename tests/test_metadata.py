@@ -0,0 +1,242 @@
+"""Tests for track metadata extraction and its cache."""
+
+import os
+import struct
+import threading
+from unittest import mock
+
+from dolboebify.utils import metadata
+from dolboebify.utils.metadata import (
+    TrackMetadata,
+    extract_metadata,
+    read_duration,
+    read_metadata,
+)
+
+# MPEG-1 layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames
+_MP3_HEADER = b"\xff\xfb\x90\x00"
+_MP3_FRAME = _MP3_HEADER + b"\x00" * 413
+
+
+def _id3_tag(frames):
+    """Build an ID3v2.3 tag from (frame id, text) pairs."""
+    body = b""
+    for frame_id, text in frames:
+        payload = b"\x03" + text.encode("utf-8")
+        body += frame_id + struct.pack(">I", len(payload)) + b"\x00\x00"
+        body += payload
+    size = bytes((len(body) >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x03\x00\x00" + size + body
+
+
+def _ogg_page(packet_data, granule=0, sequence=0, header_type=0):
+    """Build an Ogg page holding one complete packet."""
+    lacing = bytes([255] * (len(packet_data) // 255))
+    lacing += bytes([len(packet_data) % 255])
+    return (
+        b"OggS\x00"
+        + bytes([header_type])
+        + struct.pack("<qIII", granule, 1, sequence, 0)
+        + bytes([len(lacing)])
+        + lacing
+        + packet_data
+    )
+
+
+def _vorbis_comments(comments):
+    """Build a Vorbis comment structure."""
+    data = struct.pack("<I", 3) + b"ref" + struct.pack("<I", len(comments))
+    for comment in comments:
+        data += struct.pack("<I", len(comment)) + comment
+    return data
+
+
+def _atom(atom_type, payload):
+    """Build an MP4 atom."""
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+class TestReadDuration:
+    """Tests for durations from stream headers."""
+
+    def test_mp3_constant_bitrate(self, tmp_path):
+        """Test that a CBR stream's duration follows from its size."""
+        path = tmp_path / "track.mp3"
+        path.write_bytes(_id3_tag([(b"TIT2", "Song")]) + _MP3_FRAME * 100)
+
+        # 100 frames of 417 bytes at 128 kbps
+        assert read_duration(path) == 2606
+
+    def test_mp3_xing_frame_count(self, tmp_path):
+        """Test that a Xing/Info header's frame count is used."""
+        info = b"Info" + struct.pack(">II", 1, 1000)
+        first = _MP3_HEADER + b"\x00" * 32 + info
+        first += b"\x00" * (417 - len(first))
+        path = tmp_path / "track.mp3"
+        path.write_bytes(first + _MP3_FRAME * 10)
+
+        # 1000 frames of 1152 samples at 44.1 kHz
+        assert read_duration(path) == 26122
+
+    def test_flac_streaminfo(self, tmp_path):
+        """Test reading the sample count from FLAC's STREAMINFO."""
+        fields = (44100 << 44) | (1 << 41) | (15 << 36) | 441000
+        streaminfo = b"\x00" * 10 + fields.to_bytes(8, "big") + b"\x00" * 16
+        path = tmp_path / "track.flac"
+        path.write_bytes(b"fLaC\x80\x00\x00\x22" + streaminfo)
+
+        assert read_duration(path) == 10000
+
+    def test_mp4_mvhd(self, tmp_path):
+        """Test reading the movie header's timescale and duration."""
+        mvhd = _atom(b"mvhd", struct.pack(">IIIII", 0, 0, 0, 1000, 5000))
+        path = tmp_path / "track.m4a"
+        path.write_bytes(
+            _atom(b"ftyp", b"M4A \x00\x00\x00\x00")
+            + _atom(b"free", b"\x00" * 16)
+            + _atom(b"moov", mvhd)
+        )
+
+        assert read_duration(path) == 5000
+
+    def test_ogg_opus(self, tmp_path):
+        """Test the last granule position, less the Opus pre-skip."""
+        head = b"OpusHead\x01\x02" + struct.pack("<HIhB", 312, 48000, 0, 0)
+        path = tmp_path / "track.opus"
+        path.write_bytes(
+            _ogg_page(head, header_type=2)
+            + _ogg_page(b"OpusTags" + _vorbis_comments([]), sequence=1)
+            + _ogg_page(b"\x00" * 300, granule=3 * 48000 + 312, sequence=2)
+        )
+
+        assert read_duration(path) == 3000
+
+    def test_wav(self, tmp_path):
+        """Test the data size divided by the byte rate."""
+        fmt = struct.pack("<HHIIHH", 1, 2, 44100, 176400, 4, 16)
+        path = tmp_path / "track.wav"
+        path.write_bytes(
+            b"RIFF\x00\x00\x00\x00WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", 2 * 176400)
+        )  # fmt: skip
+
+        assert read_duration(path) == 2000
+
+    def test_unrecognised_file(self, tmp_path):
+        """Test files that aren't audio streams."""
+        path = tmp_path / "notes.mp3"
+        path.write_bytes(b"just some text")
+
+        assert read_duration(path) is None
+        assert read_duration(tmp_path / "missing.mp3") is None
+
+
+class TestReadMetadata:
+    """Tests for combined tags and duration."""
+
+    def test_id3_tags(self, tmp_path):
+        """Test that the tags and the duration are read together."""
+        path = tmp_path / "track.mp3"
+        tag = _id3_tag(
+            [
+                (b"TIT2", "Song"),
+                (b"TPE2", "Various"),
+                (b"TALB", "Album"),
+                (b"TRCK", "03/12"),
+            ]
+        )
+        path.write_bytes(tag + _MP3_FRAME * 100)
+
+        assert read_metadata(path) == TrackMetadata(
+            title="Song",
+            artist="Various",
+            album="Album",
+            track_number=3,
+            duration=2606,
+        )
+
+    def test_ogg_vorbis_comments(self, tmp_path):
+        """Test reading the comment packet of an Ogg stream."""
+        head = b"\x01vorbis" + struct.pack("<IBI", 0, 2, 44100) + b"\x00" * 14
+        comments = [b"TITLE=Song", b"ARTIST=Band", b"TRACKNUMBER=7"]
+        path = tmp_path / "track.ogg"
+        path.write_bytes(
+            _ogg_page(head, header_type=2)
+            + _ogg_page(b"\x03vorbis" + _vorbis_comments(comments), sequence=1)
+            + _ogg_page(b"\x00" * 10, granule=44100, sequence=2)
+        )
+
+        assert read_metadata(path) == TrackMetadata(
+            title="Song", artist="Band", track_number=7, duration=1000
+        )
+
+
+class TestExtractMetadata:
+    """Tests for cached, parallel extraction."""
+
+    def _write_tracks(self, tmp_path, count):
+        paths = []
+        for number in range(count):
+            path = tmp_path / f"{number}.mp3"
+            tag = _id3_tag([(b"TIT2", f"Song {number}")])
+            path.write_bytes(tag + _MP3_FRAME * 10)
+            paths.append(str(path))
+        return paths
+
+    def test_results_are_cached(self, tmp_path, isolated_metadata_cache):
+        """Test that unchanged files are only read once."""
+        paths = self._write_tracks(tmp_path, 3)
+
+        first = dict(extract_metadata(paths, workers=1))
+        assert first[paths[1]].title == "Song 1"
+        assert len(isolated_metadata_cache) == 3
+
+        with mock.patch.object(metadata, "read_metadata") as read:
+            assert dict(extract_metadata(paths, workers=1)) == first
+        read.assert_not_called()
+
+    def test_changed_file_is_read_again(self, tmp_path):
+        """Test that a new size or mtime invalidates the cached entry."""
+        (path,) = self._write_tracks(tmp_path, 1)
+        list(extract_metadata([path], workers=1))
+
+        with open(path, "r+b") as f:
+            f.write(_id3_tag([(b"TIT2", "Other")]))
+        os.utime(path, ns=(0, 0))
+
+        assert dict(extract_metadata([path], workers=1))[path].title == (
+            "Other"
+        )
+
+    def test_missing_files_are_skipped(self, tmp_path):
+        """Test that paths that don't exist yield nothing."""
+        assert list(extract_metadata([tmp_path / "missing.mp3"])) == []
+
+    def test_cancel_stops_early(self, tmp_path):
+        """Test that setting the cancel event stops the file stat pass."""
+        paths = self._write_tracks(tmp_path, 3)
+        cancel = threading.Event()
+
+        def given():
+            yield paths[0]
+            cancel.set()
+            yield from paths[1:]
+
+        with mock.patch.object(metadata, "read_metadata") as read:
+            results = list(
+                extract_metadata(given(), workers=1, cancel=cancel)
+            )
+
+        assert results == []
+        read.assert_not_called()
+
+    def test_worker_processes(self, tmp_path):
+        """Test that reading in worker processes gives the same results."""
+        paths = self._write_tracks(tmp_path, 5)
+
+        with mock.patch.object(metadata, "MIN_PARALLEL_FILES", 0):
+            with mock.patch.object(metadata, "METADATA_BATCH_SIZE", 2):
+                results = dict(extract_metadata(paths, workers=2))
+
+        assert results == {path: read_metadata(path) for path in paths}
@@ -1,11 +1,17 @@
 """Tests for the Player class."""
 
+import struct
+import threading
+from pathlib import Path
 from unittest import mock
 
 import pytest
+import vlc
 
 from dolboebify.core import Player
+from dolboebify.core.playlist import Track
 from dolboebify.utils.exceptions import AudioFormatNotSupportedError
+from dolboebify.utils.watcher import LibraryDelta
 
 
 class TestPlayer:
@@ -86,3 +92,383 @@ class TestPlayer:
         player.clear_playlist()
         assert player.playlist == []
         assert player.current_index == -1
+
+
+class TestAsyncParsing:
+    """Tests for background media parsing."""
+
+    @pytest.fixture
+    def player(self, tmp_path):
+        """Fixture to create a Player with a three-track playlist."""
+        with mock.patch("vlc.Instance") as instance:
+            media = instance.return_value.media_new.return_value
+            media.parse_with_options.return_value = 0
+            media.get_duration.return_value = 180000
+            player = Player(preparse_ahead=2)
+            player.media_player.get_length.return_value = -1
+            for name in ("a.mp3", "b.mp3", "c.mp3"):
+                track = tmp_path / name
+                track.write_bytes(b"")
+                player.add_to_playlist(track)
+            yield player
+
+    def test_load_does_not_block_on_parsing(self, player):
+        """Test that load starts a parse instead of parsing synchronously."""
+        player.load(player.playlist[0]["path"])
+
+        media = player.current_media
+        media.parse.assert_not_called()
+        media.parse_with_options.assert_called()
+        assert player.duration == 0
+
+    def test_duration_known_after_parse_event(self, player):
+        """Test that the parsed duration is picked up after the event."""
+        player.load(player.playlist[0]["path"])
+        for parse_id in list(player._parsing):
+            player._on_media_parsed(None, parse_id)
+
+        assert player.duration == 180000
+        assert player._parsing == {}
+
+    def test_duration_falls_back_to_stream_length(self, player):
+        """Test that the playing stream's length is used before parsing."""
+        player.media_player.get_length.return_value = 90000
+        player.load(player.playlist[0]["path"])
+        assert player.duration == 90000
+
+    def test_preparse_upcoming(self, player):
+        """Test that the next playlist entries are parsed ahead of time."""
+        player.load(player.playlist[0]["path"])
+        parsed = {entry[0] for entry in player._parsing.values()}
+        assert parsed == {
+            str(Path(track["path"]).absolute()) for track in player.playlist
+        }
+
+        for parse_id in list(player._parsing):
+            player._on_media_parsed(None, parse_id)
+        assert player.get_track_duration(player.playlist[2]["path"]) == 180000
+
+        # A parsed track is loaded with its duration, without a new parse
+        parses = player.current_media.parse_with_options.call_count
+        player.current_index = 1
+        player.load(player.playlist[1]["path"])
+        assert player._duration == 180000
+        assert player.current_media.parse_with_options.call_count == parses
+
+    def test_preparse_disabled(self, player):
+        """Test that preparse_ahead=0 only parses the loaded track."""
+        player.preparse_ahead = 0
+        player.load(player.playlist[0]["path"])
+        assert len(player._parsing) == 1
+
+
+def _vlc_event(**fields):
+    """Build a stand-in for a libVLC event carrying ``fields`` in ``u``."""
+    return mock.Mock(u=mock.Mock(**fields))
+
+
+class TestPlayerEvents:
+    """Tests for player event notifications."""
+
+    @pytest.fixture
+    def player(self, tmp_path):
+        """Fixture to create a Player with a two-track playlist."""
+        with mock.patch("vlc.Instance"):
+            player = Player(preparse_ahead=0)
+            for name in ("a.mp3", "b.mp3"):
+                track = tmp_path / name
+                track.write_bytes(b"")
+                player.add_to_playlist(track)
+            yield player
+            player.close()
+
+    def _collect(self, player, event):
+        """Register a listener recording arguments; returns the list."""
+        received = []
+        delivered = threading.Event()
+
+        def listener(argument):
+            received.append(argument)
+            delivered.set()
+
+        player.add_listener(event, listener)
+        return received, delivered
+
+    def test_subscribes_to_vlc_events(self, player):
+        """Test that the media player's libVLC events are attached."""
+        events = player.media_player.event_manager.return_value
+        attached = {c.args[0] for c in events.event_attach.call_args_list}
+        assert vlc.EventType.MediaPlayerEndReached in attached
+        assert vlc.EventType.MediaPlayerTimeChanged in attached
+
+    def test_end_reached_reports_track(self, player):
+        """Test that end_reached is delivered with the finished track."""
+        received, delivered = self._collect(player, "end_reached")
+        player.load(player.playlist[0]["path"])
+
+        player._on_vlc_event(_vlc_event(), "end_reached")
+        assert delivered.wait(2)
+        assert received == [str(Path(player.playlist[0]["path"]).absolute())]
+
+    def test_time_changed_is_throttled(self, player):
+        """Test that bursts of time changes are coalesced."""
+        received, delivered = self._collect(player, "time_changed")
+        for ms in range(0, 1000, 10):
+            player._on_vlc_event(_vlc_event(new_time=ms), "time_changed")
+
+        assert delivered.wait(2)
+        player._events.close()
+        assert received == [0]
+
+    def test_length_changed_updates_duration(self, player):
+        """Test that the stream length becomes the track duration."""
+        player._on_vlc_event(_vlc_event(new_length=215000), "length_changed")
+        assert player._duration == 215000
+
+    def test_listener_can_advance_track(self, player):
+        """Test that listeners may call back into the player."""
+        player.play = mock.MagicMock(return_value=True)
+        advanced = threading.Event()
+
+        def on_end(path):
+            player.next_track()
+            advanced.set()
+
+        player.add_listener("end_reached", on_end)
+        player._on_vlc_event(_vlc_event(), "end_reached")
+
+        assert advanced.wait(2)
+        assert player.current_index == 1
+        player.play.assert_called_once_with(player.playlist[1]["path"])
+
+    def test_failing_listener_does_not_stop_delivery(self, player):
+        """Test that an exception in one listener doesn't affect others."""
+        player.add_listener("error", mock.MagicMock(side_effect=RuntimeError))
+        received, delivered = self._collect(player, "error")
+
+        player._on_vlc_event(_vlc_event(), "error")
+        assert delivered.wait(2)
+        assert len(received) == 1
+
+    def test_remove_listener(self, player):
+        """Test unregistering listeners."""
+        listener = mock.MagicMock()
+        player.add_listener("buffering", listener)
+
+        assert player.remove_listener("buffering", listener) is True
+        assert player.remove_listener("buffering", listener) is False
+        player._on_vlc_event(_vlc_event(new_cache=50.0), "buffering")
+        player._events.close()
+        listener.assert_not_called()
+
+    def test_unknown_event(self, player):
+        """Test that registering for an unknown event fails."""
+        with pytest.raises(ValueError):
+            player.add_listener("nonexistent", mock.MagicMock())
+
+
+class TestGaplessPlayback:
+    """Tests for gapless playback on a standby player."""
+
+    @pytest.fixture
+    def player(self, tmp_path):
+        """Fixture to create a gapless Player with a three-track playlist."""
+        with mock.patch("vlc.Instance") as instance:
+            instance.return_value.media_player_new.side_effect = (
+                lambda: mock.MagicMock(name="media_player")
+            )
+            instance.return_value.media_new.side_effect = (
+                lambda path: mock.MagicMock(name=path)
+            )
+            player = Player(preparse_ahead=0, gapless=True)
+            for name in ("a.mp3", "b.mp3", "c.mp3"):
+                track = tmp_path / name
+                track.write_bytes(b"")
+                player.add_to_playlist(track)
+            yield player
+            player.close()
+
+    def _path(self, player, index):
+        """Get the absolute path of a playlist entry."""
+        return str(Path(player.playlist[index]["path"]).absolute())
+
+    def test_next_track_is_opened_on_standby(self, player):
+        """Test that loading a track opens the next one, paused and muted."""
+        player.load(player.playlist[0]["path"])
+
+        standby = player._standby
+        assert standby is not player.media_player
+        assert player._standby_path == self._path(player, 1)
+        player._standby_media.add_option.assert_called_with(":start-paused")
+        standby.audio_set_volume.assert_called_with(0)
+        standby.set_media.assert_called_once_with(player._standby_media)
+        standby.play.assert_called_once()
+
+    def test_handover_reuses_standby(self, player):
+        """Test that next_track switches players without opening files."""
+        player.load(player.playlist[0]["path"])
+        first, standby = player.media_player, player._standby
+        media_new = player.instance.media_new
+
+        media_new.reset_mock()
+        assert player.next_track() is True
+
+        assert player.media_player is standby
+        assert player.current_index == 1
+        standby.set_pause.assert_called_once_with(0)
+        standby.audio_set_volume.assert_called_with(player.volume)
+        standby.play.assert_called_once()
+        first.stop.assert_called()
+
+        # The previous player now holds the track after
+        assert player._standby is first
+        assert player._standby_path == self._path(player, 2)
+        media_new.assert_called_once_with(self._path(player, 2))
+
+    def test_end_reached_advances(self, player):
+        """Test that the end of a track starts the next one."""
+        changed = threading.Event()
+        received = []
+
+        def on_changed(path):
+            received.append(path)
+            changed.set()
+
+        player.add_listener("media_changed", on_changed)
+        player.load(player.playlist[0]["path"])
+        standby = player._standby
+        player._on_vlc_event(_vlc_event(), "end_reached", player.media_player)
+
+        assert changed.wait(2)
+        assert received == [self._path(player, 1)]
+        assert player.media_player is standby
+
+    def test_standby_events_are_ignored(self, player):
+        """Test that the standby player's events are not reported."""
+        player.load(player.playlist[0]["path"])
+        listener = mock.MagicMock()
+        player.add_listener("end_reached", listener)
+
+        player._on_vlc_event(_vlc_event(), "end_reached", player._standby)
+        player._events.close()
+
+        listener.assert_not_called()
+        assert player.current_index == 0
+
+    def test_no_standby_after_last_track(self, player):
+        """Test that the last track leaves the standby player idle."""
+        player.current_index = 2
+        player.load(player.playlist[2]["path"])
+        assert player._standby_path is None
+        assert player.next_track() is False
+
+    def test_library_change_moves_standby(self, player):
+        """Test that removing the next entry re-opens the standby."""
+        player.load(player.playlist[0]["path"])
+        removed = self._path(player, 1)
+
+        player._apply_library_delta(
+            LibraryDelta(added=[], removed=[removed], modified=[], moved=[])
+        )
+        assert player.current_index == 0
+        assert player._standby_path == self._path(player, 1)
+        assert player._standby_path != removed
+
+    def test_disabling_releases_standby(self, player):
+        """Test that turning gapless off releases the standby player."""
+        player.load(player.playlist[0]["path"])
+        standby = player._standby
+
+        player.gapless = False
+        standby.release.assert_called_once()
+        assert player._standby is None
+
+
+class TestLoadPlaylist:
+    """Tests for loading a directory into the playlist."""
+
+    @pytest.fixture
+    def player(self):
+        """Fixture to create a Player instance."""
+        with mock.patch("vlc.Instance"):
+            player = Player(preparse_ahead=0, gapless=False)
+            yield player
+            player.close()
+
+    def test_load_playlist(self, player, tmp_path):
+        """Test that supported files are added in scan order."""
+        for name in ("b/2.mp3", "a.flac", "notes.txt"):
+            path = tmp_path / name
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(b"")
+
+        assert player.load_playlist(tmp_path) == 2
+        assert [t.title for t in player.playlist] == ["a", "2"]
+        assert player.current_index == 0
+        assert player.current_media is None
+
+    def test_load_playlist_play_first(self, player, tmp_path):
+        """Test that play_first starts the first track found."""
+        (tmp_path / "a.mp3").write_bytes(b"")
+        player.play = mock.MagicMock(return_value=True)
+
+        assert player.load_playlist(tmp_path, play_first=True) == 1
+        player.play.assert_called_once_with(str(tmp_path / "a.mp3"))
+
+    def test_load_missing_directory(self, player, tmp_path):
+        """Test that a missing directory adds nothing."""
+        assert player.load_playlist(tmp_path / "missing") == 0
+
+    def test_load_metadata(self, player, tmp_path):
+        """Test that tags and durations are filled in after loading."""
+        path = tmp_path / "a.mp3"
+        # An ID3v2.3 title frame, then 100 MPEG-1 layer III frames
+        title = b"TIT2" + struct.pack(">I", 5) + b"\x00\x00\x03Song"
+        path.write_bytes(
+            b"ID3\x03\x00\x00\x00\x00\x00" + bytes([len(title)]) + title
+            + (b"\xff\xfb\x90\x00" + b"\x00" * 413) * 100
+        )  # fmt: skip
+        changed = threading.Event()
+        player.add_listener("metadata_changed", lambda paths: changed.set())
+
+        player.load_playlist(tmp_path)
+
+        assert changed.wait(5)
+        assert player.playlist[0].title == "Song"
+        assert player.get_track_duration(path) == 2606
+
+    def test_load_metadata_skips_known_tracks(self, player, tmp_path):
+        """Test that only tracks without metadata are read."""
+        player.playlist.append(Track(tmp_path / "a.mp3"))
+        player.playlist[0].duration = 1000
+
+        assert player.load_metadata(wait=True) == 0
+
+    def test_modified_files_are_read_again(self, player, tmp_path):
+        """Test that rewritten files lose their stale metadata."""
+        path = tmp_path / "a.mp3"
+        path.write_bytes(b"")
+        player.add_to_playlist(path)
+        player.playlist[0].duration = 1000
+        player.load_metadata = mock.MagicMock()
+
+        player._apply_library_delta(
+            LibraryDelta(added=[], removed=[], modified=[str(path)], moved=[])
+        )
+        assert player.playlist[0].duration is None
+        player.load_metadata.assert_called_once()
+
+    def test_watch_library(self, player, tmp_path):
+        """Test that files added to a watched directory join the playlist."""
+        (tmp_path / "a.mp3").write_bytes(b"")
+        player.load_playlist(tmp_path)
+        changed = threading.Event()
+        player.add_listener("library_changed", lambda delta: changed.set())
+
+        player.watch_library(tmp_path)
+        (tmp_path / "b.mp3").write_bytes(b"")
+
+        # Allow for a polling fallback where inotify is unavailable
+        assert changed.wait(10)
+        assert [t.title for t in player.playlist] == ["a", "b"]
+        player.unwatch_library()
@@ -0,0 +1,214 @@
+"""Tests for playlist tracks and the path index."""
+
+import os
+import threading
+
+import pytest
+
+from dolboebify.core.playlist import Playlist, Track, normalize_track_path
+from dolboebify.utils.metadata import TrackMetadata
+
+
+class TestTrack:
+    """Tests for Track."""
+
+    def test_fields(self):
+        """Test that a track keeps its path and derives the rest."""
+        track = Track("music/Artist - Title.mp3")
+        assert track.path == "music/Artist - Title.mp3"
+        assert track.title == "Artist - Title"
+        assert track.absolute_path == os.path.abspath(track.path)
+        assert track.image is None
+
+    def test_has_no_instance_dict(self):
+        """Test that tracks are slotted."""
+        assert not hasattr(Track("a.mp3"), "__dict__")
+
+    def test_mapping_access(self):
+        """Test the dict-style access the playlist entries used to have."""
+        track = Track("a.mp3")
+        assert track["path"] == "a.mp3"
+        assert "image" not in track
+        assert track.get("image") is None
+        with pytest.raises(KeyError):
+            track["image"]
+
+        track["image"] = "/covers/a.jpg"
+        assert "image" in track
+        assert track.to_dict() == {
+            "path": "a.mp3",
+            "title": "a",
+            "image": "/covers/a.jpg",
+        }
+
+        del track["image"]
+        assert track.image is None
+        with pytest.raises(KeyError):
+            track["path"] = "b.mp3"
+
+    def test_restore(self):
+        """Test recreating a saved track as it was."""
+        track = Track("a.mp3")
+        track.apply_metadata(TrackMetadata(artist="Band", duration=1000))
+
+        restored = Track.restore(
+            track.path, track.absolute_path, "a", "Band", duration=1000
+        )
+        assert restored == track
+        assert restored.absolute_path == track.absolute_path
+
+    def test_apply_metadata(self):
+        """Test that known metadata fields replace the defaults."""
+        track = Track("01 - song.mp3")
+        track.apply_metadata(
+            TrackMetadata(artist="Band", track_number=1, duration=61000)
+        )
+        assert track.title == "01 - song"
+        assert track["artist"] == "Band"
+        assert track.duration == 61000
+        assert "album" not in track
+
+        track.apply_metadata(TrackMetadata(title="Song"))
+        assert track.title == "Song"
+        assert track.artist == "Band"
+
+    def test_renamed(self):
+        """Test that a moved file's entry keeps its image and metadata."""
+        track = Track("a.mp3", image="/covers/a.jpg")
+        track.apply_metadata(TrackMetadata(album="LP", duration=1000))
+
+        renamed = track.renamed("b.mp3")
+        assert renamed.to_dict() == {
+            "path": "b.mp3",
+            "title": "b",
+            "image": "/covers/a.jpg",
+            "album": "LP",
+            "duration": 1000,
+        }
+
+        track.title = "Tagged"
+        assert track.renamed("c.mp3").title == "Tagged"
+
+
+class TestPlaylist:
+    """Tests for Playlist."""
+
+    def test_list_behaviour(self):
+        """Test that a playlist behaves like a list of tracks."""
+        playlist = Playlist([Track("a.mp3"), Track("b.mp3")])
+        assert len(playlist) == 2
+        assert playlist[1].path == "b.mp3"
+        assert [t.path for t in playlist[0:1]] == ["a.mp3"]
+        assert [t.path for t in playlist] == ["a.mp3", "b.mp3"]
+        assert playlist != []
+
+        playlist.clear()
+        assert playlist == []
+        assert not playlist
+
+    def test_lookup_by_path(self, tmp_path):
+        """Test that paths are found in any equivalent spelling."""
+        track = tmp_path / "a.mp3"
+        playlist = Playlist([Track(track), Track(tmp_path / "b.mp3")])
+
+        assert playlist.index_of(track) == 0
+        assert playlist.index_of(tmp_path / "sub" / ".." / "a.mp3") == 0
+        assert playlist.index_of(tmp_path / "missing.mp3") is None
+        assert str(track) in playlist
+        assert playlist.find(tmp_path / "b.mp3") == [playlist[1]]
+
+    def test_duplicates(self):
+        """Test that every position of a repeated path is indexed."""
+        playlist = Playlist([Track("a.mp3"), Track("b.mp3"), Track("a.mp3")])
+        assert playlist.indices("a.mp3") == [0, 2]
+        assert playlist.index_of("a.mp3") == 0
+
+        assert playlist.set_image("a.mp3", "/covers/a.jpg") == 2
+        assert playlist[0].image == playlist[2].image == "/covers/a.jpg"
+        assert playlist[1].image is None
+
+        assert playlist.set_image("a.mp3", None) == 2
+        assert "image" not in playlist[2]
+
+    def test_normalize_track_path(self, tmp_path):
+        """Test that normalization makes paths absolute and canonical."""
+        assert normalize_track_path(tmp_path / "x" / ".." / "a.mp3") == str(
+            tmp_path / "a.mp3"
+        )
+
+    def test_apply_changes(self):
+        """Test applying added, removed and moved files."""
+        playlist = Playlist([Track("a.mp3"), Track("b.mp3"), Track("c.mp3")])
+        playlist[1].image = "/covers/b.jpg"
+
+        current = playlist.apply_changes(
+            added=[Track("d.mp3")],
+            removed=["a.mp3"],
+            moved=[("b.mp3", "B.mp3")],
+            current=1,
+        )
+        assert [t.path for t in playlist] == ["B.mp3", "c.mp3", "d.mp3"]
+        assert playlist.index_of("B.mp3") == 0
+        assert playlist.index_of("b.mp3") is None
+        assert playlist[0].image == "/covers/b.jpg"
+        assert current == 0
+
+    def test_apply_metadata(self):
+        """Test filling in the metadata of every entry of a path."""
+        playlist = Playlist([Track("a.mp3"), Track("b.mp3"), Track("a.mp3")])
+        metadata = TrackMetadata(title="A", duration=1000)
+
+        assert playlist.apply_metadata([("a.mp3", metadata)]) == 2
+        assert [t.title for t in playlist] == ["A", "b", "A"]
+        assert playlist[1].duration is None
+
+    def test_revision(self):
+        """Test that only removals and moves change the revision."""
+        playlist = Playlist([Track("a.mp3")])
+        revision = playlist.revision
+        playlist.append(Track("b.mp3"))
+        playlist.apply_changes(added=[Track("c.mp3")])
+        assert playlist.revision == revision
+
+        playlist.apply_changes(moved=[("a.mp3", "A.mp3")])
+        assert playlist.revision == revision + 1
+        playlist.clear()
+        assert playlist.revision == revision + 2
+
+    def test_apply_changes_current_removed(self):
+        """Test that removing the current entry moves to the next one."""
+        playlist = Playlist([Track("a.mp3"), Track("b.mp3"), Track("c.mp3")])
+        assert playlist.apply_changes(removed=["b.mp3"], current=1) == 1
+        assert playlist.apply_changes(removed=["c.mp3"], current=1) == 0
+        assert playlist.apply_changes(removed=["a.mp3"], current=0) == -1
+
+    def test_lookups_during_changes(self):
+        """Test that lookups from another thread see a consistent state."""
+        names = [f"{i}.mp3" for i in range(200)]
+        playlist = Playlist(Track(name) for name in names)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    for name in ("0.mp3", "150.mp3", "new.mp3"):
+                        for track in playlist.find(name):
+                            assert track.path == name
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for _ in range(200):
+                playlist.apply_changes(
+                    added=[Track("new.mp3")], removed=["1.mp3", "new.mp3"]
+                )
+                playlist.apply_changes(added=[Track("1.mp3")])
+        finally:
+            done.set()
+            reader.join()
+
+        assert errors == []
@@ -0,0 +1,110 @@
+"""Tests for the music folder scanner."""
+
+import os
+
+import pytest
+
+from dolboebify.utils.fileutils import get_audio_files, iter_audio_files
+from dolboebify.utils.scanner import scan_audio_files
+
+
+def _touch(path):
+    """Create an empty file, with its parent folders."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return str(path)
+
+
+class TestScanAudioFiles:
+    """Tests for scan_audio_files."""
+
+    def test_depth_first_name_order(self, tmp_path):
+        """Test that files come folder by folder, in name order."""
+        expected = [
+            _touch(tmp_path / "a.mp3"),
+            _touch(tmp_path / "b.flac"),
+            _touch(tmp_path / "A" / "1.mp3"),
+            _touch(tmp_path / "A" / "sub" / "2.mp3"),
+            _touch(tmp_path / "B" / "3.mp3"),
+        ]
+        _touch(tmp_path / "cover.jpg")
+
+        found = list(scan_audio_files(tmp_path, {"mp3", "flac"}, workers=4))
+        assert found == expected
+
+    def test_extension_case_and_filter(self, tmp_path):
+        """Test that extensions match case-insensitively."""
+        upper = _touch(tmp_path / "LOUD.MP3")
+        _touch(tmp_path / "notes.txt")
+        assert list(scan_audio_files(tmp_path, {"mp3"})) == [upper]
+        assert len(list(scan_audio_files(tmp_path))) == 2
+
+    def test_skips_hidden_folders(self, tmp_path):
+        """Test that hidden folders are only scanned on request."""
+        visible = _touch(tmp_path / "track.mp3")
+        hidden = _touch(tmp_path / ".trash" / "deleted.mp3")
+
+        assert list(scan_audio_files(tmp_path, {"mp3"})) == [visible]
+        assert sorted(
+            scan_audio_files(tmp_path, {"mp3"}, include_hidden=True)
+        ) == sorted([visible, hidden])
+
+    def test_not_recursive(self, tmp_path):
+        """Test scanning only the top folder."""
+        top = _touch(tmp_path / "top.mp3")
+        _touch(tmp_path / "sub" / "nested.mp3")
+        assert list(scan_audio_files(tmp_path, recursive=False)) == [top]
+
+    @pytest.mark.skipif(not hasattr(os, "symlink"), reason="no symlinks")
+    def test_symlink_loop(self, tmp_path):
+        """Test that symlink loops and repeated links are walked once."""
+        track = _touch(tmp_path / "music" / "album" / "song.mp3")
+        os.symlink(tmp_path / "music", tmp_path / "music" / "album" / "loop")
+        os.symlink(tmp_path / "music" / "album", tmp_path / "music" / "same")
+
+        assert list(scan_audio_files(tmp_path / "music")) == [track]
+
+    def test_symlinked_folders_not_followed(self, tmp_path):
+        """Test that follow_symlinks=False ignores symlinked folders."""
+        elsewhere = _touch(tmp_path / "elsewhere" / "song.mp3")
+        library = tmp_path / "library"
+        library.mkdir()
+        os.symlink(tmp_path / "elsewhere", library / "linked")
+
+        assert list(scan_audio_files(library)) == [
+            str(library / "linked" / "song.mp3")
+        ]
+        assert list(scan_audio_files(library, follow_symlinks=False)) == []
+        assert os.path.exists(elsewhere)
+
+    def test_missing_directory(self, tmp_path):
+        """Test that a missing folder raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            list(scan_audio_files(tmp_path / "missing"))
+
+    def test_stops_when_closed(self, tmp_path):
+        """Test that the first file is available before the scan ends."""
+        for i in range(50):
+            _touch(tmp_path / f"{i:02d}" / "track.mp3")
+
+        files = scan_audio_files(tmp_path, {"mp3"})
+        first = next(files)
+        files.close()
+        assert first == str(tmp_path / "00" / "track.mp3")
+
+
+class TestAudioFileHelpers:
+    """Tests for the fileutils wrappers."""
+
+    def test_get_audio_files_sorted(self, tmp_path):
+        """Test that get_audio_files returns sorted Paths."""
+        _touch(tmp_path / "b" / "2.ogg")
+        _touch(tmp_path / "a.wav")
+        _touch(tmp_path / "skip.txt")
+
+        files = get_audio_files(tmp_path)
+        assert files == sorted(files)
+        assert [f.name for f in files] == ["a.wav", "2.ogg"]
+        assert list(iter_audio_files(tmp_path, recursive=False)) == [
+            tmp_path / "a.wav"
+        ]
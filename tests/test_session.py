@@ -0,0 +1,146 @@
+"""Tests for the session snapshot."""
+
+from unittest import mock
+
+import pytest
+
+from dolboebify.core import session
+from dolboebify.core.playlist import Playlist, Track
+from dolboebify.core.session import SessionState, SessionStore
+from dolboebify.utils.metadata import TrackMetadata
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture to create a session store in a temporary file."""
+    store = SessionStore(tmp_path / "session.sqlite3")
+    yield store
+    store.close()
+
+
+def _playlist(*names):
+    return Playlist(Track(f"/music/{name}.mp3") for name in names)
+
+
+class TestSessionStore:
+    """Tests for SessionStore."""
+
+    def test_empty_session(self, store):
+        """Test restoring when nothing was saved."""
+        assert len(store) == 0
+        assert store.load_state() == SessionState(-1, 0.0)
+        assert len(store.restore_playlist()) == 0
+
+    def test_round_trip(self, store, tmp_path):
+        """Test that a reopened store restores what was saved."""
+        cover = tmp_path / "a.jpg"
+        cover.write_bytes(b"")
+        playlist = _playlist("a", "b", "a")
+        playlist[1].apply_metadata(
+            TrackMetadata(title="B", artist="Band", duration=1000)
+        )
+        store.save_playlist(playlist)
+        store.save_state(1, 42.5)
+        store.set_image("/music/a.mp3", str(cover))
+        playlist.set_image("/music/a.mp3", str(cover))
+        store.close()
+
+        reopened = SessionStore(tmp_path / "session.sqlite3")
+        restored = reopened.restore_playlist()
+        assert restored == playlist
+        assert restored.indices("/music/a.mp3") == [0, 2]
+        assert restored[2].image == str(cover)
+        assert restored[1].artist == "Band"
+        assert reopened.load_state() == SessionState(1, 42.5)
+        assert reopened.load_images() == {"/music/a.mp3": str(cover)}
+        reopened.close()
+
+    def test_images_are_not_checked_on_load(self, store, tmp_path):
+        """Test that restoring doesn't stat every saved image."""
+        store.save_playlist(_playlist("a"))
+        evicted = str(tmp_path / "evicted.jpg")
+        store.set_image("/music/a.mp3", evicted)
+
+        with mock.patch("os.stat") as stat:
+            restored = store.restore_playlist()
+        assert restored[0].image == evicted
+        stat.assert_not_called()
+
+    def test_set_images_in_one_batch(self, store):
+        """Test saving and forgetting many images at once."""
+        store.save_images({"/music/a.mp3": "/covers/a.jpg"})
+        written = store.set_images(
+            {"/music/a.mp3": None, "/music/b.mp3": "/covers/b.jpg"}
+        )
+        assert written == 2
+        assert store.load_images() == {"/music/b.mp3": "/covers/b.jpg"}
+
+    def test_iter_restore_in_chunks(self, store):
+        """Test restoring step by step, then saving incrementally."""
+        store.save_playlist(_playlist(*"abcde"))
+        playlist = Playlist()
+
+        with mock.patch.object(session, "RESTORE_CHUNK_SIZE", 2):
+            steps = store.iter_restore(playlist)
+            assert next(steps) == 2
+            assert [t.title for t in playlist] == ["a", "b"]
+            assert list(steps) == [2, 1]
+        assert len(playlist) == 5
+
+        playlist.append(Track("/music/f.mp3"))
+        assert store.save_playlist(playlist) == 1
+
+    def test_appended_tracks_are_saved_incrementally(self, store):
+        """Test that only new entries are written after an append."""
+        playlist = _playlist("a", "b")
+        assert store.save_playlist(playlist) == 2
+
+        playlist.append(Track("/music/c.mp3"))
+        assert store.save_playlist(playlist) == 1
+        assert store.save_playlist(playlist) == 0
+        assert [t.title for t in store.iter_tracks()] == ["a", "b", "c"]
+
+    def test_removal_rewrites_playlist(self, store):
+        """Test that removing entries replaces the saved playlist."""
+        playlist = _playlist("a", "b", "c")
+        store.save_playlist(playlist)
+
+        playlist.apply_changes(removed=["/music/a.mp3"])
+        assert store.save_playlist(playlist) == 2
+        assert len(store) == 2
+        assert [t.title for t in store.iter_tracks()] == ["b", "c"]
+
+    def test_update_tracks(self, store):
+        """Test saving new metadata of single entries."""
+        playlist = _playlist("a", "b")
+        store.save_playlist(playlist)
+
+        playlist.apply_metadata([("/music/b.mp3", TrackMetadata(title="B"))])
+        assert store.update_tracks(playlist, ["/music/b.mp3"]) == 1
+        assert [t.title for t in store.iter_tracks()] == ["a", "B"]
+
+    def test_iter_tracks_in_chunks(self, store):
+        """Test streaming the playlist from a position in chunks."""
+        store.save_playlist(_playlist(*"abcdefg"))
+
+        with mock.patch.object(session, "RESTORE_CHUNK_SIZE", 2):
+            titles = [t.title for t in store.iter_tracks(start=2)]
+        assert titles == ["c", "d", "e", "f", "g"]
+
+    def test_images(self, store, tmp_path):
+        """Test saving, replacing and forgetting images."""
+        a, b = str(tmp_path / "a.jpg"), str(tmp_path / "b.jpg")
+        for cover in (a, b):
+            open(cover, "wb").close()
+        store.save_images({"/music/a.mp3": a})
+        store.set_image("/music/b.mp3", b)
+        store.set_image("/music/a.mp3", None)
+        assert store.load_images() == {"/music/b.mp3": b}
+
+    def test_clear(self, store):
+        """Test forgetting the whole session."""
+        store.save_playlist(_playlist("a"))
+        store.save_state(0, 1.0)
+        store.clear()
+        assert len(store) == 0
+        assert store.load_state() == SessionState()
@@ -0,0 +1,52 @@
+"""Tests for the per-folder sidecar cover cache."""
+
+import os
+from unittest import mock
+
+from dolboebify.utils import sidecar
+from dolboebify.utils.sidecar import SidecarCoverCache
+
+
+class TestSidecarCovers:
+    """Tests for sidecar cover lookup."""
+
+    def test_preference_and_case(self, tmp_path):
+        """Test name/extension preference and case-insensitive matching."""
+        (tmp_path / "Artwork.JPG").write_bytes(b"")
+        (tmp_path / "FOLDER.webp").write_bytes(b"")
+        (tmp_path / "notes.txt").write_bytes(b"")
+
+        cache = SidecarCoverCache()
+        assert cache.find(tmp_path) == str(tmp_path / "FOLDER.webp")
+        assert SidecarCoverCache().find(tmp_path / "missing") is None
+
+    def test_one_listing_per_folder(self, tmp_path):
+        """Test that a folder is listed once and then checked by mtime."""
+        (tmp_path / "cover.png").write_bytes(b"")
+        cache = SidecarCoverCache()
+
+        with mock.patch.object(
+            sidecar, "_choose_cover", wraps=sidecar._choose_cover
+        ) as mock_choose, mock.patch("os.stat", wraps=os.stat) as mock_stat:
+            for _ in range(100):
+                assert cache.find(tmp_path) == str(tmp_path / "cover.png")
+            assert mock_choose.call_count == 1
+            assert mock_stat.call_count == 1
+
+            # Past the check interval the folder is stat'ed, not re-listed
+            with mock.patch.object(sidecar, "DIRECTORY_CHECK_INTERVAL", 0):
+                cache.find(tmp_path)
+            assert mock_choose.call_count == 1
+            assert mock_stat.call_count == 2
+
+    def test_folder_change_invalidates(self, tmp_path):
+        """Test that a changed folder mtime triggers a new listing."""
+        cache = SidecarCoverCache()
+        assert cache.find(tmp_path) is None
+
+        (tmp_path / "cover.jpg").write_bytes(b"")
+        stats = tmp_path.stat()
+        os.utime(tmp_path, ns=(stats.st_atime_ns, stats.st_mtime_ns + 10**9))
+
+        with mock.patch.object(sidecar, "DIRECTORY_CHECK_INTERVAL", 0):
+            assert cache.find(tmp_path) == str(tmp_path / "cover.jpg")
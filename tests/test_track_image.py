@@ -1,11 +1,13 @@
 """Tests for track image API functionality."""
 
+import time
 from pathlib import Path
 from unittest import mock
 
 import pytest
 
 from dolboebify.core import Player
+from dolboebify.utils import coverart
 
 
 class TestTrackImageAPI:
@@ -93,27 +95,49 @@ class TestTrackImageAPI:
         result = player.remove_track_image("nonexistent.mp3")
         assert result is False
 
-    @mock.patch("pathlib.Path.exists")
-    def test_get_standard_covers(self, mock_exists, player):
+    def test_get_standard_covers(self, player, tmp_path):
         """Test finding standard cover files in track directory."""
-
-        # Setup function to mock file existence based on name
-        def mock_path_exists(path):
-            if path.name in ["track.mp3", "album.jpg"]:
-                return True
-            return False
-
-        mock_exists.side_effect = mock_path_exists
+        track = tmp_path / "track.mp3"
+        track.write_bytes(b"")
+        (tmp_path / "album.jpg").write_bytes(b"")
 
         # Test finding a standard cover file
-        with mock.patch.object(Path, "parent") as mock_parent:
-            mock_parent.return_value = Path("/fake/path")
-            with mock.patch("pathlib.Path.with_name") as mock_with_name:
-                # Set up the mock for Path.with_name().exists()
-                mock_with_name.return_value = Path("/fake/path/album.jpg")
-
-                image_path = player.get_track_image("track.mp3")
-                assert image_path is not None
+        image_path = player.get_track_image(track)
+        assert image_path == str(tmp_path / "album.jpg")
+
+    @mock.patch("dolboebify.utils.coverart.fetch_from_lastfm")
+    @mock.patch("requests.Session.get")
+    def test_throttled_lookup_resolves(
+        self, mock_get, mock_lastfm, player, tmp_path
+    ):
+        """Test that a lookup waits out a provider's backoff by default."""
+        track = tmp_path / "Artist - Title.mp3"
+        track.write_bytes(b"\xff\xfb" * 10)
+        coverart._get_provider_throttle("itunes").backoff(retry_after=0.3)
+        mock_lastfm.return_value = None
+
+        search = mock.Mock(status_code=200)
+        search.json.return_value = {
+            "resultCount": 1,
+            "results": [{"artworkUrl100": "https://example.com/100x100.jpg"}],
+        }
+        image = mock.Mock(status_code=200, content=b"fake_image_data")
+        mock_get.side_effect = [search, image]
+
+        with mock.patch.object(coverart, "get_setting") as mock_setting:
+            mock_setting.side_effect = lambda section, key, default=None: {
+                "lookup_mode": "sequential",
+                "album_lookup": False,
+            }.get(key, default)
+            with mock.patch.object(
+                coverart, "save_to_cache", return_value="/cache/cover.jpg"
+            ):
+                start = time.monotonic()
+                image_path = player.get_track_image(track)
+
+        assert image_path == "/cache/cover.jpg"
+        assert time.monotonic() - start >= 0.2
+        assert player.get_track_image(track) == "/cache/cover.jpg"
 
     @mock.patch("pathlib.Path.exists")
     def test_invalid_image_format(self, mock_exists, player):
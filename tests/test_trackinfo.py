@@ -0,0 +1,74 @@
+"""Tests for parsing artist and title from track file names."""
+
+from unittest import mock
+
+from dolboebify.utils import coverart
+from dolboebify.utils.trackinfo import TrackNameParser, get_track_parser
+
+
+class TestTrackNameParser:
+    """Tests for the pattern-table filename parser."""
+
+    def test_naming_schemes(self):
+        """Test the built-in naming schemes."""
+        parser = TrackNameParser()
+        cases = {
+            "01 - Artist - Title.mp3": ("Artist", "Title"),
+            "01) Artist - Title.mp3": ("Artist", "Title"),
+            "Jay-Z - Song.mp3": ("Jay-Z", "Song"),
+            "50 Cent - In Da Club.mp3": ("50 Cent", "In Da Club"),
+            "Artist-Title.mp3": ("Artist", "Title"),
+            "01 - Title.mp3": ("", "Title"),
+            "1999.mp3": ("", "1999"),
+            "/music/Band/Record/03 Song.flac": ("Band", "Song"),
+            "/music/Band - Record/03. Song.flac": ("Band", "Song"),
+            "03 Song.flac": ("", "Song"),
+        }
+        for name, expected in cases.items():
+            assert parser.parse(name) == expected, name
+
+    def test_parse_many_matches_parse(self):
+        """Test that batch parsing gives the same results in order."""
+        names = [
+            f"/music/Band {i % 7}/Album/{i % 20:02d}. Band - Song {i}.mp3"
+            for i in range(200)
+        ] + ["/music/Band/Album/07 Song.mp3", "JustTitle.ogg"]
+
+        parser = TrackNameParser()
+        assert parser.parse_many(names) == [
+            TrackNameParser().parse(name) for name in names
+        ]
+
+    def test_memoized_by_stem(self):
+        """Test that each distinct stem is matched once."""
+        parser = TrackNameParser()
+        names = [f"/dir{i}/Artist - Title.mp3" for i in range(50)]
+
+        with mock.patch.object(
+            parser, "_match_stem", wraps=parser._match_stem
+        ) as mock_match:
+            parser.parse_many(names)
+            parser.parse("Artist - Title.flac")
+            assert mock_match.call_count == 1
+
+    def test_custom_patterns(self):
+        """Test that configured patterns take precedence."""
+        parser = TrackNameParser(
+            [r"^(?P<title>.+?) by (?P<artist>.+)$", "(?P<broken", r"^\d+$"]
+        )
+        assert parser.parse("Song by Band.mp3") == ("Band", "Song")
+        assert parser.parse("Band - Song.mp3") == ("Band", "Song")
+
+    def test_patterns_from_settings(self):
+        """Test that parse_track_info uses cover_art.filename_patterns."""
+        patterns = [r"^(?P<title>.+?) by (?P<artist>.+)$"]
+        with mock.patch.object(coverart, "get_setting", return_value=patterns):
+            assert coverart.parse_track_info("Song by Band.mp3") == (
+                "Band",
+                "Song",
+            )
+            assert coverart.parse_track_infos(["A - B.mp3", "C by D.mp3"]) == [
+                ("A", "B"),
+                ("D", "C"),
+            ]
+        assert get_track_parser(patterns) is get_track_parser(patterns)
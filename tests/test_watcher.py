@@ -0,0 +1,95 @@
+"""Tests for the live library watcher."""
+
+import os
+import queue
+
+import pytest
+
+from dolboebify.utils.watcher import LibraryDelta, LibraryWatcher
+
+# Seconds to wait for a batch of changes
+TIMEOUT = 5.0
+
+
+def _touch(path, data=b""):
+    """Create a file, with its parent folders."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watched(request, tmp_path):
+    """Fixture to watch a small library; yields (root, delta queue)."""
+    root = tmp_path / "music"
+    _touch(root / "Album" / "01.mp3")
+    deltas = queue.Queue()
+    watcher = LibraryWatcher(
+        root,
+        deltas.put,
+        extensions={"mp3"},
+        coalesce_delay=0.1,
+        poll_interval=0.1,
+        use_inotify=request.param == "inotify",
+    )
+    with watcher:
+        if request.param == "inotify" and watcher.mode != "inotify":
+            pytest.skip("inotify is not available")
+        yield root, deltas
+
+
+class TestLibraryWatcher:
+    """Tests for LibraryWatcher."""
+
+    def test_added_files_are_coalesced(self, watched):
+        """Test that a burst of new files is reported as one batch."""
+        root, deltas = watched
+        paths = [_touch(root / "New" / f"{i:02d}.mp3") for i in range(10)]
+        _touch(root / "New" / "cover.jpg")
+
+        delta = deltas.get(timeout=TIMEOUT)
+        while len(delta.added) < len(paths):
+            more = deltas.get(timeout=TIMEOUT)
+            delta = delta._replace(added=delta.added + more.added)
+        assert sorted(delta.added) == paths
+        assert delta.removed == []
+
+    def test_removed_file(self, watched):
+        """Test that deleted files are reported."""
+        root, deltas = watched
+        os.remove(root / "Album" / "01.mp3")
+
+        delta = deltas.get(timeout=TIMEOUT)
+        assert delta.removed == [str(root / "Album" / "01.mp3")]
+
+    def test_renamed_file(self, watched):
+        """Test that a rename is reported as a move."""
+        root, deltas = watched
+        old = root / "Album" / "01.mp3"
+        new = root / "Album" / "01 - Intro.mp3"
+        os.rename(old, new)
+
+        delta = deltas.get(timeout=TIMEOUT)
+        assert delta.moved == [(str(old), str(new))]
+        assert (delta.added, delta.removed) == ([], [])
+
+    def test_stop_ends_reporting(self, tmp_path):
+        """Test that a stopped watcher reports nothing."""
+        deltas = queue.Queue()
+        watcher = LibraryWatcher(tmp_path, deltas.put, coalesce_delay=0.05)
+        watcher.start()
+        watcher.stop()
+        _touch(tmp_path / "late.mp3")
+        with pytest.raises(queue.Empty):
+            deltas.get(timeout=0.3)
+        assert watcher.mode is None
+
+    def test_missing_directory(self, tmp_path):
+        """Test that watching a missing folder fails."""
+        with pytest.raises(FileNotFoundError):
+            LibraryWatcher(tmp_path / "missing", print).start()
+
+    def test_empty_delta_is_false(self):
+        """Test LibraryDelta truthiness."""
+        assert not LibraryDelta([], [], [], [])
+        assert LibraryDelta(["a.mp3"], [], [], [])